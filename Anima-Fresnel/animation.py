@@ -0,0 +1,235 @@
+import numpy as np
+
+from transform import euler_components
+
+# Channels a keyframe can set, each overriding the same-named TransformSystem field
+CHANNELS = ('position', 'rotation', 'scale')
+
+# 'step' holds each key until the next, 'linear' blends straight between keys, 'cubic' follows a smooth
+# (Catmull-Rom style) curve through them. Rotations are always slerped between orientations unless stepped.
+INTERPOLATIONS = ('step', 'linear', 'cubic')
+
+# What happens outside the keyed time range: 'once' holds the first and last keys, 'loop' repeats the
+# range, 'pingpong' plays it forwards and backwards alternately
+WRAP_MODES = ('once', 'loop', 'pingpong')
+
+
+def matrices_to_quaternions(m):
+    """
+    Unit quaternions (x, y, z, w) of rotation matrices given component-major, as from euler_components.
+
+    :param m: (3, 3, N) array where [i, j] holds element (i, j) of every matrix.
+    :return: (N, 4) array.
+    """
+    trace = m[0, 0] + m[1, 1] + m[2, 2]
+    # Pick the best-conditioned of the four extraction formulas per matrix
+    choice = np.argmax(np.stack([trace, m[0, 0], m[1, 1], m[2, 2]]), axis=0)
+    q = np.empty((m.shape[2], 4), dtype=np.float64)
+    for case, (i, j, k) in enumerate(((None, None, None), (0, 1, 2), (1, 2, 0), (2, 0, 1))):
+        select = choice == case
+        if not select.any():
+            continue
+        s = m[..., select]
+        if case == 0:
+            r = np.sqrt(1.0 + trace[select]) * 2.0
+            q[select] = np.stack([(s[2, 1] - s[1, 2]) / r, (s[0, 2] - s[2, 0]) / r, (s[1, 0] - s[0, 1]) / r,
+                                  0.25 * r], axis=1)
+        else:
+            r = np.sqrt(1.0 + s[i, i] - s[j, j] - s[k, k]) * 2.0
+            part = np.empty((len(r), 4))
+            part[:, i] = 0.25 * r
+            part[:, j] = (s[j, i] + s[i, j]) / r
+            part[:, k] = (s[k, i] + s[i, k]) / r
+            part[:, 3] = (s[k, j] - s[j, k]) / r
+            q[select] = part
+    return q
+
+
+def quaternions_to_eulers(q):
+    """
+    Euler angles (roll, pitch, yaw) in radians of unit quaternions, inverting euler_components.
+
+    :param q: (N, 4) array of (x, y, z, w).
+    """
+    x, y, z, w = q.T
+    m00 = 1.0 - 2.0 * (y * y + z * z)
+    m10 = 2.0 * (x * y + z * w)
+    m11 = 1.0 - 2.0 * (x * x + z * z)
+    m12 = 2.0 * (y * z - x * w)
+    m20 = 2.0 * (x * z - y * w)
+    # euler_components puts sin(pitch) at [1, 0], -cos(pitch)sin(roll) at [1, 2] and -sin(yaw)cos(pitch) at [2, 0]
+    return np.stack([np.arctan2(-m12, m11), np.arcsin(np.clip(m10, -1.0, 1.0)), np.arctan2(-m20, m00)], axis=1)
+
+
+def slerp(q0, q1, f):
+    """Spherical linear interpolation between rows of unit quaternions, falling back to lerp when nearly equal."""
+    dot = np.einsum('ij,ij->i', q0, q1)
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    close = sin_theta < 1e-6
+    safe = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1.0 - f, np.sin((1.0 - f) * theta) / safe)
+    w1 = np.where(close, f, np.sin(f * theta) / safe)
+    q = w0[:, None] * q0 + w1[:, None] * q1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+class TrackSet:
+    def __init__(self, channel, interpolation):
+        """
+        Every track of one channel with one interpolation, compiled into flat arrays for batched evaluation.
+
+        All tracks' key times are shifted into disjoint ranges of one ascending array, so a single
+        searchsorted finds the current key of every track at once.
+        """
+        self.channel = channel
+        self.interpolation = interpolation
+        self.tracks = {}  # row -> (times, values, mode)
+        self.dirty = True
+
+    def compile(self):
+        self.dirty = False
+        rows = list(self.tracks)
+        self.rows = np.asarray(rows, dtype=np.intp)
+        if not rows:
+            return
+        times = [self.tracks[row][0] for row in rows]
+        values = [self.tracks[row][1] for row in rows]
+        lengths = np.fromiter((len(t) for t in times), dtype=np.intp, count=len(rows))
+        self.start = np.fromiter((t[0] for t in times), dtype=np.float64, count=len(rows))
+        self.duration = np.fromiter((t[-1] - t[0] for t in times), dtype=np.float64, count=len(rows))
+        modes = np.array([WRAP_MODES.index(self.tracks[row][2]) for row in rows])
+        self.loop = modes == WRAP_MODES.index('loop')
+        self.pingpong = modes == WRAP_MODES.index('pingpong')
+
+        # Track k's keys become times - start + offset[k]; the gaps keep every track's range disjoint
+        self.offsets = np.concatenate([[0.0], np.cumsum(self.duration + 1.0)[:-1]])
+        self.first = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        self.last = self.first + lengths - 1
+        self.keys = np.concatenate(times) - np.repeat(self.start - self.offsets, lengths)
+        self.values = np.concatenate(values)
+        if self.channel == 'rotation':
+            self.values = self.compile_rotations()
+        elif self.interpolation == 'cubic':
+            self.tangents = self.compile_tangents()
+
+    def compile_rotations(self):
+        """Quaternions of the Euler-angle keys, each on the same hemisphere as its predecessor in the track."""
+        q = matrices_to_quaternions(euler_components(self.values))
+        # A negative dot product means slerp would take the long way round; flipping the sign of every later
+        # key in the track keeps the orientation and fixes that. Pairs spanning two tracks never count.
+        opposite = np.einsum('ij,ij->i', q[1:], q[:-1]) < 0.0
+        opposite[self.first[1:] - 1] = False
+        flips = np.concatenate([[0], np.cumsum(opposite)])
+        track = np.repeat(np.arange(len(self.first)), self.last - self.first + 1)
+        q[(flips - flips[self.first][track]) % 2 == 1] *= -1.0
+        return q
+
+    def compile_tangents(self):
+        """Per-key slope from its neighbours (one-sided at the ends of each track), in value per second."""
+        index = np.arange(len(self.keys))
+        track = np.repeat(np.arange(len(self.first)), self.last - self.first + 1)
+        before = np.maximum(index - 1, self.first[track])
+        after = np.minimum(index + 1, self.last[track])
+        span = self.keys[after] - self.keys[before]
+        return (self.values[after] - self.values[before]) / np.where(span > 0.0, span, 1.0)[:, None]
+
+    def evaluate(self, time, out):
+        """Write every track's value at scene `time` into its row of `out`."""
+        if self.dirty:
+            self.compile()
+        if not len(self.rows):
+            return
+        local = time - self.start
+        with np.errstate(invalid='ignore', divide='ignore'):
+            looped = np.where(self.duration > 0.0, np.mod(local, self.duration), 0.0)
+            bounced = np.where(self.duration > 0.0, np.mod(local, 2.0 * self.duration), 0.0)
+        local = np.where(self.loop, looped, np.where(self.pingpong, self.duration - np.abs(bounced - self.duration),
+                                                     np.clip(local, 0.0, self.duration)))
+
+        query = local + self.offsets
+        # Segment [i, j] around the query; single-key tracks get the degenerate segment [first, first]
+        i = np.clip(np.searchsorted(self.keys, query, side='right') - 1, self.first,
+                    np.maximum(self.last - 1, self.first))
+        j = np.minimum(i + 1, self.last)
+        t0, t1 = self.keys[i], self.keys[j]
+        dt = t1 - t0
+        f = np.clip((query - t0) / np.where(dt > 0.0, dt, 1.0), 0.0, 1.0)
+        if self.interpolation == 'step':
+            f = np.floor(f)  # Only reaching the next key's time switches to it
+
+        v0, v1 = self.values[i], self.values[j]
+        if self.channel == 'rotation':
+            value = quaternions_to_eulers(slerp(v0, v1, f))
+        elif self.interpolation == 'cubic':
+            # Cubic Hermite segment; tangents scaled from per-second to per-segment
+            f2, f3 = f * f, f * f * f
+            h00, h10, h01, h11 = 2 * f3 - 3 * f2 + 1, f3 - 2 * f2 + f, -2 * f3 + 3 * f2, f3 - f2
+            value = (h00[:, None] * v0 + (h10 * dt)[:, None] * self.tangents[i] + h01[:, None] * v1 +
+                     (h11 * dt)[:, None] * self.tangents[j])
+        else:
+            value = v0 + f[:, None] * (v1 - v0)
+        out[self.rows] = value
+
+
+class KeyframeAnimator:
+    def __init__(self):
+        """
+        Keyframe tracks for TransformSystem rows, evaluated for all rows together.
+
+        A track sets one channel (position, rotation or scale) of one row and takes precedence over the row's
+        constant speed for that channel. Tracks follow their row when TransformSystem.remove moves it.
+        """
+        self.sets = {}  # (channel, interpolation) -> TrackSet
+        self.count = 0
+
+    def attach(self, row, keyframes, interpolation='linear', mode='once'):
+        """
+        Compile `keyframes` into tracks for `row`, replacing any it had.
+
+        :param keyframes: Dicts with a "time" in seconds and any of "position", "rotation" (degrees, in the
+                          order of Object3D.rotation) and "scale"; a channel is animated when any key sets it.
+        :param interpolation: One of INTERPOLATIONS, or a dict of it per channel.
+        :param mode: One of WRAP_MODES.
+        """
+        if mode not in WRAP_MODES:
+            raise ValueError(f"Unsupported animation mode: {mode}")
+        self.detach(row)
+        for channel in CHANNELS:
+            method = interpolation.get(channel, 'linear') if isinstance(interpolation, dict) else interpolation
+            if method not in INTERPOLATIONS:
+                raise ValueError(f"Unsupported interpolation: {method}")
+            keys = [key for key in keyframes if channel in key]
+            if not keys:
+                continue
+            times = np.array([key["time"] for key in keys], dtype=np.float64)
+            values = np.array([key[channel] for key in keys], dtype=np.float64).reshape(len(keys), 3)
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+            if channel == 'rotation':
+                values = np.radians(values)  # Turned into quaternions for every track at once by TrackSet.compile
+            track_set = self.sets.setdefault((channel, method), TrackSet(channel, method))
+            track_set.tracks[row] = (times, values, mode)
+            track_set.dirty = True
+        self.count = sum(len(track_set.tracks) for track_set in self.sets.values())
+
+    def detach(self, row):
+        for track_set in self.sets.values():
+            if track_set.tracks.pop(row, None) is not None:
+                track_set.dirty = True
+        self.count = sum(len(track_set.tracks) for track_set in self.sets.values())
+
+    def move(self, source, target):
+        """Row `source` now lives at `target` (TransformSystem.remove); `target`'s own tracks are dropped."""
+        self.detach(target)
+        for track_set in self.sets.values():
+            track = track_set.tracks.pop(source, None)
+            if track is not None:
+                track_set.tracks[target] = track
+                track_set.dirty = True
+        self.count = sum(len(track_set.tracks) for track_set in self.sets.values())
+
+    def apply(self, time, transforms):
+        """Overwrite every animated channel of `transforms` with its value at scene `time`."""
+        for (channel, _), track_set in self.sets.items():
+            track_set.evaluate(time, getattr(transforms, channel))
@@ -0,0 +1,1000 @@
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from context import create_backend, select_error_checking, select_platform
+from transform import TransformSystem
+
+# Modules importing OpenGL.GL are imported inside the benchmarks, after main() has selected the GL platform
+
+
+def time_call(func, *args, repeat=5, **kwargs):
+    """Return the best wall-clock time in seconds over `repeat` calls."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_geometry(args):
+    """Mesh generation time versus tessellation level for every parametric primitive."""
+    from objects import GeometryGenerator
+
+    generators = {
+        'sphere': lambda n: GeometryGenerator.create_sphere(1.0, n, n),
+        'ellipsoid': lambda n: GeometryGenerator.create_ellipsoid(1.0, 0.7, 1.5, n, n),
+        'torus': lambda n: GeometryGenerator.create_torus(1.5, 0.5, n, n),
+        'cylinder': lambda n: GeometryGenerator.create_cylinder(1.0, 2.0, n),
+        'curved_plane': lambda n: GeometryGenerator.create_curved_plane(n, n, 1.0),
+    }
+    print(f"{'shape':<14}{'steps':>8}{'vertices':>12}{'ms':>10}")
+    for name, generate in generators.items():
+        for steps in args.steps:
+            vertices, _, _ = generate(steps)
+            elapsed = time_call(generate, steps, repeat=args.repeat)
+            print(f"{name:<14}{steps:>8}{len(vertices):>12}{elapsed * 1000.0:>10.3f}")
+
+
+def create_gl_context(args, width=64, height=64):
+    """Create a context on the selected backend that stays current for the rest of the benchmark."""
+    from OpenGL import GL
+    from render import Renderer
+
+    backend = create_backend(args.backend)
+    backend.initialize(width, height, visible=False, core_profile=args.profile == 'core')
+    GL.glEnable(GL.GL_DEPTH_TEST)
+
+    # Draw into an offscreen target like the renderer does
+    fbo, _ = Renderer(width, height, backend=args.backend).create_framebuffer(width, height)
+    GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, fbo)
+    GL.glViewport(0, 0, width, height)
+    return backend
+
+
+def bench_submission(args):
+    """CPU-side frame submission time for per-object versus instanced drawing."""
+    from OpenGL import GL
+    from objects import ObjectFactory, ObjectProperties
+    from pbr_shaders import Shader, ShaderProgram
+    from scene import Scene
+
+    create_gl_context(args)
+    programs = {
+        'per-object': ShaderProgram.from_shader(Shader(profile=args.profile)),
+        'instanced': ShaderProgram.from_shader(Shader(defines=("INSTANCED",), profile=args.profile)),
+    }
+    properties = ObjectProperties(albedo=(0.8, 0.3, 0.1), metallic=0.5, roughness=0.4)
+
+    print(f"{'objects':>10}{'mode':>12}{'ms/frame':>12}")
+    for count in args.counts:
+        objects = [ObjectFactory.create_object(args.shape, properties) for _ in range(count)]
+        for mode, program in programs.items():
+            scene = Scene(program, 64, 64, instanced=(mode == 'instanced'))
+            scene.objects = objects
+            scene.projection = np.identity(4, dtype=np.float32)
+            program.use()
+
+            best = float('inf')
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                scene.draw_objects(0.0)
+                best = min(best, time.perf_counter() - start)
+                GL.glFinish()
+            print(f"{count:>10}{mode:>12}{best * 1000.0:>12.2f}")
+            scene.cleanup()
+        for obj in objects:
+            obj.cleanup()
+
+
+def bench_transforms(args):
+    """Batched TransformSystem update versus the per-object pyrr matrix path."""
+    import pyrr
+
+    rng = np.random.default_rng(0)
+    print(f"{'objects':>10}{'batched ms':>14}{'per-object ms':>16}")
+    for count in args.counts:
+        transforms = TransformSystem(count)
+        for _ in range(count):
+            transforms.add(None, rng.random(3) * 10.0 - 5.0, *rng.normal(size=(3, 3)))
+        batched = time_call(transforms.update, 1.0 / 30.0, repeat=args.repeat)
+
+        # The pre-TransformSystem path: three pyrr matrices and two multiplies per object
+        def per_object():
+            for row in range(count):
+                rotation = pyrr.matrix44.create_from_eulers(transforms.rotation[row], dtype=np.float32)
+                translation = pyrr.matrix44.create_from_translation(transforms.position[row], dtype=np.float32)
+                scaling = pyrr.matrix44.create_from_scale(transforms.scale[row], dtype=np.float32)
+                model = pyrr.matrix44.multiply(pyrr.matrix44.multiply(rotation, scaling), translation)
+                np.linalg.inv(model[:3, :3]).T
+
+        legacy = time_call(per_object, repeat=1) if count <= args.max_per_object else float('nan')
+        print(f"{count:>10}{batched * 1000.0:>14.3f}{legacy * 1000.0:>16.3f}")
+
+
+def bench_layouts(args):
+    """Time to compute each container layout and write it into transform rows, versus the per-object loop."""
+    import container
+
+    def square(count):
+        return int(np.ceil(np.sqrt(count)))
+
+    def cube(count):
+        return int(np.ceil(np.cbrt(count)))
+
+    rng = np.random.default_rng(0)
+    layouts = {
+        'grid': lambda n: container.grid_positions(n, square(n), square(n), (2.0, 2.0, 0.0)),
+        'circle': lambda n: container.circle_positions(n, n / np.pi),
+        'spiral': lambda n: container.spiral_positions(n, 1.0, n / 10.0, 40),
+        'fibonacci': lambda n: container.fibonacci_sphere_positions(n, np.sqrt(n)),
+        'lattice': lambda n: container.lattice_positions(n, cube(n), cube(n), cube(n), (2.0, 2.0, 2.0)),
+        'poisson': lambda n: container.poisson_disk_positions(n, 2.0, rng=rng),
+        'phyllotaxis': lambda n: container.phyllotaxis_positions(n, 1.0),
+    }
+
+    # The pre-vectorized containers: one Python iteration and one small array per object
+    def legacy_grid(positions, n):
+        columns = square(n)
+        for i in range(n):
+            positions[i] = np.array([i % columns * 2.0, i // columns * 2.0, 0.0], dtype=np.float32)
+
+    def legacy_circle(positions, n):
+        for i in range(n):
+            angle = 2 * np.pi * i / n
+            positions[i] = np.array([n / np.pi * np.cos(angle), n / np.pi * np.sin(angle), 0.0])
+
+    def legacy_spiral(positions, n):
+        for i in range(n):
+            t = i / (n - 1)
+            radius = 1.0 + t * (n / 10.0 - 1.0)
+            positions[i] = np.array([radius * np.cos(2 * np.pi * 40 * t), radius * np.sin(2 * np.pi * 40 * t), 0.0])
+
+    legacy = {'grid': legacy_grid, 'circle': legacy_circle, 'spiral': legacy_spiral}
+
+    print(f"{'layout':<14}{'objects':>10}{'placed':>10}{'ms':>10}{'per-object ms':>16}")
+    for name in args.layouts:
+        for count in args.counts:
+            transforms = TransformSystem(count)
+
+            def place():
+                positions = layouts[name](count)
+                transforms.position[:len(positions)] = positions
+                return len(positions)
+
+            placed = place()
+            elapsed = time_call(place, repeat=args.repeat)
+            old = float('nan')
+            if name in legacy and count <= args.max_per_object:
+                old = time_call(legacy[name], transforms.position, count, repeat=1)
+            print(f"{name:<14}{count:>10}{placed:>10}{elapsed * 1000.0:>10.2f}{old * 1000.0:>16.2f}")
+
+
+def bench_animation(args):
+    """Per-frame keyframe evaluation for many animated objects, batched versus one np.interp per object."""
+    from animation import KeyframeAnimator
+
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.uniform(0.05, 0.2, size=(args.count, args.keys)), axis=1)
+    values = rng.normal(size=(3, args.count, args.keys, 3))
+    # Plain lists like keyframes loaded from JSON
+    positions, rotations, scales = values[0].tolist(), (values[1] * 90.0).tolist(), (1.0 + 0.1 * values[2]).tolist()
+    animations = [[{"time": t, "position": p, "rotation": r, "scale": s}
+                   for t, p, r, s in zip(times[i].tolist(), positions[i], rotations[i], scales[i])]
+                  for i in range(args.count)]
+    frame_times = rng.uniform(0.0, times[:, -1].max() * 1.5, size=args.frames)
+
+    print(f"{'interpolation':<14}{'mode':<10}{'compile ms':>12}{'ms/frame':>10}")
+    for interpolation in args.interpolations:
+        for mode in args.modes:
+            transforms = TransformSystem(args.count)
+            for _ in range(args.count):
+                transforms.add(None, (0.0, 0.0, 0.0))
+            transforms.animator = KeyframeAnimator()
+            start = time.perf_counter()
+            for row, keyframes in enumerate(animations):
+                transforms.animator.attach(row, keyframes, interpolation, mode)
+            transforms.animator.apply(0.0, transforms)  # Tracks compile on first use
+            compile_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for t in frame_times:
+                transforms.animator.apply(t, transforms)
+            elapsed = (time.perf_counter() - start) / len(frame_times)
+            print(f"{interpolation:<14}{mode:<10}{compile_time * 1000.0:>12.1f}{elapsed * 1000.0:>10.3f}")
+
+    # Reference: linear position and scale interpolation object by object, clamped, without rotations
+    transforms = TransformSystem(args.count)
+    start = time.perf_counter()
+    for t in frame_times[:3]:
+        for row in range(args.count):
+            for channel, field in ((0, transforms.position), (2, transforms.scale)):
+                for axis in range(3):
+                    field[row, axis] = np.interp(t, times[row], values[channel, row, :, axis])
+    elapsed = (time.perf_counter() - start) / 3
+    print(f"{'per-object':<14}{'once':<10}{'':>12}{elapsed * 1000.0:>10.3f}  (position and scale only)")
+
+
+def bench_recorder(args):
+    """End-to-end frames per second of the PNG-sequence and streaming recorder modes."""
+    import tempfile
+    from recorder import Recorder
+
+    # A moving gradient so the encoders see realistic, changing content
+    y, x = np.mgrid[0:args.height, 0:args.width]
+    base = np.stack([x * 255 // args.width, y * 255 // args.height, (x + y) * 255 // (args.width + args.height)], axis=-1)
+    base = base.astype(np.uint8)
+
+    print(f"{'mode':<8}{'workers':>8}{'frames':>8}{'seconds':>10}{'fps':>8}")
+    for mode, workers in [(mode, 0) for mode in args.modes] + [('png', workers) for workers in args.workers]:
+        with tempfile.TemporaryDirectory() as workdir, contextlib.chdir(workdir), \
+                open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            recorder = Recorder(args.width, args.height, args.fps, mode=mode, preset=args.preset,
+                                output_filename='benchmark.mp4', encode_workers=workers)
+            for frame in range(args.frames):
+                recorder.capture_frame(np.roll(base, frame * 4, axis=1))
+            recorder.finalize_video()
+            elapsed = time.perf_counter() - start
+        print(f"{mode:<8}{workers:>8}{args.frames:>8}{elapsed:>10.2f}{args.frames / elapsed:>8.1f}")
+
+
+def smoke_headless(args):
+    """Render a few frames of the stock scene headlessly and check the image checksum is in range."""
+    from OpenGL import GL
+    from render import Renderer
+
+    renderer = Renderer(args.width, args.height, backend=args.backend, config_file=args.config,
+                        instanced=args.instanced, clustered=args.clustered, offline=True, seed=args.seed,
+                        profile=args.profile)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        renderer.initialize()
+        if renderer.initialized:
+            for _ in range(args.frames):
+                renderer.render(0.0)
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, renderer.fbo)
+            GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+            pixels = GL.glReadPixels(0, 0, args.width, args.height, GL.GL_RGB, GL.GL_UNSIGNED_BYTE)
+        renderer.cleanup()
+    if not renderer.initialized:
+        raise SystemExit(f"FAIL: renderer did not initialize on the '{args.backend}' backend")
+
+    image = np.frombuffer(pixels, dtype=np.uint8)
+    checksum = float(image.mean())
+    coverage = float(np.count_nonzero(image.reshape(-1, 3).any(axis=1))) / (args.width * args.height)
+    print(f"backend={args.backend} frames={args.frames} checksum={checksum:.3f} coverage={coverage:.3f}")
+    if not (args.min_checksum <= checksum <= args.max_checksum):
+        raise SystemExit(f"FAIL: checksum {checksum:.3f} outside [{args.min_checksum}, {args.max_checksum}]")
+    print("OK")
+
+
+def count_gl_calls(args):
+    """OpenGL calls issued per frame while rendering the stock scene, by entry point."""
+    import instancing
+    import mesh
+    import objects
+    import pbr_shaders
+    import render
+    import scene
+    import state
+    import uniform_blocks
+    from glstats import GLCallCounter
+    from render import Renderer
+
+    renderer = Renderer(args.width, args.height, backend=args.backend, config_file=args.config,
+                        instanced=args.instanced, offline=True, profile=args.profile)
+    counter = GLCallCounter([render, scene, objects, mesh, instancing, pbr_shaders, state, uniform_blocks])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        renderer.initialize()
+        if renderer.initialized:
+            frames = []
+            with counter:
+                for _ in range(args.frames):
+                    renderer.render(0.0)
+                    frames.append(counter.reset())
+        renderer.cleanup()
+    if not renderer.initialized:
+        raise SystemExit(f"FAIL: renderer did not initialize on the '{args.backend}' backend")
+
+    objects_drawn = len(renderer.scene.objects)
+    print(f"{'frame':>6}{'GL calls':>10}{'per object':>12}")
+    for index, counts in enumerate(frames):
+        total = sum(counts.values())
+        print(f"{index:>6}{total:>10}{total / objects_drawn:>12.1f}")
+    print("\nLast frame by entry point:")
+    for name, calls in frames[-1].most_common():
+        print(f"  {name:<32}{calls:>6}")
+    print(f"Uniform uploads {renderer.shader.uploads}, skipped as unchanged {renderer.shader.skipped_uploads}")
+
+
+def many_lights_config(light_count, columns=12, rows=8, light_radius=3.0, seed=0):
+    """Scene config: a wall of spheres lit by `light_count` small coloured point lights."""
+    rng = np.random.default_rng(seed)
+    centre = [columns - 1.0, rows - 1.0, 0.0]
+    sphere = {"type": "sphere", "radius": 0.8, "lat_steps": 24, "lon_steps": 24,
+              "properties": {"albedo": [0.8, 0.8, 0.8], "metallic": 0.1, "roughness": 0.6}}
+    low = np.array([-2.0, -2.0, -2.0])
+    high = np.array([2.0 * columns, 2.0 * rows, 4.0])
+    lights = [{"type": "point", "position": (low + rng.random(3) * (high - low)).tolist(),
+               "color": rng.random(3).tolist(), "intensity": 4.0, "radius": light_radius}
+              for _ in range(light_count)]
+    return {"scene": {
+        "seed": seed,
+        "camera": {"position": [centre[0], centre[1], 22.0], "look_at": centre, "up_vector": [0.0, 1.0, 0.0],
+                   "field_of_view": 45.0, "near_clip": 0.1, "far_clip": 100.0},
+        "lights": lights,
+        "grid_container": {"pattern": "grid", "columns": columns, "rows": rows, "spacing": [2.0, 2.0, 0.0],
+                           "objects": [sphere] * (columns * rows)},
+    }}
+
+
+def bench_lights(args):
+    """Frame time versus light count for the plain light array and clustered forward lighting."""
+    import json
+    import tempfile
+    from OpenGL import GL
+    from render import Renderer
+
+    print(f"{'lights':>8}{'mode':>12}{'ms/frame':>12}{'cull ms':>10}{'pairs':>10}")
+    for count in args.counts:
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config:
+            json.dump(many_lights_config(count), config)
+        for mode in args.modes:
+            renderer = Renderer(args.width, args.height, backend=args.backend, config_file=config.name,
+                                offline=True, profile=args.profile, max_lights=count, clustered=(mode == 'clustered'))
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                renderer.initialize()
+                times = []
+                for _ in range(args.frames):
+                    start = time.perf_counter()
+                    renderer.render(0.0)
+                    GL.glFinish()
+                    times.append(time.perf_counter() - start)
+                clusters = renderer.scene.clusters
+                cull = time_call(clusters.assign, renderer.scene.camera_block.data[:16].reshape(4, 4),
+                                 clusters.packed_lights) if clusters else 0.0
+                pairs = clusters.assignments if clusters else count
+                renderer.cleanup()
+            print(f"{count:>8}{mode:>12}{np.median(times) * 1000.0:>12.1f}{cull * 1000.0:>10.2f}{pairs:>10}")
+        os.remove(config.name)
+
+
+def spiral_config(count, radius_end=200.0, turns=40, seed=0):
+    """Scene config: `count` small cubes on a wide spiral, seen from close enough that most are off screen."""
+    cube = {"type": "cube", "properties": {"albedo": [0.7, 0.5, 0.3], "metallic": 0.2, "roughness": 0.5}}
+    return {"scene": {
+        "seed": seed,
+        "camera": {"position": [0.0, 0.0, 60.0], "look_at": [0.0, 0.0, 0.0], "up_vector": [0.0, 1.0, 0.0],
+                   "field_of_view": 45.0, "near_clip": 0.1, "far_clip": 500.0},
+        "lights": [{"type": "directional", "direction": [-0.3, -0.5, -1.0], "color": [1.0, 1.0, 1.0],
+                    "intensity": 3.0}],
+        "spiral_container": {"pattern": "spiral", "radius_start": 1.0, "radius_end": radius_end,
+                             "spiral_turns": turns, "objects": [cube] * count},
+    }}
+
+
+def bench_culling(args):
+    """Frame time with and without BVH frustum culling for a large spiral of objects (instanced path)."""
+    import json
+    import tempfile
+    from OpenGL import GL
+    from render import Renderer
+    from transform import transform_system
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config:
+        json.dump(spiral_config(args.count), config)
+    print(f"{'culling':>8}{'objects':>10}{'visible':>10}{'ms/frame':>12}{'cull ms':>10}")
+    for culling in (False, True):
+        renderer = Renderer(args.width, args.height, backend=args.backend, config_file=config.name, offline=True,
+                            profile=args.profile, instanced=True, culling=culling)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            renderer.initialize()
+            times = []
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                renderer.render(0.0)
+                GL.glFinish()
+                times.append(time.perf_counter() - start)
+            scene = renderer.scene
+            cull = time_call(scene.culler.cull, scene.objects, scene.view, scene.projection) if culling else 0.0
+            stats = dict(renderer.frame_stats)
+            renderer.cleanup()
+        # Free the rows so the next run transforms only its own objects
+        for obj in reversed(scene.objects):
+            transform_system.remove(obj.row)
+        print(f"{'on' if culling else 'off':>8}{stats['objects']:>10}{stats['visible']:>10}"
+              f"{np.median(times) * 1000.0:>12.1f}{cull * 1000.0:>10.2f}")
+    os.remove(config.name)
+
+
+RELOAD_EDITS = ('material', 'geometry', 'light', 'camera', 'remove')
+
+
+def edit_config(config, edit, index):
+    """Copy of a spiral_config scene with one change of kind `edit` (one of RELOAD_EDITS) at object `index`."""
+    scene = dict(config["scene"])
+    spiral = dict(scene["spiral_container"])
+    objects = list(spiral["objects"])
+    if edit == 'material':
+        objects[index] = dict(objects[index], properties=dict(objects[index]["properties"], albedo=[0.9, 0.1, 0.1]))
+    elif edit == 'geometry':
+        objects[index] = dict(objects[index], type="icosahedron")
+    elif edit == 'light':
+        scene["lights"] = [dict(scene["lights"][0], intensity=5.0)]
+    elif edit == 'camera':
+        scene["camera"] = dict(scene["camera"], position=[0.0, 10.0, 60.0])
+    elif edit == 'remove':
+        del objects[index]
+    scene["spiral_container"] = dict(spiral, objects=objects)
+    return {"scene": scene}
+
+
+def bench_reload(args):
+    """Hot-reload latency for one-property edits of a large scene, versus building the scene from scratch."""
+    import json
+    import tempfile
+    from genesis import Genesis
+    from mesh import mesh_registry
+    from render import Renderer
+    from transform import transform_system
+
+    config = spiral_config(args.count)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config_file:
+        json.dump(config, config_file, indent=2)
+    base = json.dumps(config, indent=2)
+    renderer = Renderer(args.width, args.height, backend=args.backend, config_file=config_file.name, offline=True,
+                        profile=args.profile, instanced=True)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        renderer.initialize()
+        renderer.render(0.0)
+    print(f"{args.count} objects, {len(base) / 1e6:.2f} MB config")
+    print(f"{'edit':<10}{'parse ms':>10}{'apply ms':>10}{'revert ms':>11}{'meshes':>8}  changes")
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = []
+        for edit in args.edits:
+            text = json.dumps(edit_config(config, edit, args.count // 2), indent=2)
+            start = time.perf_counter()
+            edited = json.loads(text)
+            parse = time.perf_counter() - start
+            start = time.perf_counter()
+            changes = renderer.reload(edited)
+            apply = time.perf_counter() - start
+            renderer.render(0.0)
+            meshes = len(mesh_registry.meshes)
+            original = json.loads(base)
+            start = time.perf_counter()
+            renderer.reload(original)
+            revert = time.perf_counter() - start
+            renderer.render(0.0)
+            results.append((edit, parse, apply, revert, meshes, changes))
+
+        # Reference: what a reload without diffing costs, building every object again
+        start = time.perf_counter()
+        genesis = Genesis(config_file.name, seed=0)
+        genesis.load()
+        rebuild = time.perf_counter() - start
+        for obj in reversed(genesis.elements["objects"]):
+            obj.cleanup()
+        renderer.cleanup()
+    for edit, parse, apply, revert, meshes, changes in results:
+        summary = ", ".join(f"{k} {v}" for k, v in changes.items() if v and k != "structure")
+        print(f"{edit:<10}{parse * 1000.0:>10.1f}{apply * 1000.0:>10.2f}{revert * 1000.0:>11.2f}{meshes:>8}  {summary}")
+    print(f"{'rebuild':<10}{'':>10}{rebuild * 1000.0:>10.1f}  (Genesis.load of the whole scene)")
+    for obj in reversed(renderer.scene.objects):
+        transform_system.remove(obj.row)
+    os.remove(config_file.name)
+
+
+def varied_spiral_config(count, shapes, seed=0):
+    """spiral_config with spheres of `shapes` distinct radii instead of one cube, so many meshes are generated."""
+    config = spiral_config(count, seed=seed)
+    spheres = [{"type": "sphere", "radius": 0.5 + 0.5 * k / shapes, "lat_steps": 24, "lon_steps": 24,
+                "properties": {"albedo": [0.7, 0.5, 0.3], "metallic": 0.2, "roughness": 0.5}}
+               for k in range(shapes)]
+    config["scene"]["spiral_container"]["objects"] = [spheres[i % shapes] for i in range(count)]
+    return config
+
+
+def bench_snapshot(args):
+    """Scene startup time from the JSON config versus from a binary snapshot of the same scene."""
+    import json
+    import tempfile
+    from genesis import Genesis
+    from mesh import mesh_registry
+    from transform import transform_system
+
+    create_gl_context(args)
+    print(f"{'objects':>8}{'meshes':>8}{'json MB':>9}{'snap MB':>9}{'save ms':>9}{'json ms':>10}{'snap ms':>9}"
+          f"{'speedup':>9}  identical")
+    for count in args.counts:
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config:
+            json.dump(varied_spiral_config(count, args.shapes), config, indent=2)
+        snapshot = config.name[:-len('.json')] + '.snap'
+
+        start = time.perf_counter()
+        genesis = Genesis(config.name, seed=0)
+        genesis.load()
+        load = time.perf_counter() - start
+        meshes = len(mesh_registry.meshes)
+        start = time.perf_counter()
+        genesis.save_snapshot(snapshot)
+        save = time.perf_counter() - start
+        rows = [obj.row for obj in genesis.elements["objects"]]
+        expected = transform_system.origin_position[rows].copy()
+        for obj in reversed(genesis.elements["objects"]):
+            obj.cleanup()
+
+        # The snapshot was just written, so its pages are in the OS cache like a recently used file would be
+        start = time.perf_counter()
+        restored = Genesis(config.name, seed=0)
+        restored.load_snapshot(snapshot)
+        restore = time.perf_counter() - start
+        rows = [obj.row for obj in restored.elements["objects"]]
+        identical = (len(mesh_registry.meshes) == meshes and
+                     np.array_equal(transform_system.origin_position[rows], expected))
+        for obj in reversed(restored.elements["objects"]):
+            obj.cleanup()
+
+        print(f"{count:>8}{meshes:>8}{os.path.getsize(config.name) / 1e6:>9.2f}"
+              f"{os.path.getsize(snapshot) / 1e6:>9.2f}{save * 1000.0:>9.1f}{load * 1000.0:>10.1f}"
+              f"{restore * 1000.0:>9.1f}{load / restore:>8.1f}x  {identical}")
+        os.remove(config.name)
+        os.remove(snapshot)
+
+
+def write_texture_set(directory, index, size, seed=0):
+    """Write a diffuse, normal and specular PNG of `size` squared texels and return their "texture_maps" entry."""
+    import imageio.v2 as imageio
+
+    rng = np.random.default_rng(seed + index)
+    y, x = np.mgrid[0:size, 0:size]
+    tiles = ((x // 64 + y // 64) % 2).astype(np.uint8)[..., None]
+    noise = rng.integers(0, 48, (size, size, 1), dtype=np.uint8)
+    colour = rng.integers(80, 200, 3, dtype=np.uint8)
+    maps = {
+        "diffuse_map": np.where(tiles, colour, 255 - colour) - noise,
+        "normal_map": np.concatenate([128 + noise - 24, 128 + noise[::-1] - 24, np.full_like(noise, 255)], axis=2),
+        "specular_map": np.concatenate([np.zeros_like(tiles), 90 + 160 * tiles, 255 * tiles], axis=2),
+    }
+    entry = {}
+    for slot, image in maps.items():
+        path = os.path.join(directory, f"{slot}_{index}.png")
+        imageio.imwrite(path, image.astype(np.uint8))
+        entry[slot] = path
+    return entry
+
+
+def bench_textures(args):
+    """Frame times while a camera pans over spheres with their own maps: decoding on the render thread vs streamed.
+
+    Frames are paced to --fps like a live window, so the decoder threads get the time left over in each frame.
+    """
+    import json
+    import tempfile
+    from OpenGL import GL
+    from render import Renderer
+    from transform import transform_system
+
+    directory = tempfile.mkdtemp()
+    spacing = 3.0
+    sphere = {"type": "sphere", "radius": 1.0, "properties": {"albedo": [1.0, 1.0, 1.0], "metallic": 0.2,
+                                                               "roughness": 0.5}}
+    objects = [dict(sphere, texture_maps=write_texture_set(directory, i, args.size)) for i in range(args.count)]
+    config = {"scene": {
+        "seed": 0,
+        "camera": {"position": [0.0, -6.0, 3.0], "look_at": [0.0, 0.0, 0.0], "up_vector": [0.0, 0.0, 1.0],
+                   "field_of_view": 50.0, "near_clip": 0.1, "far_clip": 100.0},
+        "lights": [{"type": "directional", "direction": [-0.3, 0.5, -1.0], "color": [1.0, 1.0, 1.0],
+                    "intensity": 3.0}],
+        "grid_container": {"pattern": "grid", "columns": args.count, "rows": 1, "spacing": [spacing, 0.0, 0.0],
+                           "objects": objects},
+    }}
+    config_path = os.path.join(directory, "scene.json")
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    files = sum(os.path.getsize(path) for entry in objects for path in entry["texture_maps"].values())
+    print(f"{args.count} spheres x 3 maps of {args.size}^2 ({files / 2**20:.0f} MB of PNG), "
+          f"{args.budget} MB texture budget, {args.frames} frames at {args.fps} fps panning across")
+    print(f"{'mode':<14}{'first ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'placeholder':>13}{'decoded':>9}"
+          f"{'evicted':>9}{'peak MB':>9}")
+
+    modes = {"render-thread": {"synchronous": True}, "streamed": {"synchronous": False, "workers": args.workers}}
+    for mode, options in modes.items():
+        renderer = Renderer(args.width, args.height, backend=args.backend, config_file=config_path, offline=True,
+                            profile=args.profile, texture_options=dict(options, memory_budget=args.budget * 2**20))
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            renderer.initialize()
+            camera = renderer.scene.camera
+            streamer = renderer.texture_streamer
+            times, placeholder_frames, peak = [], 0, 0.0
+            for frame in range(args.frames):
+                x = (args.count - 1) * spacing * frame / max(1, args.frames - 1)
+                camera.position = np.array([x, -6.0, 3.0], dtype=np.float32)
+                camera.look_at = np.array([x, 0.0, 0.0], dtype=np.float32)
+                start = time.perf_counter()
+                renderer.render(0.0)
+                GL.glFinish()
+                times.append(time.perf_counter() - start)
+                time.sleep(max(0.0, 1.0 / args.fps - times[-1]))
+                placeholder_frames += streamer.stats["pending"] > 0
+                peak = max(peak, streamer.stats["resident_mb"])
+            stats = dict(streamer.stats)
+            scene = renderer.scene
+            renderer.cleanup()
+        for obj in reversed(scene.objects):
+            transform_system.remove(obj.row)
+        times = np.array(times) * 1000.0
+        print(f"{mode:<14}{times[0]:>10.1f}{np.median(times[1:]):>9.2f}{np.percentile(times[1:], 99):>9.2f}"
+              f"{times[1:].max():>9.2f}{placeholder_frames:>13}{stats['decoded']:>9}{stats['evicted']:>9}"
+              f"{peak:>9.1f}")
+    for entry in objects:
+        for path in entry["texture_maps"].values():
+            os.remove(path)
+    os.remove(config_path)
+    os.rmdir(directory)
+
+
+def grid_config(columns, rows, spacing=3.0, seed=0):
+    """Scene config: a `columns` x `rows` GridContainer of spheres seen at an angle, from near to far."""
+    sphere = {"type": "sphere", "radius": 1.0, "properties": {"albedo": [0.6, 0.6, 0.7], "metallic": 0.4,
+                                                               "roughness": 0.4}}
+    centre_x = (columns - 1) * spacing / 2.0
+    return {"scene": {
+        "seed": seed,
+        "camera": {"position": [centre_x, -12.0, 10.0], "look_at": [centre_x, rows * spacing / 3.0, 0.0],
+                   "up_vector": [0.0, 0.0, 1.0], "field_of_view": 60.0, "near_clip": 0.1,
+                   "far_clip": 2.0 * rows * spacing},
+        "lights": [{"type": "directional", "direction": [-0.3, 0.5, -1.0], "color": [1.0, 1.0, 1.0],
+                    "intensity": 3.0}],
+        "grid_container": {"pattern": "grid", "columns": columns, "rows": rows,
+                           "spacing": [spacing, spacing, 0.0], "objects": [sphere] * (columns * rows)},
+    }}
+
+
+def bench_lod(args):
+    """Triangles submitted and frame time with and without LOD meshes for a large grid of spheres."""
+    import json
+    import tempfile
+    from OpenGL import GL
+    from render import Renderer
+    from transform import transform_system
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config:
+        json.dump(grid_config(args.columns, args.rows), config)
+    print(f"{'lod':>6}{'objects':>10}{'visible':>10}{'triangles':>12}{'ms/frame':>12}")
+    for lod in (False, True):
+        renderer = Renderer(args.width, args.height, backend=args.backend, config_file=config.name, offline=True,
+                            profile=args.profile, instanced=args.instanced, lod=lod, count_triangles=True)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            renderer.initialize()
+            times = []
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                renderer.render(0.0)
+                GL.glFinish()
+                times.append(time.perf_counter() - start)
+            scene = renderer.scene
+            stats = dict(renderer.frame_stats)
+            levels = np.bincount([obj.lod for obj in scene.objects], minlength=len(scene.objects[0].lods))
+            renderer.cleanup()
+        for obj in reversed(scene.objects):
+            transform_system.remove(obj.row)
+        print(f"{'on' if lod else 'off':>6}{stats['objects']:>10}{stats['visible']:>10}{stats['triangles']:>12}"
+              f"{np.median(times) * 1000.0:>12.1f}   objects per level {levels.tolist()}")
+    os.remove(config.name)
+
+
+def bench_logging(args):
+    """Frame time of a 1k-object scene per log setting; 'dump' logs every object every frame like the old prints."""
+    import json
+    import tempfile
+    from OpenGL import GL
+    from log import configure
+    from render import Renderer
+    from transform import transform_system
+
+    settings = {"info": ("info", 0), "debug": ("debug", 0), "sampled": ("info", args.sample),
+                "dump": ("debug", 1)}
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config:
+        json.dump(grid_config(args.columns, args.rows), config)
+    print(f"{'logging':>10}{'objects':>10}{'ms/frame':>12}")
+    for name in args.modes:
+        configure(*settings[name])
+        renderer = Renderer(args.width, args.height, backend=args.backend, config_file=config.name, offline=True,
+                            profile=args.profile)
+        # Records go to stdout, which is discarded: this measures producing them, not the terminal
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            renderer.initialize()
+            times = []
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                renderer.render(0.0)
+                GL.glFinish()
+                times.append(time.perf_counter() - start)
+            objects = renderer.scene.objects
+            renderer.cleanup()
+        for obj in reversed(objects):
+            transform_system.remove(obj.row)
+        print(f"{name:>10}{len(objects):>10}{np.median(times) * 1000.0:>12.1f}")
+    os.remove(config.name)
+
+
+# name: (PyOpenGL per-call checking, error mode, KHR_debug allowed)
+ERROR_CONFIGS = {
+    "pyopengl+poll": (True, "strict", False),  # The old behaviour: glGetError after every call and every draw
+    "strict-poll": (False, "strict", False),
+    "strict-debug": (False, "strict", True),
+    "frame": (False, "frame", True),
+    "off": (False, "off", True),
+}
+
+
+def bench_gl_errors(args):
+    """Per-frame CPU time of a 1k-cube scene for each GL error-checking configuration (per-object path)."""
+    import subprocess
+    import sys
+
+    if args.child:
+        return run_gl_errors_child(args)
+    print(f"{'configuration':>16}{'ms/frame':>12}{'glGetError/frame':>18}{'errors':>8}")
+    for name in args.configs:
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), '--backend', args.backend,
+                                 '--profile', args.profile, 'errors', '--child', name,
+                                 '--count', str(args.count), '--frames', str(args.frames)],
+                                capture_output=True, text=True, check=True)
+        milliseconds, checks, errors = result.stdout.split()[-3:]
+        print(f"{name:>16}{milliseconds:>12}{checks:>18}{errors:>8}")
+
+
+def run_gl_errors_child(args):
+    """One configuration in a fresh process: PyOpenGL reads its checking flag when OpenGL.GL is imported."""
+    import json
+    import tempfile
+
+    pyopengl, mode, debug_output = ERROR_CONFIGS[args.child]
+    select_error_checking(pyopengl)
+    import glerrors
+    import instancing
+    import mesh
+    import objects
+    import pbr_shaders
+    import render
+    import scene
+    import state
+    import uniform_blocks
+    from glstats import GLCallCounter
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config:
+        json.dump(spiral_config(args.count), config)
+    renderer = render.Renderer(64, 36, backend=args.backend, config_file=config.name, offline=True,
+                               profile=args.profile, lod=False, culling=False, error_mode=mode)
+    counter = GLCallCounter([render, scene, objects, mesh, instancing, pbr_shaders, state, uniform_blocks, glerrors])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        renderer.initialize()
+        glerrors.gl_errors.install(mode, debug_output=debug_output)
+        times = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            renderer.render(0.0)
+            times.append(time.perf_counter() - start)
+        # One more frame under the call counter; with PyOpenGL checking every wrapped call adds a glGetError
+        with counter:
+            renderer.render(0.0)
+            counts = counter.reset()
+        renderer.cleanup()
+    os.remove(config.name)
+    checks = counts['glGetError'] + (sum(counts.values()) if pyopengl else 0)
+    print(f"{np.median(times) * 1000.0:.2f} {checks} {glerrors.gl_errors.errors}")
+
+
+# Shader start-up configurations: (program binary cache, driver shader cache). Each runs in a new process
+# with its own empty driver cache directory unless the driver cache is meant to be warm.
+SHADER_CACHE_CONFIGS = {
+    "cold": (False, False),         # Compile and link everything from source
+    "driver-cache": (False, True),  # Only Mesa's on-disk cache of compiled shaders
+    "warm": (True, False),          # Program binaries stored by a previous run
+}
+
+
+def bench_shaders(args):
+    """Start-up time to build every shader variant, compiled from source versus restored from cached binaries."""
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+
+    if args.child:
+        return run_shaders_child(args)
+    root = tempfile.mkdtemp(prefix="anima-shaders-")
+    program_cache = os.path.join(root, "programs")
+    driver_cache = os.path.join(root, "driver")
+    try:
+        # One untimed run fills both caches for the warm configurations
+        run = [sys.executable, os.path.abspath(__file__), '--backend', args.backend, '--profile', args.profile,
+               'shaders', '--cache-dir', program_cache, '--child']
+        subprocess.run(run + ['fill'], env=dict(os.environ, MESA_SHADER_CACHE_DIR=driver_cache),
+                       capture_output=True, text=True, check=True)
+        print(f"{'configuration':>14}{'variants':>10}{'ms':>10}{'ms/variant':>12}{'binaries':>10}")
+        for name in args.configs:
+            programs, driver = SHADER_CACHE_CONFIGS[name]
+            env = dict(os.environ, MESA_SHADER_CACHE_DIR=driver_cache if driver else tempfile.mkdtemp(dir=root))
+            result = subprocess.run(run + [name if programs else 'compile'], env=env,
+                                    capture_output=True, text=True, check=True)
+            variants, milliseconds, hits = result.stdout.split()[-3:]
+            print(f"{name:>14}{variants:>10}{float(milliseconds):>10.1f}{float(milliseconds) / int(variants):>12.2f}"
+                  f"{hits:>10}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_shaders_child(args):
+    """Build every variant once in a fresh context and print the count, milliseconds and cache hits."""
+    from pbr_shaders import SHADER_VARIANTS, ShaderManager
+
+    backend = create_backend(args.backend)
+    backend.initialize(64, 64, visible=False, core_profile=args.profile == 'core')
+    manager = ShaderManager(args.profile, cache_dir=None if args.child == 'compile' else args.cache_dir)
+    variants = manager.permutations(SHADER_VARIANTS)
+    start = time.perf_counter()
+    manager.preload(variants)
+    elapsed = time.perf_counter() - start
+    manager.delete()
+    backend.cleanup()
+    print(f"{len(variants)} {elapsed * 1000.0:.2f} {manager.cache_hits}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anima Fresnel micro-benchmarks")
+    parser.add_argument('--backend', choices=['glfw', 'egl', 'osmesa'], default='glfw',
+                        help="OpenGL context backend for benchmarks that render")
+    parser.add_argument('--profile', choices=['compat', 'core'], default='compat',
+                        help="OpenGL context profile and shader variant for benchmarks that render")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    geometry = subparsers.add_parser('geometry', help=bench_geometry.__doc__)
+    geometry.add_argument('--steps', type=int, nargs='+', default=[10, 50, 100, 250, 500])
+    geometry.add_argument('--repeat', type=int, default=5)
+    geometry.set_defaults(func=bench_geometry)
+
+    submission = subparsers.add_parser('submission', help=bench_submission.__doc__)
+    submission.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    submission.add_argument('--frames', type=int, default=3)
+    submission.add_argument('--shape', default='cube')
+    submission.set_defaults(func=bench_submission)
+
+    transforms = subparsers.add_parser('transforms', help=bench_transforms.__doc__)
+    transforms.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000])
+    transforms.add_argument('--repeat', type=int, default=10)
+    transforms.add_argument('--max-per-object', type=int, default=10000,
+                            help="skip the slow per-object path above this many objects")
+    transforms.set_defaults(func=bench_transforms)
+
+    layouts = subparsers.add_parser('layouts', help=bench_layouts.__doc__)
+    layouts.add_argument('--layouts', nargs='+', default=['grid', 'circle', 'spiral', 'fibonacci', 'lattice',
+                                                          'poisson', 'phyllotaxis'])
+    layouts.add_argument('--counts', type=int, nargs='+', default=[1000, 100000, 1000000])
+    layouts.add_argument('--repeat', type=int, default=3)
+    layouts.add_argument('--max-per-object', type=int, default=1000000,
+                         help="skip the slow per-object path above this many objects")
+    layouts.set_defaults(func=bench_layouts)
+
+    animation = subparsers.add_parser('animation', help=bench_animation.__doc__)
+    animation.add_argument('--count', type=int, default=10000)
+    animation.add_argument('--keys', type=int, default=100)
+    animation.add_argument('--frames', type=int, default=50)
+    animation.add_argument('--interpolations', nargs='+', default=['step', 'linear', 'cubic'])
+    animation.add_argument('--modes', nargs='+', default=['once', 'loop', 'pingpong'])
+    animation.set_defaults(func=bench_animation)
+
+    recorder = subparsers.add_parser('recorder', help=bench_recorder.__doc__)
+    recorder.add_argument('--modes', nargs='+', default=['png', 'stream'])
+    recorder.add_argument('--frames', type=int, default=300)
+    recorder.add_argument('--width', type=int, default=2880)
+    recorder.add_argument('--height', type=int, default=1800)
+    recorder.add_argument('--fps', type=int, default=30)
+    recorder.add_argument('--preset', default='slow')
+    recorder.add_argument('--workers', type=int, nargs='*', default=[os.cpu_count()],
+                          help="also run the PNG mode with these process pool sizes")
+    recorder.set_defaults(func=bench_recorder)
+
+    smoke = subparsers.add_parser('smoke', help=smoke_headless.__doc__)
+    smoke.add_argument('--instanced', action='store_true')
+    smoke.add_argument('--clustered', action='store_true')
+    smoke.add_argument('--config', default='world_config.json')
+    smoke.add_argument('--frames', type=int, default=3)
+    smoke.add_argument('--width', type=int, default=320)
+    smoke.add_argument('--height', type=int, default=200)
+    smoke.add_argument('--seed', type=int, default=0)
+    smoke.add_argument('--min-checksum', type=float, default=2.0, help="lowest acceptable mean byte value")
+    smoke.add_argument('--max-checksum', type=float, default=60.0, help="highest acceptable mean byte value")
+    smoke.set_defaults(func=smoke_headless)
+
+    lights = subparsers.add_parser('lights', help=bench_lights.__doc__)
+    lights.add_argument('--counts', type=int, nargs='+', default=[10, 100, 1000])
+    lights.add_argument('--modes', nargs='+', default=['array', 'clustered'])
+    lights.add_argument('--frames', type=int, default=10)
+    lights.add_argument('--width', type=int, default=960)
+    lights.add_argument('--height', type=int, default=540)
+    lights.set_defaults(func=bench_lights)
+
+    culling = subparsers.add_parser('culling', help=bench_culling.__doc__)
+    culling.add_argument('--count', type=int, default=100000)
+    culling.add_argument('--frames', type=int, default=5)
+    culling.add_argument('--width', type=int, default=960)
+    culling.add_argument('--height', type=int, default=540)
+    culling.set_defaults(func=bench_culling)
+
+    lod = subparsers.add_parser('lod', help=bench_lod.__doc__)
+    lod.add_argument('--columns', type=int, default=100)
+    lod.add_argument('--rows', type=int, default=100)
+    lod.add_argument('--frames', type=int, default=5)
+    lod.add_argument('--width', type=int, default=960)
+    lod.add_argument('--height', type=int, default=540)
+    lod.add_argument('--instanced', action='store_true')
+    lod.set_defaults(func=bench_lod)
+
+    logs = subparsers.add_parser('logging', help=bench_logging.__doc__)
+    logs.add_argument('--modes', nargs='+', default=['dump', 'debug', 'sampled', 'info'])
+    logs.add_argument('--sample', type=int, default=30, help="dump interval of the 'sampled' mode")
+    logs.add_argument('--columns', type=int, default=40)
+    logs.add_argument('--rows', type=int, default=25)
+    logs.add_argument('--frames', type=int, default=10)
+    logs.add_argument('--width', type=int, default=320)
+    logs.add_argument('--height', type=int, default=180)
+    logs.set_defaults(func=bench_logging)
+
+    errors = subparsers.add_parser('errors', help=bench_gl_errors.__doc__)
+    errors.add_argument('--configs', nargs='+', default=list(ERROR_CONFIGS), choices=list(ERROR_CONFIGS))
+    errors.add_argument('--child', choices=list(ERROR_CONFIGS), help=argparse.SUPPRESS)
+    errors.add_argument('--count', type=int, default=1000)
+    errors.add_argument('--frames', type=int, default=10)
+    errors.set_defaults(func=bench_gl_errors)
+
+    shaders = subparsers.add_parser('shaders', help=bench_shaders.__doc__)
+    shaders.add_argument('--configs', nargs='+', default=list(SHADER_CACHE_CONFIGS),
+                         choices=list(SHADER_CACHE_CONFIGS))
+    shaders.add_argument('--child', choices=['fill', 'compile', 'warm'], help=argparse.SUPPRESS)
+    shaders.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    shaders.set_defaults(func=bench_shaders)
+
+    reload = subparsers.add_parser('reload', help=bench_reload.__doc__)
+    reload.add_argument('--count', type=int, default=10000)
+    reload.add_argument('--edits', nargs='+', default=list(RELOAD_EDITS), choices=RELOAD_EDITS)
+    reload.add_argument('--width', type=int, default=320)
+    reload.add_argument('--height', type=int, default=180)
+    reload.set_defaults(func=bench_reload)
+
+    snapshot = subparsers.add_parser('snapshot', help=bench_snapshot.__doc__)
+    snapshot.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 50000])
+    snapshot.add_argument('--shapes', type=int, default=64, help='Distinct sphere radii in the scene')
+    snapshot.set_defaults(func=bench_snapshot)
+
+    textures = subparsers.add_parser('textures', help=bench_textures.__doc__)
+    textures.add_argument('--count', type=int, default=24, help='Spheres, each with its own three maps')
+    textures.add_argument('--size', type=int, default=1024, help='Texture width and height')
+    textures.add_argument('--budget', type=int, default=128, help='Texture memory budget in MB')
+    textures.add_argument('--workers', type=int, default=4, help='Decoder threads when streaming')
+    textures.add_argument('--frames', type=int, default=240)
+    textures.add_argument('--fps', type=int, default=30, help='Frame rate the frames are paced to')
+    textures.add_argument('--width', type=int, default=320)
+    textures.add_argument('--height', type=int, default=180)
+    textures.set_defaults(func=bench_textures)
+
+    glcalls = subparsers.add_parser('glcalls', help=count_gl_calls.__doc__)
+    glcalls.add_argument('--config', default='world_config.json')
+    glcalls.add_argument('--frames', type=int, default=3)
+    glcalls.add_argument('--width', type=int, default=320)
+    glcalls.add_argument('--height', type=int, default=200)
+    glcalls.add_argument('--instanced', action='store_true')
+    glcalls.set_defaults(func=count_gl_calls)
+
+    args = parser.parse_args()
+    select_platform(args.backend)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,164 @@
 import numpy as np
 
+from log import get_logger
 from objects import ObjectProperties
 
+log = get_logger("container")
+
+# Angle between successive points of the Fibonacci sphere and of phyllotaxis, 137.5 degrees
+GOLDEN_ANGLE = np.pi * (3.0 - np.sqrt(5.0))
+
+# Points per min_distance squared a Poisson-disk scatter aims for when it sizes its own region; a single
+# pass over the grid reaches about 0.5, a fully saturated scatter about 0.6
+POISSON_DENSITY = 0.45
+
+# Passes over the grid a Poisson-disk scatter makes at most before giving up on placing everything
+POISSON_ATTEMPTS = 8
+
+# Neighbour cells that can hold a point closer than min_distance when cells are min_distance / sqrt(2) wide,
+# nearest first so most rejected candidates are dropped after the first few tests
+POISSON_NEIGHBOURS = sorted(((dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)
+                             if (dx, dy) != (0, 0) and abs(dx) + abs(dy) < 4), key=lambda d: d[0] ** 2 + d[1] ** 2)
+
+
+def grid_positions(count, rows, columns, spacing):
+    """Row by row on the XY plane, at most rows * columns points."""
+    index = np.arange(min(count, rows * columns))
+    positions = np.zeros((len(index), 3), dtype=np.float32)
+    positions[:, 0] = index % columns * spacing[0]
+    positions[:, 1] = index // columns * spacing[1]
+    return positions
+
+
+def circle_positions(count, radius):
+    """Evenly spaced around a circle on the XY plane."""
+    angle = 2 * np.pi * np.arange(count) / count
+    positions = np.zeros((count, 3), dtype=np.float32)
+    positions[:, 0] = radius * np.cos(angle)
+    positions[:, 1] = radius * np.sin(angle)
+    return positions
+
+
+def spiral_positions(count, radius_start, radius_end, spiral_turns):
+    """Along an Archimedean spiral on the XY plane from `radius_start` to `radius_end`."""
+    t = np.arange(count) / max(count - 1, 1)  # Parameter t from 0 to 1; a single point sits at the start
+    angle = 2 * np.pi * spiral_turns * t
+    radius = radius_start + t * (radius_end - radius_start)
+    positions = np.zeros((count, 3), dtype=np.float32)
+    positions[:, 0] = radius * np.cos(angle)
+    positions[:, 1] = radius * np.sin(angle)
+    return positions
+
+
+def fibonacci_sphere_positions(count, radius):
+    """Near-uniform points on a sphere: equal-area latitude bands, successive points turned by the golden angle."""
+    index = np.arange(count)
+    y = 1.0 - 2.0 * (index + 0.5) / count
+    ring = np.sqrt(1.0 - y * y)
+    angle = GOLDEN_ANGLE * index
+    positions = np.empty((count, 3), dtype=np.float32)
+    positions[:, 0] = radius * ring * np.cos(angle)
+    positions[:, 1] = radius * y
+    positions[:, 2] = radius * ring * np.sin(angle)
+    return positions
+
+
+def lattice_positions(count, columns, rows, layers, spacing):
+    """Layer by layer in a 3D grid, row by row within a layer; at most columns * rows * layers points."""
+    index = np.arange(min(count, columns * rows * layers))
+    positions = np.empty((len(index), 3), dtype=np.float32)
+    positions[:, 0] = index % columns * spacing[0]
+    positions[:, 1] = index // columns % rows * spacing[1]
+    positions[:, 2] = index // (columns * rows) * spacing[2]
+    return positions
+
+
+def phyllotaxis_positions(count, scale, angle=GOLDEN_ANGLE):
+    """Vogel's sunflower model on the XY plane: point i at radius scale * sqrt(i), turned i * angle."""
+    index = np.arange(count)
+    radius = scale * np.sqrt(index)
+    theta = angle * index
+    positions = np.zeros((count, 3), dtype=np.float32)
+    positions[:, 0] = radius * np.cos(theta)
+    positions[:, 1] = radius * np.sin(theta)
+    return positions
+
+
+def poisson_disk_positions(count, min_distance, extent=None, rng=None, attempts=POISSON_ATTEMPTS):
+    """
+    Random points on the XY plane no closer than `min_distance` to each other (Poisson-disk scatter).
+
+    A spatial hash of cells min_distance / sqrt(2) wide holds at most one point each, so a candidate only
+    needs testing against the points of 20 neighbouring cells. Cells are processed in 9 interleaved phases
+    whose members are three cells apart and can never conflict, so every cell of a phase gets a candidate
+    at once and one pass tests them all together. Passes repeat until `count` points are placed.
+
+    :param extent: (width, height) of the region, starting at the origin; by default a square sized for
+                   POISSON_DENSITY points per min_distance squared.
+    :param rng: numpy Generator; a fresh unseeded one by default.
+    :param attempts: Passes over the grid at most; a region too small for `count` points yields fewer.
+    :return: (N, 3) positions in random order, N <= count.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if extent is None:
+        side = np.sqrt(count / POISSON_DENSITY) * min_distance
+        extent = (side, side)
+    width, height = extent
+    cell = min_distance / np.sqrt(2.0)
+    grid_width, grid_height = max(int(np.ceil(width / cell)), 1), max(int(np.ceil(height / cell)), 1)
+
+    # Flat grid padded by two cells on every side, so neighbour lookups never leave it. Each cell holds its
+    # point as x + iy; one complex gather fetches both coordinates
+    stride = grid_height + 4
+    empty = np.complex64(1e18)  # Farther than any candidate's neighbourhood
+    grid = np.full((grid_width + 4) * stride, empty, dtype=np.complex64)
+    neighbours = [(dx, dy, dx * stride + dy) for dx, dy in POISSON_NEIGHBOURS]
+    limit = np.float32(min_distance * min_distance)
+
+    phases = []
+    for a in range(3):
+        for b in range(3):
+            i, j = np.meshgrid(np.arange(a, grid_width, 3), np.arange(b, grid_height, 3), indexing='ij')
+            phases.append(((i + 2) * stride + j + 2).ravel().astype(np.int32))
+    filled = np.zeros(9, dtype=np.int64)  # Points per phase; neighbours in an unfilled phase need no test
+
+    placed = 0
+    for attempt in range(attempts):
+        for phase in rng.permutation(9):
+            cells = phases[phase]
+            if attempt:
+                cells = phases[phase] = cells[grid[cells] == empty]
+            # One candidate uniformly inside each cell
+            candidates = np.empty(len(cells), dtype=np.complex64)
+            candidates.real = (cells // stride - 2).astype(np.float32) + rng.random(len(cells), dtype=np.float32)
+            candidates.imag = (cells % stride - 2).astype(np.float32) + rng.random(len(cells), dtype=np.float32)
+            candidates *= np.float32(cell)
+            inside = (candidates.real < width) & (candidates.imag < height)
+            cells, candidates = cells[inside], candidates[inside]
+            a, b = divmod(int(phase), 3)
+            for dx, dy, offset in neighbours:
+                if not filled[(a + dx) % 3 * 3 + (b + dy) % 3]:
+                    continue
+                d = grid[cells + offset] - candidates
+                keep = d.real * d.real + d.imag * d.imag >= limit
+                cells, candidates = cells[keep], candidates[keep]
+            grid[cells] = candidates
+            filled[phase] += len(cells)
+            placed += len(cells)
+        if placed >= count:
+            break
+
+    points = grid[grid != empty]
+    if len(points) < count:
+        log.warning("Poisson-disk scatter fit %d of %d points; enlarge the extent or reduce min_distance",
+                    len(points), count)
+    # Random order, and a random subset when the last pass overshot
+    points = points[rng.permutation(len(points))[:count]]
+    positions = np.zeros((len(points), 3), dtype=np.float32)
+    positions[:, 0] = points.real
+    positions[:, 1] = points.imag
+    return positions
+
 class Container:
     def __init__(self, objects, spacing=(1.0, 1.0, 1.0), material_override=None):
         """
@@ -38,10 +195,31 @@ class Container:
                 obj.properties.ao = self.material_override.ao
 
 
-    def arrange_objects(self):
-        """Arrange objects in space according to the container's layout. Must be implemented by subclasses."""
+    def positions(self):
+        """
+        (N, 3) float32 positions of the first N objects under the container's layout, N <= len(objects).
+        Must be implemented by subclasses.
+        """
         raise NotImplementedError
 
+    def arrange_objects(self):
+        """
+        Place the objects by the container's layout, computed for all of them in one pass.
+
+        Positions go straight into the objects' transform rows: one slice assignment, since objects created
+        together occupy consecutive rows. Objects beyond the layout's capacity keep their position.
+        """
+        positions = self.positions()
+        placed = self.objects[:len(positions)]
+        if not placed:
+            return
+        transforms = placed[0].transforms
+        rows = np.fromiter((obj.row for obj in placed), dtype=np.intp, count=len(placed))
+        if np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+            transforms.position[rows[0]:rows[0] + len(rows)] = positions
+        else:
+            transforms.position[rows] = positions
+
     def draw(self, shader):
         """Draw all objects in the container."""
         for obj in self.objects:
@@ -66,16 +244,9 @@ class GridContainer(Container):
         self.columns = columns
         self.arrange_objects()
 
-    def arrange_objects(self):
-        """Arrange objects in a grid pattern."""
-        index = 0
-        for row in range(self.rows):
-            for col in range(self.columns):
-                if index >= len(self.objects):
-                    return
-                obj = self.objects[index]
-                obj.position = np.array([col * self.spacing[0], row * self.spacing[1], 0.0], dtype=np.float32)
-                index += 1
+    def positions(self):
+        """Grid pattern, row by row."""
+        return grid_positions(len(self.objects), self.rows, self.columns, self.spacing)
 
 class CircularContainer(Container):
     def __init__(self, objects, radius, material_override=None):
@@ -88,14 +259,9 @@ class CircularContainer(Container):
         self.radius = radius
         self.arrange_objects()
 
-    def arrange_objects(self):
-        """Arrange objects in a circular pattern."""
-        num_objects = len(self.objects)  # Use the length of objects, not an external num_objects parameter.
-        for i, obj in enumerate(self.objects):
-            angle = 2 * np.pi * i / num_objects
-            x = self.radius * np.cos(angle)
-            y = self.radius * np.sin(angle)
-            obj.position = np.array([x, y, 0.0])
+    def positions(self):
+        """Circular pattern."""
+        return circle_positions(len(self.objects), self.radius)
 
 class SpiralContainer(Container):
     def __init__(self, objects, radius_start, radius_end, spiral_turns, material_override=None):
@@ -112,14 +278,83 @@ class SpiralContainer(Container):
         self.spiral_turns = spiral_turns
         self.arrange_objects()
 
-    def arrange_objects(self):
-        """Arrange objects in a spiral pattern."""
-        num_objects = len(self.objects)  # Use the actual number of objects passed to the container.
-        radius_range = self.radius_end - self.radius_start
-        for i, obj in enumerate(self.objects):
-            t = i / (num_objects - 1)  # Parameter t from 0 to 1
-            angle = 2 * np.pi * self.spiral_turns * t
-            radius = self.radius_start + t * radius_range
-            x = radius * np.cos(angle)
-            y = radius * np.sin(angle)
-            obj.position = np.array([x, y, 0.0])
+    def positions(self):
+        """Spiral pattern."""
+        return spiral_positions(len(self.objects), self.radius_start, self.radius_end, self.spiral_turns)
+
+
+class FibonacciSphereContainer(Container):
+    def __init__(self, objects, radius, material_override=None):
+        """
+        FibonacciSphereContainer for spreading objects evenly over a sphere around the origin.
+
+        :param radius: Radius of the sphere.
+        """
+        super().__init__(objects, material_override=material_override)
+        self.radius = radius
+        self.arrange_objects()
+
+    def positions(self):
+        """Fibonacci sphere pattern."""
+        return fibonacci_sphere_positions(len(self.objects), self.radius)
+
+
+class LatticeContainer(Container):
+    def __init__(self, objects, columns, rows, layers, spacing=(2.0, 2.0, 2.0), material_override=None):
+        """
+        LatticeContainer for arranging objects in a 3D grid.
+
+        :param columns: Number of objects along X.
+        :param rows: Number of objects along Y.
+        :param layers: Number of objects along Z.
+        """
+        super().__init__(objects, spacing, material_override)
+        self.columns = columns
+        self.rows = rows
+        self.layers = layers
+        self.arrange_objects()
+
+    def positions(self):
+        """Lattice pattern, layer by layer."""
+        return lattice_positions(len(self.objects), self.columns, self.rows, self.layers, self.spacing)
+
+
+class PoissonDiskContainer(Container):
+    def __init__(self, objects, min_distance, extent=None, attempts=POISSON_ATTEMPTS, rng=None,
+                 material_override=None):
+        """
+        PoissonDiskContainer for scattering objects randomly on the XY plane with a minimum spacing.
+
+        :param min_distance: Smallest allowed distance between two objects' positions.
+        :param extent: (width, height) of the region from the origin; sized to the object count by default.
+        :param attempts: Passes the scatter makes at most; objects that do not fit keep their position.
+        :param rng: numpy Generator the scatter draws from.
+        """
+        super().__init__(objects, material_override=material_override)
+        self.min_distance = min_distance
+        self.extent = extent
+        self.attempts = attempts
+        self.rng = rng
+        self.arrange_objects()
+
+    def positions(self):
+        """Poisson-disk pattern."""
+        return poisson_disk_positions(len(self.objects), self.min_distance, self.extent, self.rng, self.attempts)
+
+
+class PhyllotaxisContainer(Container):
+    def __init__(self, objects, scale=1.0, angle=np.degrees(GOLDEN_ANGLE), material_override=None):
+        """
+        PhyllotaxisContainer for arranging objects like the seeds of a sunflower head.
+
+        :param scale: Spacing factor; object i sits at radius scale * sqrt(i).
+        :param angle: Turn between successive objects in degrees; the golden angle packs them most evenly.
+        """
+        super().__init__(objects, material_override=material_override)
+        self.scale = scale
+        self.angle = angle
+        self.arrange_objects()
+
+    def positions(self):
+        """Phyllotaxis pattern."""
+        return phyllotaxis_positions(len(self.objects), self.scale, np.radians(self.angle))
@@ -0,0 +1,245 @@
+import ctypes
+import os
+
+from log import get_logger
+
+log = get_logger("context")
+
+# PyOpenGL binds its function pointers on first import of OpenGL.GL, so the platform has to be chosen
+# before any module that does `from OpenGL.GL import *` is imported.
+PYOPENGL_PLATFORMS = {
+    'glfw': None,
+    'egl': 'egl',
+    'osmesa': 'osmesa',
+}
+
+# EGL_MESA_platform_surfaceless: a display that needs neither X11, Wayland nor a DRM device
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+# Context version requested for core-profile rendering (GLSL 3.30 shaders)
+CORE_PROFILE_VERSION = (3, 3)
+
+
+def select_platform(backend):
+    """Point PyOpenGL at the right GL loader for `backend`; call before importing render/scene/objects."""
+    if backend not in PYOPENGL_PLATFORMS:
+        raise ValueError(f"Unsupported context backend: {backend}")
+    platform = PYOPENGL_PLATFORMS[backend]
+    if platform:
+        os.environ['PYOPENGL_PLATFORM'] = platform
+
+
+def select_error_checking(pyopengl=False):
+    """
+    Turn PyOpenGL's glGetError after every wrapped call on or off. Call after select_platform and before
+    OpenGL.GL is imported. Off, the engine's own GLErrorPolicy decides when errors are looked at; on, every
+    failing call raises GLError where it was made, which is what --gl-errors strict wants.
+    """
+    import OpenGL
+    OpenGL.ERROR_CHECKING = pyopengl
+    if not pyopengl and os.environ.get('PYOPENGL_PLATFORM') == 'egl':
+        # PyOpenGL's EGL bindings only define their error checker when checking is on and then fail to import
+        from OpenGL.raw.EGL import _errors
+        if not hasattr(_errors, '_error_checker'):
+            _errors._error_checker = None
+
+
+class ContextBackend:
+    """An OpenGL context plus whatever surface it presents to."""
+    name = None
+    has_window = False
+
+    def __init__(self):
+        self.context = None
+
+    def initialize(self, width, height, visible=True, samples=0, core_profile=False):
+        """
+        Create the context and make it current. Raises on failure.
+
+        :param core_profile: Request a 3.3 core-profile context instead of the default compatibility one.
+        """
+        raise NotImplementedError
+
+    def make_current(self):
+        raise NotImplementedError
+
+    def swap_buffers(self):
+        pass
+
+    def poll_events(self):
+        pass
+
+    def should_close(self):
+        return False
+
+    def cleanup(self):
+        pass
+
+
+class GlfwBackend(ContextBackend):
+    name = 'glfw'
+    has_window = True
+
+    def __init__(self):
+        super().__init__()
+        import glfw
+        self.glfw = glfw
+        self.window = None
+
+    def initialize(self, width, height, visible=True, samples=0, core_profile=False):
+        glfw = self.glfw
+        if not glfw.init():
+            raise Exception("GLFW initialization failed")
+        log.info("GLFW initialized.")
+
+        if core_profile:
+            glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, CORE_PROFILE_VERSION[0])
+            glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, CORE_PROFILE_VERSION[1])
+            glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+            glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, glfw.TRUE)  # Required for core contexts on macOS
+
+        if not visible:
+            glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+        if samples:
+            glfw.window_hint(glfw.SAMPLES, samples)
+        self.window = glfw.create_window(width, height, "PBR Scene" if visible else "Offscreen", None, None)
+        log.info("Creating window with %dx%d", width, height)
+        if not self.window:
+            raise Exception("Failed to create GLFW window")
+
+        glfw.make_context_current(self.window)
+        self.context = glfw.get_current_context()
+
+    def make_current(self):
+        self.glfw.make_context_current(self.window)
+
+    def swap_buffers(self):
+        self.glfw.swap_buffers(self.window)
+
+    def poll_events(self):
+        self.glfw.poll_events()
+
+    def should_close(self):
+        return self.window and self.glfw.window_should_close(self.window)
+
+    def cleanup(self):
+        if self.window:
+            self.glfw.destroy_window(self.window)
+            self.window = None
+        log.info("Terminating GLFW")
+        self.glfw.terminate()
+
+
+class EglBackend(ContextBackend):
+    """Headless hardware or llvmpipe context through EGL, with no window system at all."""
+    name = 'egl'
+
+    def __init__(self):
+        super().__init__()
+        self.display = None
+
+    def initialize(self, width, height, visible=True, samples=0, core_profile=False):
+        from OpenGL import EGL
+
+        self.display = self.get_display(EGL)
+        if not EGL.eglInitialize(self.display, None, None):
+            raise Exception("EGL initialization failed")
+
+        # EGL_SURFACE_TYPE defaults to EGL_WINDOW_BIT, which a surfaceless display never offers
+        config_attributes = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                             EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        num_configs = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, config_attributes, ctypes.pointer(config), 1,
+                                   ctypes.pointer(num_configs)) or num_configs.value == 0:
+            # EGL_KHR_no_config_context: we only ever render into our own framebuffer objects
+            config = EGL.EGLConfig()
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = None
+        if core_profile:
+            context_attributes = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, CORE_PROFILE_VERSION[0],
+                                                  EGL.EGL_CONTEXT_MINOR_VERSION, CORE_PROFILE_VERSION[1],
+                                                  EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                                                  EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT, EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise Exception("Failed to create EGL context")
+        self.make_current()
+        log.info("EGL surfaceless context created.")
+
+    @staticmethod
+    def get_display(EGL):
+        """Prefer Mesa's surfaceless platform; fall back to the default display."""
+        try:
+            from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+            display = eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+            if display:
+                return display
+        except Exception:
+            pass
+        return EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+
+    def make_current(self):
+        from OpenGL import EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+
+    def cleanup(self):
+        if self.display is None:
+            return
+        from OpenGL import EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        if self.context is not None:
+            EGL.eglDestroyContext(self.display, self.context)
+            self.context = None
+        EGL.eglTerminate(self.display)
+        self.display = None
+
+
+class OSMesaBackend(ContextBackend):
+    """Pure software context rendering into a client-side buffer; needs only libOSMesa."""
+    name = 'osmesa'
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = None
+        self.size = None
+
+    def initialize(self, width, height, visible=True, samples=0, core_profile=False):
+        from OpenGL import arrays, osmesa
+
+        if core_profile:
+            attributes = (ctypes.c_int * 11)(osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA, osmesa.OSMESA_DEPTH_BITS, 24,
+                                             osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+                                             osmesa.OSMESA_CONTEXT_MAJOR_VERSION, CORE_PROFILE_VERSION[0],
+                                             osmesa.OSMESA_CONTEXT_MINOR_VERSION, CORE_PROFILE_VERSION[1], 0)
+            self.context = osmesa.OSMesaCreateContextAttribs(attributes, None)
+        else:
+            self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.context:
+            raise Exception("Failed to create OSMesa context")
+        self.buffer = arrays.GLubyteArray.zeros((height, width, 4))
+        self.size = (width, height)
+        self.make_current()
+        log.info("OSMesa context created.")
+
+    def make_current(self):
+        from OpenGL import GL, osmesa
+        width, height = self.size
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL.GL_UNSIGNED_BYTE, width, height):
+            raise Exception("Failed to make OSMesa context current")
+
+    def cleanup(self):
+        if self.context is not None:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
+            self.context = None
+
+
+BACKENDS = {backend.name: backend for backend in (GlfwBackend, EglBackend, OSMesaBackend)}
+
+
+def create_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unsupported context backend: {name}")
+    return BACKENDS[name]()
@@ -0,0 +1,167 @@
+import numpy as np
+
+# Objects per BVH leaf
+LEAF_SIZE = 32
+
+# Bounds of the padding leaves that complete the tree; finite so plane tests never produce NaN
+EMPTY_BOUND = 1e30
+
+
+def frustum_planes(view, projection):
+    """
+    The six view-frustum planes as (6, 4) rows (a, b, c, d), normalized, with a*x + b*y + c*z + d >= 0 inside.
+
+    :param view: View matrix in pyrr's row-vector convention.
+    :param projection: Projection matrix in pyrr's row-vector convention.
+    """
+    clip = (np.asarray(view, dtype=np.float64) @ np.asarray(projection, dtype=np.float64)).T
+    planes = np.array([clip[3] + clip[0], clip[3] - clip[0],
+                       clip[3] + clip[1], clip[3] - clip[1],
+                       clip[3] + clip[2], clip[3] - clip[2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+
+def morton_codes(points):
+    """30-bit Morton codes of `points` quantized to a 1024^3 grid over their bounding box."""
+    low = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - low, 1e-9)
+    cells = np.clip(((points - low) / extent * 1023.0).astype(np.uint32), 0, 1023)
+    codes = np.zeros(len(points), dtype=np.uint32)
+    for bit in range(10):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> bit) & 1) << (3 * bit + 2 - axis)
+    return codes
+
+
+class BVH:
+    def __init__(self, leaf_size=LEAF_SIZE):
+        """
+        Linear bounding volume hierarchy over bounding spheres.
+
+        build() sorts the spheres along a Morton curve once; leaves are runs of `leaf_size` consecutive
+        spheres and the tree above them is an implicit complete binary tree, so refit() recomputes every box
+        bottom-up with whole-level array operations. The topology only changes on rebuild; animated spheres
+        are handled by refitting, which keeps the tree correct though it may grow looser as objects move.
+        """
+        self.leaf_size = leaf_size
+        self.order = None
+        self.count = 0
+        self.depth = 0
+        self.lower = []  # Per level, (nodes, 3) box minimum
+        self.upper = []
+
+    def build(self, centers):
+        self.count = len(centers)
+        self.order = np.argsort(morton_codes(centers), kind='stable') if self.count else np.zeros(0, dtype=np.intp)
+        leaves = max(1, -(-self.count // self.leaf_size))
+        self.depth = int(np.ceil(np.log2(leaves))) if leaves > 1 else 0
+        self.leaf_starts = np.arange(0, self.count, self.leaf_size)
+
+    def refit(self, centers, radii):
+        """Recompute every node's box from spheres given in the original (unsorted) order."""
+        center = centers[self.order]
+        radius = radii[self.order][:, None]
+        leaf_count = 2 ** self.depth
+        lower = np.full((leaf_count, 3), EMPTY_BOUND)
+        upper = np.full((leaf_count, 3), -EMPTY_BOUND)
+        if self.count:
+            lower[:len(self.leaf_starts)] = np.minimum.reduceat(center - radius, self.leaf_starts, axis=0)
+            upper[:len(self.leaf_starts)] = np.maximum.reduceat(center + radius, self.leaf_starts, axis=0)
+
+        self.lower = [lower]
+        self.upper = [upper]
+        for _ in range(self.depth):
+            lower = np.minimum(lower[0::2], lower[1::2])
+            upper = np.maximum(upper[0::2], upper[1::2])
+            self.lower.insert(0, lower)
+            self.upper.insert(0, upper)
+        self.sorted_centers = center
+        self.sorted_radii = radius[:, 0]
+
+    @staticmethod
+    def classify(planes, lower, upper):
+        """(outside, inside) masks for boxes against the frustum planes."""
+        centre = (lower + upper) / 2.0
+        extent = (upper - lower) / 2.0
+        distance = centre @ planes[:, :3].T + planes[:, 3]
+        reach = extent @ np.abs(planes[:, :3]).T
+        return np.any(distance + reach < 0.0, axis=1), np.all(distance - reach >= 0.0, axis=1)
+
+    def query(self, planes):
+        """Indices, in the original order and ascending, of the spheres that intersect the frustum."""
+        visible = np.zeros(self.count + 1, dtype=np.int32)  # Range-marking difference array
+        partial_objects = []
+        nodes = np.zeros(1, dtype=np.intp)
+        for level in range(self.depth + 1):
+            outside, inside = self.classify(planes, self.lower[level][nodes], self.upper[level][nodes])
+
+            # Every object under a node entirely inside the frustum is visible without further tests
+            span = self.leaf_size << (self.depth - level)
+            contained = nodes[inside]
+            np.add.at(visible, np.minimum(contained * span, self.count), 1)
+            np.add.at(visible, np.minimum((contained + 1) * span, self.count), -1)
+
+            straddling = nodes[~outside & ~inside]
+            if level < self.depth:
+                nodes = np.concatenate([2 * straddling, 2 * straddling + 1])
+            else:
+                partial_objects = (straddling[:, None] * self.leaf_size + np.arange(self.leaf_size)).ravel()
+                partial_objects = partial_objects[partial_objects < self.count]
+
+        mask = np.cumsum(visible[:-1]) > 0
+        if len(partial_objects):
+            distance = self.sorted_centers[partial_objects] @ planes[:, :3].T + planes[:, 3]
+            mask[partial_objects] = np.all(distance >= -self.sorted_radii[partial_objects, None], axis=1)
+        return np.sort(self.order[mask])
+
+
+class FrustumCuller:
+    def __init__(self, transforms, leaf_size=LEAF_SIZE):
+        """
+        Culls scene objects against the view frustum through a BVH over their world-space bounding spheres.
+
+        :param transforms: TransformSystem the objects' model matrices and scales are read from.
+        """
+        self.transforms = transforms
+        self.bvh = BVH(leaf_size)
+        self.objects = None
+        self.object_count = 0
+        self.row_count = 0
+        self.visible_count = 0
+        self.culled_count = 0
+
+    def rebuild(self, objects):
+        """Gather the objects' rows and mesh bounds and rebuild the BVH topology."""
+        self.objects = objects
+        self.object_count = len(objects)
+        self.row_count = self.transforms.count
+        rows = np.fromiter((obj.row for obj in objects), dtype=np.intp, count=len(objects))
+        # Objects created together occupy consecutive rows; a slice reads them without a gather
+        contiguous = len(rows) and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows)))
+        self.rows = slice(rows[0], rows[0] + len(rows)) if contiguous else rows
+        self.local_centers = np.array([obj.mesh.bounding_center for obj in objects], dtype=np.float32).reshape(-1, 3)
+        self.local_radii = np.fromiter((obj.mesh.bounding_radius for obj in objects), dtype=np.float32,
+                                       count=len(objects))
+        self.centered = not np.any(self.local_centers)
+        self.bvh.build(self.world_spheres()[0])
+
+    def world_spheres(self):
+        """World-space bounding sphere centres and radii from the current model matrices."""
+        model = self.transforms.model_matrices[self.rows]
+        centers = model[:, 3, :3]
+        if not self.centered:
+            centers = centers + (self.local_centers[:, None, :] @ model[:, :3, :3])[:, 0]
+        # Rotation preserves length, so the largest scale factor bounds the stretched sphere
+        radii = self.local_radii * np.abs(self.transforms.scale[self.rows]).max(axis=1)
+        return centers, radii
+
+    def cull(self, objects, view, projection):
+        """Return the objects whose bounding sphere intersects the frustum, in their original order."""
+        # Removing transform rows relocates others, so a change in the row count invalidates the gathered rows
+        if objects is not self.objects or len(objects) != self.object_count or self.transforms.count != self.row_count:
+            self.rebuild(objects)
+        self.bvh.refit(*self.world_spheres())
+        indices = self.bvh.query(frustum_planes(view, projection))
+        self.visible_count = len(indices)
+        self.culled_count = self.object_count - self.visible_count
+        return [objects[i] for i in indices]
@@ -1,22 +1,65 @@
+import itertools
 import json
+import operator
+import os
 from objects import ObjectFactory, ObjectProperties
-from container import GridContainer, CircularContainer, SpiralContainer
+from container import (Container, GridContainer, CircularContainer, SpiralContainer, FibonacciSphereContainer,
+                       LatticeContainer, PoissonDiskContainer, PhyllotaxisContainer)
 from light import Light
 from camera import Camera
+from log import get_logger
+from snapshot import load_scene, save_scene
+from textures import TEXTURE_SLOTS
 import numpy as np
 
+log = get_logger("genesis")
+
+# Scene config key of each container type, in the order containers are built
+CONTAINER_TYPES = {
+    "grid_container": GridContainer,
+    "circular_container": CircularContainer,
+    "spiral_container": SpiralContainer,
+    "fibonacci_sphere_container": FibonacciSphereContainer,
+    "lattice_container": LatticeContainer,
+    "poisson_disk_container": PoissonDiskContainer,
+    "phyllotaxis_container": PhyllotaxisContainer,
+}
+
+# Object config keys that only change materials and motion; any other difference rebuilds the object's meshes
+OBJECT_STATE_KEYS = ("name", "properties", "texture_maps")
+
+# Container config keys that are not layout parameters
+CONTAINER_CONTENT_KEYS = ("material_override", "objects", "num_objects", "pattern")
+
 class Genesis:
-    def __init__(self, config_file):
+    def __init__(self, config_file, seed=None):
+        """
+        Build scene elements from a JSON config.
+
+        :param seed: Seed for initial object placement, used when the config's scene has no "seed" key.
+                     With neither, placement differs on every run.
+        """
         self.config_file = config_file
+        self.seed = seed
+        self.rng = None
+        self.config = None  # Scene section of the config the elements were last built from
+        self.sections = {}  # "objects" or container key -> objects created from that list, in config order
         self.elements = {
             "camera": None,
             "lights": [],
             "objects": []
         }
 
-    def load(self):
+    def read_config(self):
         with open(self.config_file, 'r') as f:
-            config = json.load(f)
+            return json.load(f)
+
+    def load(self):
+        config = self.read_config()
+
+        # Every random choice below draws from this generator so a seeded scene is reproducible
+        self.rng = np.random.default_rng(config["scene"].get("seed", self.seed))
+        self.config = config["scene"]
 
         # Load the camera
         if "camera" in config["scene"]:
@@ -27,24 +70,37 @@ class Genesis:
             self.elements["lights"].append(self.create_light(light_config))
 
         # Load individual objects
+        self.sections["objects"] = []
         for obj_config in config["scene"].get("objects", []):
             obj = self.create_object(obj_config)
             self.elements["objects"].append(obj)
+            self.sections["objects"].append(obj)
 
         # Load containers
-        if "grid_container" in config["scene"]:
-            self.elements["objects"].extend(self.create_container(config["scene"]["grid_container"], GridContainer))
-
-        if "circular_container" in config["scene"]:
-            self.elements["objects"].extend(self.create_container(config["scene"]["circular_container"], CircularContainer))
-
-        if "spiral_container" in config["scene"]:
-            self.elements["objects"].extend(self.create_container(config["scene"]["spiral_container"], SpiralContainer))
+        for key, container_class in CONTAINER_TYPES.items():
+            if key in config["scene"]:
+                self.sections[key] = self.create_container(config["scene"][key], container_class)
+                self.elements["objects"].extend(self.sections[key])
 
         # Handle animations (if needed, to attach to objects)
         if "animations" in config["scene"]:
             self.apply_animations(config["scene"]["animations"])
 
+    def save_snapshot(self, path):
+        """Write the loaded scene to a binary snapshot that load_snapshot restores without parsing or generating."""
+        save_scene(path, self.elements, source=self.config_file)
+        log.info("Saved %d objects to snapshot %s", len(self.elements["objects"]), path)
+
+    def load_snapshot(self, path):
+        """
+        Build the scene from a snapshot written by save_snapshot instead of from the config.
+
+        A snapshot scene has no config to diff against, so `reload` cannot be used on it.
+        """
+        self.elements, _ = load_scene(path)
+        self.sections = {"objects": list(self.elements["objects"])}
+        self.config = None
+
     def create_camera(self, config):
         return Camera(
             position=config["position"],
@@ -58,27 +114,37 @@ class Genesis:
     def create_light(self, config):
         light_type = config["type"]
         if light_type == "point":
-            return Light(position=np.array(config["position"], dtype=np.float32), color=np.array(config["color"], dtype=np.float32), intensity=config["intensity"], light_type="point")
+            return Light(position=np.array(config["position"], dtype=np.float32), color=np.array(config["color"], dtype=np.float32), intensity=config["intensity"], light_type="point", radius=config.get("radius"))
         elif light_type == "directional":
             return Light(direction=np.array(config["direction"], dtype=np.float32), color=np.array(config["color"], dtype=np.float32), intensity=config["intensity"], light_type="directional")
 
 
-    def create_object(self, config):
-        properties = ObjectProperties(
-            albedo=tuple(config["properties"].get("albedo", (1.0, 1.0, 1.0))),
-            metallic=config["properties"].get("metallic", 0.0),
-            roughness=config["properties"].get("roughness", 0.5),
-            ao=config["properties"].get("ao", 1.0),
-            rotation_speed=tuple(config["properties"].get("rotation_speed", (0.0, 0.0, 0.0))),
-            movement_speed=tuple(config["properties"].get("movement_speed", (0.0, 0.0, 0.0))),
-            scale_speed=tuple(config["properties"].get("scale_speed", (0.0, 0.0, 0.0))),
-            bounds=config["properties"].get("bounds")
+    @staticmethod
+    def create_properties(config):
+        return ObjectProperties(
+            albedo=tuple(config.get("albedo", (1.0, 1.0, 1.0))),
+            metallic=config.get("metallic", 0.0),
+            roughness=config.get("roughness", 0.5),
+            ao=config.get("ao", 1.0),
+            rotation_speed=tuple(config.get("rotation_speed", (0.0, 0.0, 0.0))),
+            movement_speed=tuple(config.get("movement_speed", (0.0, 0.0, 0.0))),
+            scale_speed=tuple(config.get("scale_speed", (0.0, 0.0, 0.0))),
+            bounds=config.get("bounds")
         )
 
-        texture_maps = config.get("texture_maps", {})
+    def create_object(self, config, index=None):
+        """
+        :param index: Number of objects created before this one in a full load, for the generated name
+                      (default: the objects loaded so far).
+        """
+        properties = self.create_properties(config["properties"])
+
+        texture_maps = self.texture_paths(config.get("texture_maps", {}))
 
         # Generate a unique name for the object or take it from the config if present
-        name = config.get("name", f"{config['type']}_{len(self.elements['objects'])}")
+        if index is None:
+            index = len(self.elements['objects'])
+        name = config.get("name", f"{config['type']}_{index}")
 
         # Extract shape-specific parameters like radius, lat_steps, etc.
         shape_specific_params = {}
@@ -88,6 +154,8 @@ class Genesis:
             shape_specific_params["lat_steps"] = config["lat_steps"]
         if "lon_steps" in config:
             shape_specific_params["lon_steps"] = config["lon_steps"]
+        if "lod" in config:
+            shape_specific_params["lod"] = config["lod"]
         # Add more shape-specific parameters as needed
 
         # Use the factory to create the object
@@ -100,22 +168,41 @@ class Genesis:
 
         # Assign the name to the object
         obj.name = name
+        obj.position = self.rng.random(3) * 10.0 - 5.0
 
         # Return the created object
         return obj
 
+    def texture_paths(self, texture_maps):
+        """The maps of an object's "texture_maps", with image paths taken relative to the config file."""
+        for slot in texture_maps:
+            if slot not in TEXTURE_SLOTS:
+                log.warning("Ignoring unknown texture map %r; expected one of %s", slot, ", ".join(TEXTURE_SLOTS))
+        base = os.path.dirname(os.path.abspath(self.config_file))
+        return {slot: os.path.normpath(os.path.join(base, path)) for slot, path in texture_maps.items()
+                if slot in TEXTURE_SLOTS}
 
-    def create_container(self, config, container_class):
+
+    def create_container(self, config, container_class, objects=None):
+        """
+        Create the container's objects and arrange them.
+
+        :param objects: Already created objects to arrange instead, one per entry of config["objects"].
+        """
         # Extract material override if present
         material_override = config.get("material_override")
 
         # List of objects defined within the container
-        objects = [self.create_object(obj_config) for obj_config in config["objects"]]
+        if objects is None:
+            objects = [self.create_object(obj_config) for obj_config in config["objects"]]
 
         # Create a copy of the config and remove unwanted keys like 'pattern' and 'objects'
-        config_copy = {k: v for k, v in config.items() if k not in ["material_override", "objects", "num_objects", "pattern"]}
+        config_copy = {k: v for k, v in config.items() if k not in CONTAINER_CONTENT_KEYS}
+        if container_class is PoissonDiskContainer:
+            # The scatter draws from the scene's generator so seeded scenes place it the same way every run
+            config_copy["rng"] = self.rng
 
-        # Instantiate the container class (GridContainer, CircularContainer, SpiralContainer)
+        # Instantiate the container class (one of CONTAINER_TYPES)
         container = container_class(
             objects=objects,
             material_override=material_override,
@@ -126,16 +213,242 @@ class Genesis:
 
 
 
-    def apply_animations(self, animations_config):
-        """Attach animations to objects from the animation config."""
+    def apply_animations(self, animations_config, names=None):
+        """
+        Attach keyframe animations to the objects they name.
+
+        Each entry has "object" (an object's name), "keyframes", and optionally "interpolation" ('step',
+        'linear' or 'cubic', or a dict of them per channel) and "mode" ('once', 'loop' or 'pingpong').
+
+        :param names: Only (re)animate the objects with these names, dropping the tracks they had first.
+        """
+        objects = {}
+        for obj in self.elements["objects"]:
+            if names is None or obj.name in names:
+                objects.setdefault(obj.name, []).append(obj)
+        if names is not None:
+            for obj in (obj for same_name in objects.values() for obj in same_name):
+                obj.detach_animation()
         for animation_config in animations_config:
             obj_name = animation_config["object"]
-            keyframes = animation_config["keyframes"]
+            if names is not None and obj_name not in names:
+                continue
+            if obj_name not in objects:
+                log.warning("Animation targets unknown object %r", obj_name)
+                continue
+            for obj in objects[obj_name]:
+                obj.attach_animation(animation_config["keyframes"],
+                                     interpolation=animation_config.get("interpolation", "linear"),
+                                     mode=animation_config.get("mode", "once"))
+
+    def reload(self, config):
+        """
+        Bring the loaded elements in line with `config` (as returned by read_config), touching only what changed.
+
+        Objects are matched to their previous config by name, or by position in their list when unnamed.
+        Changed materials, textures and speeds are updated in place; any other change (type, tessellation)
+        rebuilds the object, which keeps its current transform. Objects no longer in the config are cleaned
+        up, freeing the meshes nothing else uses. The camera, lights and container layouts update in place.
+        The seed is not re-applied: new objects draw from the generator where it left off.
+
+        :return: Counts of "updated", "rebuilt", "added" and "removed" objects, changed "lights" and
+                 re-arranged or re-coloured "containers", whether the "camera" changed, and whether the object
+                 list was replaced ("structure"), in which case elements["objects"] is a new list.
+        """
+        scene = config["scene"]
+        old = self.config
+        changes = {"updated": 0, "rebuilt": 0, "added": 0, "removed": 0, "lights": 0, "containers": 0,
+                   "camera": False, "structure": False}
+        created, retired = [], []
+
+        if scene.get("camera") != old.get("camera"):
+            changes["camera"] = True
+            camera = self.create_camera(scene["camera"]) if "camera" in scene else None
+            if camera is not None and self.elements["camera"] is not None:
+                vars(self.elements["camera"]).update(vars(camera))
+            else:
+                self.elements["camera"] = camera
+
+        if scene.get("lights", []) != old.get("lights", []):
+            changes["lights"] = self.reload_lights(old.get("lights", []), scene.get("lights", []))
+
+        index = 0  # Objects a full load would have created before the current section, for generated names
+        for key in ("objects",) + tuple(CONTAINER_TYPES):
+            if key == "objects":
+                old_section, new_section = old, scene
+            else:
+                old_section, new_section = old.get(key), scene.get(key)
+                if old_section is None and new_section is None:
+                    continue
+            old_configs = (old_section or {}).get("objects", [])
+            new_configs = (new_section or {}).get("objects", [])
+            added = changes["added"]
+            objects, touched, section_created = self.reload_objects(old_configs, new_configs,
+                                                                    self.sections.get(key, []), index,
+                                                                    key != "objects", changes, retired)
+            created.extend(section_created)
+            index += len(objects)
+
+            if key != "objects":
+                if new_section is None:
+                    self.sections.pop(key, None)
+                    continue
+                touched = self.reload_container(key, old_section or {}, new_section, objects, touched,
+                                                changes["added"] > added or len(objects) != len(old_configs), changes)
+            self.sections[key] = objects
+            if touched:
+                rows = np.fromiter((obj.row for obj in touched), dtype=np.intp, count=len(touched))
+                touched[0].transforms.anchor(rows)
+
+        if created or retired:
+            changes["structure"] = True
+            self.elements["objects"] = [obj for key in ("objects",) + tuple(CONTAINER_TYPES)
+                                        for obj in self.sections.get(key, [])]
+
+        # Objects created above need their tracks; entries that changed are re-attached to their targets
+        animations = scene.get("animations", [])
+        names = {obj.name for obj in created}
+        if animations != old.get("animations", []):
+            names |= self.animation_targets(old.get("animations", []), animations)
+        if names:
+            self.apply_animations(animations, names)
+
+        # Retired objects go last, so meshes they share with their replacements are never re-uploaded
+        for obj in retired:
+            obj.cleanup()
+        self.config = scene
+        return changes
+
+    def reload_lights(self, old_configs, new_configs):
+        """Update, add and drop lights by position in the list; returns how many changed."""
+        lights = self.elements["lights"]
+        changed = abs(len(new_configs) - len(old_configs))
+        for i, config in enumerate(new_configs[:len(old_configs)]):
+            if config != old_configs[i]:
+                vars(lights[i]).clear()
+                vars(lights[i]).update(vars(self.create_light(config)))
+                changed += 1
+        lights[len(new_configs):] = []
+        lights.extend(self.create_light(config) for config in new_configs[len(lights):])
+        return changed
+
+    def reload_objects(self, old_configs, new_configs, objects, index, contained, changes, retired):
+        """
+        Match one object list against its previous configs and apply the differences.
+
+        :param objects: Objects created from `old_configs`, in the same order.
+        :param index: Objects a full load creates before this list, for generated names.
+        :param contained: The list belongs to a container, whose objects all share the generated name `index`.
+        :param changes: Counters updated in place; replaced and removed objects are appended to `retired`.
+        :return: (objects for `new_configs` in order, objects whose state changed, newly created objects).
+        """
+        touched, created = [], []
+
+        def update(obj, old_config, new_config, position):
+            state = {k: v for k, v in new_config.items() if k not in OBJECT_STATE_KEYS}
+            if state == {k: v for k, v in old_config.items() if k not in OBJECT_STATE_KEYS}:
+                self.update_object(obj, new_config)
+                changes["updated"] += 1
+                touched.append(obj)
+                return obj
+            replacement = self.create_object(new_config, index if contained else index + position)
+            replacement.position = obj.position
+            replacement.rotation = obj.rotation
+            replacement.scale = obj.scale
+            retired.append(obj)
+            changes["rebuilt"] += 1
+            touched.append(replacement)
+            created.append(replacement)
+            return replacement
+
+        # Fast path: same length and names, so every object keeps its place in the list
+        if len(old_configs) == len(new_configs):
+            # compress/map keep the per-object comparison loop in C
+            changed = list(itertools.compress(range(len(new_configs)), map(operator.ne, old_configs, new_configs)))
+            if all(old_configs[i].get("name") == new_configs[i].get("name") for i in changed):
+                objects = list(objects) if changed else objects
+                for i in changed:
+                    objects[i] = update(objects[i], old_configs[i], new_configs[i], i)
+                return objects, touched, created
+
+        previous = {key: (config, obj) for key, config, obj in zip(self.object_keys(old_configs), old_configs,
+                                                                     objects)}
+        result = []
+        for i, (key, config) in enumerate(zip(self.object_keys(new_configs), new_configs)):
+            match = previous.pop(key, None)
+            if match is None:
+                obj = self.create_object(config, index if contained else index + i)
+                changes["added"] += 1
+                touched.append(obj)
+                created.append(obj)
+            elif match[0] != config:
+                obj = update(match[1], match[0], config, i)
+            else:
+                obj = match[1]
+            result.append(obj)
+        for _, obj in previous.values():
+            retired.append(obj)
+            changes["removed"] += 1
+        return result, touched, created
+
+    @staticmethod
+    def object_keys(configs):
+        """Identity of each config across reloads: its name and occurrence of that name, or else its index."""
+        seen = {}
+        keys = []
+        for i, config in enumerate(configs):
+            name = config.get("name")
+            if name is None:
+                keys.append(i)
+            else:
+                seen[name] = seen.get(name, -1) + 1
+                keys.append((name, seen[name]))
+        return keys
+
+    def update_object(self, obj, config):
+        """Apply the material, textures and speeds of `config` to `obj` without touching its meshes."""
+        properties = self.create_properties(config["properties"])
+        obj.properties = properties
+        texture_maps = self.texture_paths(config.get("texture_maps", {}))
+        obj.textures = tuple(texture_maps.get(slot) for slot in TEXTURE_SLOTS)
+        transforms = obj.transforms
+        transforms.rotation_speed[obj.row] = properties.rotation_speed
+        transforms.movement_speed[obj.row] = properties.movement_speed
+        transforms.scale_speed[obj.row] = properties.scale_speed
+
+    def reload_container(self, key, old_config, config, objects, touched, membership_changed, changes):
+        """
+        Re-arrange a container whose layout or membership changed and re-apply its material override.
+
+        :param touched: Objects of the container whose state changed already.
+        :return: The objects whose state changed.
+        """
+        layout = {k: v for k, v in config.items() if k not in CONTAINER_CONTENT_KEYS}
+        old_layout = {k: v for k, v in old_config.items() if k not in CONTAINER_CONTENT_KEYS}
+        override = config.get("material_override")
+        if layout != old_layout or membership_changed:
+            changes["containers"] += 1
+            self.create_container(config, CONTAINER_TYPES[key], objects)
+            return objects
+        if override != old_config.get("material_override"):
+            changes["containers"] += 1
+            # Back to each object's own material first, in case the override was dropped or sets fewer keys
+            for obj, obj_config in zip(objects, config["objects"]):
+                self.update_object(obj, obj_config)
+            touched = objects
+        if override and touched:
+            Container(touched, material_override=override)
+        return touched
 
-            # Find the object in the scene and attach the animation (pseudo-code)
-            for obj in self.elements["objects"]:
-                if obj.name == obj_name:
-                    obj.attach_animation(keyframes)
+    @staticmethod
+    def animation_targets(old_configs, new_configs):
+        """Names of the objects whose animation entries differ between two animation lists."""
+        old_entries, new_entries = {}, {}
+        for entries, configs in ((old_entries, old_configs), (new_entries, new_configs)):
+            for animation_config in configs:
+                entries.setdefault(animation_config["object"], []).append(animation_config)
+        return {name for name in old_entries.keys() | new_entries.keys()
+                if old_entries.get(name) != new_entries.get(name)}
 
     def get_elements(self):
         return self.elements
@@ -0,0 +1,110 @@
+import traceback
+
+from OpenGL.GL import *
+from OpenGL.raw.GL._types import GLDEBUGPROC
+
+from log import get_logger
+
+log = get_logger("gl")
+
+# 'off': never query errors. 'frame': drain glGetError once per frame. 'strict': report every error at the
+# call that raised it, through KHR_debug where the context has it, otherwise by polling after each draw step.
+ERROR_MODES = ('off', 'frame', 'strict')
+
+# Errors drained per poll at most; glGetError keeps returning errors until every flag is cleared
+MAX_ERRORS_PER_POLL = 32
+
+DEBUG_SEVERITIES = {
+    GL_DEBUG_SEVERITY_HIGH: "high",
+    GL_DEBUG_SEVERITY_MEDIUM: "medium",
+    GL_DEBUG_SEVERITY_LOW: "low",
+    GL_DEBUG_SEVERITY_NOTIFICATION: "notification",
+}
+
+
+class GLErrorPolicy:
+    def __init__(self, mode='frame'):
+        """
+        When and how the engine looks for GL errors.
+
+        Every glGetError is a round trip that makes the driver finish queued work, so outside strict mode the
+        render loop checks at most once per frame. PyOpenGL's own per-call checking is chosen separately, before
+        OpenGL.GL is imported (context.select_error_checking): main.py turns it off in the 'off' and 'frame'
+        modes and leaves it on in 'strict', where it raises at the failing call even without KHR_debug.
+
+        :param mode: One of ERROR_MODES.
+        """
+        if mode not in ERROR_MODES:
+            raise ValueError(f"Unsupported GL error mode: {mode}")
+        self.mode = mode
+        self.debug_output = False  # Strict mode is served by KHR_debug messages instead of polling
+        self.errors = 0
+        self._callback = None  # Keeps the ctypes callback alive while GL holds it
+
+    def install(self, mode=None, debug_output=True):
+        """
+        Apply `mode` (default: the current one) to the current context.
+
+        :param debug_output: Let strict mode use KHR_debug when available; False always polls.
+        """
+        self.mode = mode or self.mode
+        if self.mode not in ERROR_MODES:
+            raise ValueError(f"Unsupported GL error mode: {self.mode}")
+        self.debug_output = False
+        if self.mode == 'strict' and debug_output and self.debug_output_supported():
+            self._callback = GLDEBUGPROC(self.on_debug_message)
+            glEnable(GL_DEBUG_OUTPUT)
+            # Synchronous delivery runs the callback inside the failing call, so the Python stack points at it
+            glEnable(GL_DEBUG_OUTPUT_SYNCHRONOUS)
+            glDebugMessageCallback(self._callback, None)
+            self.debug_output = True
+            log.info("GL errors reported through KHR_debug")
+        elif self.mode == 'strict':
+            log.info("Polling glGetError after every draw step")
+
+    @staticmethod
+    def debug_output_supported():
+        version = tuple(int(v) for v in (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION)))
+        if version >= (4, 3):
+            return True
+        return any(glGetStringi(GL_EXTENSIONS, i) == b"GL_KHR_debug" for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
+    def on_debug_message(self, source, message_type, message_id, severity, length, message, user_param):
+        text = message[:length].decode(errors='replace') if length > 0 else message.decode(errors='replace')
+        if message_type == GL_DEBUG_TYPE_ERROR:
+            self.errors += 1
+            log.error("GL error %#x: %s\n%s", message_id, text, "".join(traceback.format_stack()[:-1]))
+        else:
+            log.debug("GL %s severity message %#x: %s", DEBUG_SEVERITIES.get(severity, severity), message_id, text)
+
+    def check(self, where, *args):
+        """
+        Checkpoint after a group of GL calls; only polls in strict mode without KHR_debug.
+
+        :param where: Description of the calls, %-formatted with `args` only if an error is reported.
+        """
+        if self.mode == 'strict' and not self.debug_output:
+            self.poll(where, *args)
+
+    def end_frame(self, frame_index):
+        """Once-per-frame check of everything issued since the last one."""
+        if self.mode != 'off' and not self.debug_output:
+            self.poll("frame %d", frame_index)
+
+    def poll(self, where, *args):
+        for _ in range(MAX_ERRORS_PER_POLL):
+            error = glGetError()
+            if error == GL_NO_ERROR:
+                break
+            self.errors += 1
+            log.error("OpenGL error %#x during " + where, error, *args)
+
+    def uninstall(self):
+        if self.debug_output:
+            glDebugMessageCallback(GLDEBUGPROC(), None)
+            glDisable(GL_DEBUG_OUTPUT)
+            self.debug_output = False
+        self._callback = None
+
+
+gl_errors = GLErrorPolicy()
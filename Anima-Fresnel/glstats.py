@@ -0,0 +1,50 @@
+from collections import Counter
+
+
+class GLCallCounter:
+    def __init__(self, modules):
+        """
+        Count OpenGL entry point calls made from `modules`.
+
+        Modules that `from OpenGL.GL import *` call GL through their own globals, so install() swaps every
+        gl* global for a counting wrapper and uninstall() restores the originals. Nothing is wrapped, and
+        nothing costs anything, until install() is called.
+
+        :param modules: Module objects whose GL calls should be counted, e.g. [scene, objects].
+        """
+        self.modules = list(modules)
+        self.counts = Counter()
+        self.originals = []
+
+    def wrap(self, name, function):
+        counts = self.counts
+
+        def counted(*args, **kwargs):
+            counts[name] += 1
+            return function(*args, **kwargs)
+        return counted
+
+    def install(self):
+        for module in self.modules:
+            for name, value in list(vars(module).items()):
+                if name.startswith('gl') and name[2:3].isupper() and callable(value):
+                    self.originals.append((module, name, value))
+                    setattr(module, name, self.wrap(name, value))
+        return self
+
+    def uninstall(self):
+        for module, name, value in self.originals:
+            setattr(module, name, value)
+        self.originals = []
+
+    def reset(self):
+        """Return the counts since the last reset (e.g. one frame's worth) and start again from zero."""
+        counts = Counter(self.counts)
+        self.counts.clear()
+        return counts
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
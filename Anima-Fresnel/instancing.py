@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+import numpy as np
+from OpenGL.GL import *
+
+from pbr_shaders import ATTRIBUTE_LOCATIONS
+from state import gl_state
+
+# Per-instance layout: model mat4 | normal mat3 | albedo vec3 | (metallic, roughness, ao) vec3
+INSTANCE_FLOATS = 16 + 9 + 3 + 3
+INSTANCE_STRIDE = INSTANCE_FLOATS * 4
+
+
+class InstancedRenderer:
+    def __init__(self, shader):
+        """
+        Batched draw path that submits every object sharing a mesh with one glDrawElementsInstanced.
+
+        Each mesh gets its own VAO combining the mesh's vertex attributes with a per-instance buffer, set up
+        once; after that a batch is bind VAO, refill instance buffer, draw.
+
+        :param shader: ShaderProgram linked from Shader(defines=('INSTANCED',)).
+        """
+        self.shader = shader
+        self.instance_buffers = {}
+        self.vertex_arrays = {}
+        self.meshes = {}  # Mesh each VAO was built for, by key
+
+        self.model_loc = ATTRIBUTE_LOCATIONS["aModel"]
+        self.normal_matrix_loc = ATTRIBUTE_LOCATIONS["aNormalMatrix"]
+        self.albedo_loc = ATTRIBUTE_LOCATIONS["aAlbedo"]
+        self.material_loc = ATTRIBUTE_LOCATIONS["aMaterial"]
+
+        # (location, component count, float offset) for every per-instance attribute column
+        self.instance_attributes = (
+            [(self.model_loc + i, 4, 4 * i) for i in range(4)]
+            + [(self.normal_matrix_loc + i, 3, 16 + 3 * i) for i in range(3)]
+            + [(self.albedo_loc, 3, 25), (self.material_loc, 3, 28)]
+        )
+
+    @staticmethod
+    def group_by_mesh(objects):
+        """Group objects into draw batches keyed by their shared mesh."""
+        batches = defaultdict(list)
+        for obj in objects:
+            batches[obj.mesh].append(obj)
+        return batches
+
+    @staticmethod
+    def group_by_mesh_and_textures(objects):
+        """Group objects into draw batches keyed by (mesh, texture map paths); different maps need separate draws."""
+        batches = defaultdict(list)
+        for obj in objects:
+            batches[obj.mesh, obj.textures].append(obj)
+        return batches
+
+    @staticmethod
+    def pack_instances(objects):
+        """Pack model matrices, normal matrices and PBR material parameters into one (N, 31) float32 array."""
+        count = len(objects)
+        transforms = objects[0].transforms
+        rows = np.fromiter((obj.row for obj in objects), dtype=np.intp, count=count)
+        data = np.empty((count, INSTANCE_FLOATS), dtype=np.float32)
+        data[:, 0:16] = transforms.model_matrices[rows].reshape(count, 16)
+        data[:, 16:25] = transforms.normal_matrices[rows].reshape(count, 9)
+        data[:, 25:28] = [obj.properties.albedo for obj in objects]
+        data[:, 28:31] = [(obj.properties.metallic, obj.properties.roughness, obj.properties.ao) for obj in objects]
+        return data
+
+    def draw(self, objects, textures=None):
+        """
+        Draw all objects with already-updated transforms, one instanced draw call per distinct mesh.
+
+        :param textures: TextureStreamer binding each batch's maps, for a TEXTURED program; batches are then
+                         split by texture maps as well.
+        """
+        if textures is None:
+            for mesh, batch in self.group_by_mesh(objects).items():
+                self.draw_batch(mesh, self.pack_instances(batch))
+            return
+        for (mesh, maps), batch in self.group_by_mesh_and_textures(objects).items():
+            textures.bind(maps)
+            self.draw_batch(mesh, self.pack_instances(batch))
+
+    def create_vertex_array(self, mesh):
+        """VAO reading vertex attributes from `mesh` and per-instance attributes from a new instance buffer."""
+        vao = glGenVertexArrays(1)
+        gl_state.bind_vertex_array(vao)
+        mesh.bind_vertex_attributes()
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, mesh.ebo)
+
+        instance_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, instance_vbo)
+        for location, size, offset in self.instance_attributes:
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE, ctypes.c_void_p(offset * 4))
+            glEnableVertexAttribArray(location)
+            glVertexAttribDivisor(location, 1)
+
+        self.vertex_arrays[mesh.key] = vao
+        self.instance_buffers[mesh.key] = instance_vbo
+        self.meshes[mesh.key] = mesh
+        return vao, instance_vbo
+
+    def draw_batch(self, mesh, instance_data):
+        vao = self.vertex_arrays.get(mesh.key)
+        if vao is None:
+            vao, instance_vbo = self.create_vertex_array(mesh)
+        else:
+            instance_vbo = self.instance_buffers[mesh.key]
+            gl_state.bind_vertex_array(vao)
+
+        # Per-instance data is re-specified (orphaned) every frame; the VAO keeps pointing at the same buffer
+        glBindBuffer(GL_ARRAY_BUFFER, instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, instance_data.nbytes, instance_data, GL_STREAM_DRAW)
+
+        glDrawElementsInstanced(GL_TRIANGLES, mesh.index_count, GL_UNSIGNED_INT, None, len(instance_data))
+
+    def prune(self, meshes):
+        """
+        Delete the VAOs and instance buffers of meshes no longer in `meshes` (a MeshRegistry's dict).
+
+        A freed mesh's key may later come back as a new mesh with new buffers, which the old VAO would not
+        point at, so this runs whenever meshes may have been freed.
+        """
+        for key in [key for key, mesh in self.meshes.items() if meshes.get(key) is not mesh]:
+            vao = self.vertex_arrays.pop(key)
+            if gl_state.vertex_array == vao:
+                gl_state.bind_vertex_array(0)
+            glDeleteVertexArrays(1, [vao])
+            glDeleteBuffers(1, [self.instance_buffers.pop(key)])
+            del self.meshes[key]
+
+    def cleanup(self):
+        if gl_state.vertex_array in self.vertex_arrays.values():
+            gl_state.bind_vertex_array(0)
+        for vao in self.vertex_arrays.values():
+            glDeleteVertexArrays(1, [vao])
+        for instance_vbo in self.instance_buffers.values():
+            glDeleteBuffers(1, [instance_vbo])
+        self.vertex_arrays.clear()
+        self.instance_buffers.clear()
+        self.meshes.clear()
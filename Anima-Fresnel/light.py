@@ -1,7 +1,11 @@
 import numpy as np
 
+# Radiance below which a point light is treated as having no effect, for lights without an explicit radius
+LIGHT_CUTOFF = 1e-3
+
 class Light:
-    def __init__(self, position=None, direction=None, color=(1.0, 1.0, 1.0), intensity=1.0, light_type="point"):
+    def __init__(self, position=None, direction=None, color=(1.0, 1.0, 1.0), intensity=1.0, light_type="point",
+                 radius=None):
         """
         Initialize a light source.
         :param position: vec3 position of the light (for point lights).
@@ -9,17 +13,26 @@ class Light:
         :param color: vec3 color of the light.
         :param intensity: Brightness of the light.
         :param light_type: Type of light ('point', 'directional').
+        :param radius: Distance at which a point light's contribution fades to zero under clustered shading.
+                       Defaults to where the inverse-square falloff drops below LIGHT_CUTOFF.
         """
         self.position = position
         self.direction = direction
         self.color = np.array(color, dtype=np.float32)
         self.intensity = intensity
         self.type = light_type  # Could be 'point' or 'directional'
+        self.radius = radius
 
 
     def is_directional(self):
         return self.light_type == 'directional'
 
+    @property
+    def influence_radius(self):
+        if self.radius is not None:
+            return self.radius
+        return float(np.sqrt(max(float(np.max(self.color)) * self.intensity / LIGHT_CUTOFF - 0.1, 0.0)))
+
     def set_position(self, new_position):
         self.position = np.array(new_position, dtype=np.float32)
 
@@ -0,0 +1,180 @@
+import numpy as np
+from OpenGL.GL import *
+
+# Tiles across, tiles down and exponential depth slices of the view frustum
+CLUSTER_GRID = (16, 9, 24)
+
+# Texture units holding the cluster buffers; the low units are left for material maps
+LIGHT_DATA_UNIT = 13
+CLUSTER_RANGES_UNIT = 14
+CLUSTER_LIGHTS_UNIT = 15
+
+# Texels per light in the light data buffer: position + radius, direction, color
+LIGHT_TEXELS = 3
+
+
+class TextureBuffer:
+    def __init__(self, internal_format, unit):
+        """A buffer object exposed to shaders as a samplerBuffer on texture unit `unit`."""
+        self.unit = unit
+        self.buffer = glGenBuffers(1)
+        self.texture = glGenTextures(1)
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer)
+        glBufferData(GL_TEXTURE_BUFFER, 16, None, GL_STREAM_DRAW)
+        glBindTexture(GL_TEXTURE_BUFFER, self.texture)
+        glTexBuffer(GL_TEXTURE_BUFFER, internal_format, self.buffer)
+        glBindTexture(GL_TEXTURE_BUFFER, 0)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+
+    def upload(self, data):
+        """Replace the contents with `data`, orphaning the previous storage."""
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer)
+        if data.nbytes:
+            glBufferData(GL_TEXTURE_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        else:
+            glBufferData(GL_TEXTURE_BUFFER, 16, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+
+    def bind(self):
+        glActiveTexture(GL_TEXTURE0 + self.unit)
+        glBindTexture(GL_TEXTURE_BUFFER, self.texture)
+        glActiveTexture(GL_TEXTURE0)
+
+    def delete(self):
+        glDeleteTextures(1, [self.texture])
+        glDeleteBuffers(1, [self.buffer])
+
+
+class LightClusters:
+    def __init__(self, grid=CLUSTER_GRID):
+        """
+        Clustered light assignment for the CLUSTERED shader variant.
+
+        The view frustum is split into grid[0] x grid[1] screen tiles and grid[2] depth slices spaced
+        exponentially between the near and far planes. Every frame each point light's bounding sphere is
+        tested against the clusters' view-space bounding boxes, and the shader only shades the lights listed
+        for the fragment's cluster. Directional lights are listed in every cluster.
+
+        :param grid: (tiles across, tiles down, depth slices).
+        """
+        self.grid = grid
+        self.cluster_count = grid[0] * grid[1] * grid[2]
+        self.light_data = TextureBuffer(GL_RGBA32F, LIGHT_DATA_UNIT)
+        self.ranges = TextureBuffer(GL_RG32F, CLUSTER_RANGES_UNIT)
+        self.indices = TextureBuffer(GL_R32F, CLUSTER_LIGHTS_UNIT)
+        self.packed_lights = None
+        self.scale = None
+        self.assignments = 0  # (cluster, light) pairs in the last frame
+
+    def set_projection(self, field_of_view, aspect, near, far, width, height):
+        """Recompute the clusters' view-space bounds; call whenever the projection or viewport changes."""
+        tiles_x, tiles_y, slices = self.grid
+        depths = near * (far / near) ** (np.arange(slices + 1) / slices)
+        self.slice_near = depths[:-1]
+        self.slice_far = depths[1:]
+
+        # At view depth d a tile spanning NDC [a, b] covers [a, b] * d * tan(fov / 2) (times aspect in x).
+        # Over a slice the extremes lie on its near or far face.
+        tan_y = np.tan(np.radians(field_of_view) / 2.0)
+        self.x_min, self.x_max = self.tile_bounds(np.linspace(-1.0, 1.0, tiles_x + 1) * tan_y * aspect)
+        self.y_min, self.y_max = self.tile_bounds(np.linspace(-1.0, 1.0, tiles_y + 1) * tan_y)
+
+        self.scale = (tiles_x / width, tiles_y / height, slices / np.log(far / near), near)
+
+    def tile_bounds(self, edges):
+        """(slices, tiles) min and max view-space coordinate of every tile in every depth slice."""
+        low = edges[None, :-1]
+        high = edges[None, 1:]
+        near = self.slice_near[:, None]
+        far = self.slice_far[:, None]
+        return np.minimum(low * near, low * far), np.maximum(high * near, high * far)
+
+    @staticmethod
+    def pack_lights(lights):
+        """(N, 12) float32 light data in the shader's texel layout."""
+        data = np.zeros((len(lights), 4 * LIGHT_TEXELS), dtype=np.float32)
+        for i, light in enumerate(lights):
+            if light.type == 'point':
+                data[i, 0:3] = light.position
+                data[i, 3] = light.influence_radius
+            elif light.type == 'directional':
+                data[i, 4:7] = light.direction
+            data[i, 8:11] = light.color * light.intensity
+        return data
+
+    def assign(self, view, packed_lights):
+        """
+        Cull lights to clusters.
+
+        :param view: View matrix in pyrr's row-vector convention.
+        :param packed_lights: Output of pack_lights.
+        :return: (cluster ranges as (clusters, 2) float32 of first index and count, flat float32 light indices)
+        """
+        tiles_x, tiles_y, slices = self.grid
+        positions = packed_lights[:, 0:3]
+        radii = packed_lights[:, 3]
+        point = np.flatnonzero(np.any(positions != 0.0, axis=1))
+        directional = np.flatnonzero(np.all(positions == 0.0, axis=1))
+
+        # Light centres in view space as (x, y, depth in front of the camera)
+        view = np.asarray(view, dtype=np.float32)
+        centres = positions[point] @ view[:3, :3] + view[3, :3]
+        x, y, depth = centres[:, 0], centres[:, 1], -centres[:, 2]
+        radius_sq = radii[point] ** 2
+
+        # Depth is separable: find the (light, slice) pairs the sphere reaches before testing any tiles
+        depth = depth[:, None]
+        dz = np.maximum(np.maximum(self.slice_near[None, :] - depth, depth - self.slice_far[None, :]), 0.0)
+        light_index, slice_index = np.nonzero(dz * dz <= radius_sq[:, None])
+
+        # Squared distance from each centre to each tile's x and y extent in that slice
+        def axis_distance_sq(coordinate, low, high):
+            c = coordinate[light_index][:, None]
+            d = np.maximum(np.maximum(low[slice_index] - c, c - high[slice_index]), 0.0)
+            return d * d
+
+        dx2 = axis_distance_sq(x, self.x_min, self.x_max)
+        dy2 = axis_distance_sq(y, self.y_min, self.y_max)
+        dz2 = (dz * dz)[light_index, slice_index]
+        hits = dy2[:, :, None] + dx2[:, None, :] + dz2[:, None, None] <= radius_sq[light_index][:, None, None]
+
+        pair, tile_y, tile_x = np.nonzero(hits)
+        clusters = (slice_index[pair] * tiles_y + tile_y) * tiles_x + tile_x
+        lights = point[light_index[pair]]
+
+        if len(directional):
+            clusters = np.concatenate([clusters, np.repeat(np.arange(self.cluster_count), len(directional))])
+            lights = np.concatenate([lights, np.tile(directional, self.cluster_count)])
+
+        # Group by cluster keeping config order within each cluster, so shading sums lights in a fixed order
+        order = np.lexsort((lights, clusters))
+        counts = np.bincount(clusters, minlength=self.cluster_count)
+        ranges = np.empty((self.cluster_count, 2), dtype=np.float32)
+        ranges[:, 0] = np.cumsum(counts) - counts
+        ranges[:, 1] = counts
+        self.assignments = len(order)
+        return ranges, lights[order].astype(np.float32)
+
+    def update(self, view, lights):
+        """Cull `lights` against the clusters for this frame's `view` and upload the result."""
+        packed = self.pack_lights(lights)
+        if self.packed_lights is None or not np.array_equal(self.packed_lights, packed):
+            self.light_data.upload(packed)
+            self.packed_lights = packed
+        ranges, indices = self.assign(view, packed)
+        self.ranges.upload(ranges)
+        self.indices.upload(indices)
+
+    def bind(self, shader):
+        """Bind the cluster buffers and point `shader`'s samplers and cluster uniforms at them."""
+        for buffer in (self.light_data, self.ranges, self.indices):
+            buffer.bind()
+        shader.set_uniform("lightData", LIGHT_DATA_UNIT)
+        shader.set_uniform("clusterRanges", CLUSTER_RANGES_UNIT)
+        shader.set_uniform("clusterLights", CLUSTER_LIGHTS_UNIT)
+        shader.set_uniform("clusterCounts", self.grid)
+        shader.set_uniform("clusterScale", self.scale)
+
+    def cleanup(self):
+        for buffer in (self.light_data, self.ranges, self.indices):
+            buffer.delete()
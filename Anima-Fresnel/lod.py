@@ -0,0 +1,72 @@
+import numpy as np
+
+# Projected diameter in pixels below which each coarser level takes over: level k is drawn while the object
+# is smaller than LOD_SCREEN_SIZES[k - 1] but not smaller than LOD_SCREEN_SIZES[k]
+LOD_SCREEN_SIZES = (96.0, 48.0, 24.0)
+
+# Relative size margin an object must cross past a threshold before its level changes
+LOD_HYSTERESIS = 0.15
+
+
+class LODSelector:
+    def __init__(self, transforms, screen_sizes=LOD_SCREEN_SIZES, hysteresis=LOD_HYSTERESIS):
+        """
+        Per-frame level-of-detail selection by projected screen-space size.
+
+        Every object with more than one LOD mesh gets the level whose size band contains its projected
+        bounding-sphere diameter. A level only changes once the size is more than `hysteresis` (a fraction)
+        past the threshold, so objects hovering around a boundary do not flip between meshes every frame.
+
+        :param transforms: TransformSystem the objects' positions and scales are read from.
+        :param screen_sizes: Descending diameters in pixels at which each next coarser level starts.
+        :param hysteresis: Relative margin around each threshold.
+        """
+        self.transforms = transforms
+        self.thresholds = -np.asarray(screen_sizes, dtype=np.float32)  # Negated: ascending for searchsorted
+        self.hysteresis = hysteresis
+        self.objects = None
+        self.object_count = 0
+        self.row_count = 0
+
+    def rebuild(self, objects):
+        """Gather the objects that have an LOD chain."""
+        self.objects = objects
+        self.object_count = len(objects)
+        self.row_count = self.transforms.count
+        self.chained = [obj for obj in objects if len(obj.lods) > 1]
+        self.rows = np.fromiter((obj.row for obj in self.chained), dtype=np.intp, count=len(self.chained))
+        self.radii = np.fromiter((obj.lods[0].bounding_radius for obj in self.chained), dtype=np.float32,
+                                 count=len(self.chained))
+        self.coarsest = np.fromiter((len(obj.lods) - 1 for obj in self.chained), dtype=np.intp,
+                                    count=len(self.chained))
+        self.levels = np.fromiter((obj.lod for obj in self.chained), dtype=np.intp, count=len(self.chained))
+
+    def level_for(self, size):
+        """LOD level for projected diameters `size` without hysteresis."""
+        return np.searchsorted(self.thresholds, -size)
+
+    def select(self, objects, eye, field_of_view, viewport_height):
+        """
+        Switch every object in `objects` to the LOD for its current screen size.
+
+        :param eye: Camera position.
+        :param field_of_view: Vertical field of view in degrees.
+        :param viewport_height: Viewport height in pixels.
+        """
+        if objects is not self.objects or len(objects) != self.object_count or self.transforms.count != self.row_count:
+            self.rebuild(objects)
+        if len(self.chained):
+            centres = self.transforms.model_matrices[self.rows, 3, :3]
+            distance = np.maximum(np.linalg.norm(centres - np.asarray(eye, dtype=np.float32), axis=1), 1e-6)
+            radii = self.radii * np.abs(self.transforms.scale[self.rows]).max(axis=1)
+            # Diameter in pixels of the sphere's projection, small-angle approximation
+            size = radii * viewport_height / (distance * np.tan(np.radians(field_of_view) / 2.0))
+
+            # Stay on the current level while it lies between the levels for the size shrunk and grown by the margin
+            finest = self.level_for(size * (1.0 + self.hysteresis))
+            coarsest = self.level_for(size * (1.0 - self.hysteresis))
+            levels = np.minimum(np.clip(self.levels, finest, coarsest), self.coarsest)
+
+            for i in np.flatnonzero(levels != self.levels):
+                self.chained[i].set_lod(levels[i])
+            self.levels = levels
@@ -0,0 +1,72 @@
+import logging
+import sys
+
+# Every engine logger lives under this name, so one call configures them all
+ROOT_LOGGER = "anima"
+
+# Logger receiving the per-object state dumps of sampled frames
+STATE_LOGGER = ROOT_LOGGER + ".state"
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+LEVELS = ("debug", "info", "warning", "error")
+
+
+def get_logger(name):
+    """
+    Logger for an engine module.
+
+    Messages use %-style arguments (log.debug("drew %d objects", count)) so nothing is formatted unless the
+    level is enabled. Per-frame code whose message needs work of its own, like the triangle count in
+    Scene.draw_objects, checks isEnabledFor once per frame and skips that work when the level is off.
+    """
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time, so contextlib.redirect_stdout silences it like print."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class FrameSampler:
+    def __init__(self, every=0):
+        """
+        Decides which frames dump the full per-object state.
+
+        :param every: Dump every `every`-th frame; 0 never dumps.
+        """
+        self.every = every
+        self.active = False  # Whether the frame being rendered is a sampled one
+
+    def begin_frame(self, frame_index):
+        self.active = self.every > 0 and frame_index % self.every == 0
+        return self.active
+
+
+frame_sampler = FrameSampler()
+
+
+def configure(level="info", sample_every=0):
+    """
+    Send engine log records at `level` and above to stdout.
+
+    :param level: One of LEVELS.
+    :param sample_every: Dump camera, lights and every object's matrices and material every N-th frame,
+                         independent of `level`; 0 disables the dumps.
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level.upper())
+    if not any(isinstance(handler, StdoutHandler) for handler in root.handlers):
+        handler = StdoutHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+    root.propagate = False
+
+    logging.getLogger(STATE_LOGGER).setLevel(logging.DEBUG if sample_every > 0 else logging.NOTSET)
+    frame_sampler.every = sample_every
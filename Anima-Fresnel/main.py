@@ -1,18 +1,55 @@
-import glfw
-import numpy as np
-from render import Renderer
-from genesis import Genesis
+import argparse
 import signal
 import sys
 import traceback
 
+from context import select_error_checking, select_platform
+from log import LEVELS, configure, get_logger
+from sharding import frame_range, parse_shard
+
 
 fps = 30
 width = 2880
 height = 1800
 record = False
+offline = False  # Fixed 1/fps steps with no frame pacing; implied by recording
+seed = 0  # Object placement seed for offline renders when the config has no "seed"
+max_frames = 300  # Frames rendered when recording or running headless
+backend = "glfw"  # 'glfw' opens a window; 'egl' (surfaceless) and 'osmesa' render headless
+config_file = "world_config.json"
+instanced = False  # Draw objects sharing a mesh with one instanced call
+profile = "compat"  # 'compat' (GLSL 1.20) or 'core' (3.3 core context, GLSL 3.30)
+max_lights = 10  # Size of the shader's light array
+clustered = False  # Clustered forward lighting: no light limit, each fragment shades only nearby lights
+culling = True  # Skip objects outside the view frustum before drawing
+lod = True  # Draw smooth shapes with coarser meshes as they shrink on screen
+lod_hysteresis = 0.15  # Relative size margin before an object's level of detail changes (live rendering only)
+log_level = "info"  # 'debug' adds per-frame summaries
+log_sample = 0  # Dump every object's matrices and material every N-th frame (0: never)
+profiler = False  # Time every frame's phases on the CPU and GPU
+gl_errors = "frame"  # 'off', 'frame' (one glGetError per frame) or 'strict' (pinpoint the failing call, slow)
+profiler_output = "profile"  # Chrome trace (.json) and percentile summary (.csv) written at shutdown
+profiler_trace_frames = 9000  # Most recent frames kept in the Chrome trace (0: the whole run)
+shader_cache = True  # Reuse linked shader binaries across runs (~/.cache/anima-fresnel/shaders by default)
+specialize = True  # Compile the shader without the light kinds and material terms the scene does not use
+watch = False  # Reload the config when it changes on disk, rebuilding only the objects that changed
+snapshot = None  # Binary scene snapshot to start from instead of the JSON config
+textures = True  # Sample the objects' texture maps; False shades with their material constants only
+texture_options = {
+    "memory_budget": 256 * 2**20,  # Bytes of GPU memory for texture levels before least recently used ones go
+    "upload_budget": 0.002,  # Seconds per frame spent uploading decoded texture levels
+}
+recorder_options = {
+    "mode": "stream",  # 'stream' pipes frames into ffmpeg, 'png' writes an image sequence first
+    "codec": "libx264",
+    "preset": "slow",
+    "crf": 18,
+    "queue_size": 8,
+    "encode_workers": 0,  # 'png' mode: worker processes encoding frames in parallel
+}
 
 renderer = None
+log = get_logger("main")
 
 def signal_handler(sig, frame):
     print("\nInterrupt received, stopping gracefully...")
@@ -21,9 +58,110 @@ def signal_handler(sig, frame):
         renderer.cleanup()
     sys.exit(0)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render an Anima Fresnel scene")
+    parser.add_argument('--backend', choices=['glfw', 'egl', 'osmesa'], default=backend,
+                        help="OpenGL context backend (egl/osmesa need no display)")
+    parser.add_argument('--config', default=config_file, help="scene configuration file")
+    parser.add_argument('--profile', choices=['compat', 'core'], default=profile,
+                        help="OpenGL context profile and matching shader variant")
+    parser.add_argument('--max-lights', type=int, default=max_lights, help="lights the shader can hold")
+    parser.add_argument('--clustered', action='store_true', default=clustered,
+                        help="cull lights to view-frustum clusters (for scenes with many point lights)")
+    parser.add_argument('--no-culling', dest='culling', action='store_false', default=culling,
+                        help="draw every object instead of frustum-culling them first")
+    parser.add_argument('--no-lod', dest='lod', action='store_false', default=lod,
+                        help="always draw smooth shapes at their full tessellation")
+    parser.add_argument('--lod-hysteresis', type=float, default=lod_hysteresis,
+                        help="relative screen-size margin before an object switches level of detail (live "
+                             "rendering only: recorded, offline and sharded frames use none, so they do not "
+                             "depend on earlier frames)")
+    parser.add_argument('--log-level', choices=LEVELS, default=log_level, help="engine log verbosity")
+    parser.add_argument('--log-sample', type=int, default=log_sample, metavar='N',
+                        help="dump the full scene state every N-th frame (0: never)")
+    parser.add_argument('--gl-errors', choices=['off', 'frame', 'strict'], default=gl_errors,
+                        help="GL error checking: never, once per frame, or at the failing call (slow: "
+                             "also turns on PyOpenGL's glGetError after every call)")
+    parser.add_argument('--profiler', action='store_true', default=profiler,
+                        help="time each frame phase on the CPU and GPU and report percentiles at shutdown")
+    parser.add_argument('--profiler-output', default=profiler_output, metavar='PREFIX',
+                        help="write the profile to PREFIX.json (Chrome trace) and PREFIX.csv")
+    parser.add_argument('--profiler-trace-frames', type=int, default=profiler_trace_frames, metavar='N',
+                        help="keep only the last N frames in the Chrome trace (0: the whole run)")
+    parser.add_argument('--shader-cache-dir', default=None, metavar='DIR',
+                        help="directory for cached shader program binaries")
+    parser.add_argument('--no-shader-cache', dest='shader_cache', action='store_false', default=shader_cache,
+                        help="always compile and link the shaders")
+    parser.add_argument('--no-specialize', dest='specialize', action='store_false', default=specialize,
+                        help="use the general shader variant whatever the scene contains")
+    parser.add_argument('--watch', action='store_true', default=watch,
+                        help="apply changes to the config file to the running scene")
+    parser.add_argument('--snapshot', default=snapshot, metavar='PATH',
+                        help="start from a binary scene snapshot instead of the config")
+    parser.add_argument('--save-snapshot', default=None, metavar='PATH',
+                        help="write the loaded scene to a binary snapshot for faster starts")
+    parser.add_argument('--no-textures', dest='textures', action='store_false', default=textures,
+                        help="ignore texture maps and shade with the material constants")
+    parser.add_argument('--texture-budget', type=float, default=None, metavar='MB',
+                        help="GPU memory for texture maps before the least recently used are evicted")
+    parser.add_argument('--record', action='store_true', default=record, help="record the frames to video")
+    parser.add_argument('--offline', action='store_true', default=offline,
+                        help="render deterministic fixed-timestep frames as fast as possible")
+    parser.add_argument('--seed', type=int, default=seed,
+                        help="object placement seed for offline renders (the config's \"seed\" takes precedence)")
+    parser.add_argument('--frames', type=int, default=max_frames,
+                        help="frames to render when recording or headless (the whole clip when sharding)")
+    parser.add_argument('--start-frame', type=int, default=0, help="first frame to render")
+    parser.add_argument('--end-frame', type=int, default=None,
+                        help="frame to stop before (default: start frame + --frames)")
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                        help="render the I-th of N equal frame ranges of a --frames long clip")
+    parser.add_argument('--output', default=None, help="video file to record to")
+    parser.add_argument('--lossless', action='store_true',
+                        help="record FFV1 segments that sharding.py can join without re-encoding")
+    args = parser.parse_args()
+
+    if args.shard:
+        args.start_frame, args.end_frame = frame_range(args.frames, *args.shard)
+    elif args.end_frame is None:
+        args.end_frame = args.start_frame + args.frames
+    if args.end_frame <= args.start_frame:
+        parser.error("--end-frame must be greater than --start-frame")
+    return args
+
 def main():
     global renderer
-    renderer = Renderer(width, height, record=record, fps=fps)
+    args = parse_args()
+
+    # Must happen before anything imports OpenGL.GL
+    select_platform(args.backend)
+    # PyOpenGL's per-call glGetError is what strict mode falls back on to name the failing call without KHR_debug
+    select_error_checking(pyopengl=(args.gl_errors == 'strict'))
+    configure(args.log_level, args.log_sample)
+    from pbr_shaders import PROGRAM_CACHE_DIR
+    from render import Renderer
+
+    options = dict(recorder_options)
+    if args.output:
+        options["output_filename"] = args.output
+    if args.lossless:
+        options["lossless"] = True
+    streaming = dict(texture_options)
+    if args.texture_budget is not None:
+        streaming["memory_budget"] = int(args.texture_budget * 2**20)
+    # Rendering a sub-range only makes sense if frame k looks the same in every process, i.e. offline
+    offline_render = args.offline or args.record or args.start_frame > 0
+    renderer = Renderer(width, height, record=args.record, fps=fps, instanced=instanced,
+                        recorder_options=options, backend=args.backend, config_file=args.config,
+                        offline=offline_render, seed=args.seed, start_frame=args.start_frame,
+                        profile=args.profile, max_lights=args.max_lights, clustered=args.clustered,
+                        culling=args.culling, lod=args.lod, lod_hysteresis=args.lod_hysteresis,
+                        profiler=args.profiler, profiler_output=args.profiler_output,
+                        profiler_trace_frames=args.profiler_trace_frames or None, error_mode=args.gl_errors,
+                        shader_cache=(args.shader_cache_dir or PROGRAM_CACHE_DIR) if args.shader_cache else None,
+                        specialize=args.specialize, watch=args.watch,
+                        snapshot=args.snapshot, save_snapshot=args.save_snapshot,
+                        textures=args.textures, texture_options=streaming)
 
     signal.signal(signal.SIGINT, signal_handler)
 
@@ -35,18 +173,19 @@ def main():
 
         # Main render loop
         frame_count = 0
-        max_frames = 300 if record else float('inf')  # Only limit frames if recording
+        # Only limit frames if recording or if there is no window to close
+        frame_limit = args.end_frame - args.start_frame if args.record or not renderer.backend.has_window else float('inf')
 
         while not renderer.should_close():
-            print("Starting Frame Loop.")
+            log.debug("Rendering frame %d", renderer.frame_index)
             renderer.render(1.0 / fps)  # Pass the frame time
 
-            # Handle recording
-            if record:
+            # Handle recording and headless batch renders
+            if frame_limit != float('inf'):
                 frame_count += 1
-                progress = (frame_count / max_frames) * 100
-                print(f"\rProgress: {progress:.2f}% ({frame_count}/{max_frames} frames)", end="", flush=True)
-                if frame_count >= max_frames:
+                progress = (frame_count / frame_limit) * 100
+                print(f"\rProgress: {progress:.2f}% ({frame_count}/{frame_limit} frames)", end="", flush=True)
+                if frame_count >= frame_limit:
                     print("\nRendering complete!")
                     break
 
@@ -0,0 +1,130 @@
+import numpy as np
+from OpenGL.GL import *
+
+from pbr_shaders import ATTRIBUTE_LOCATIONS
+from state import gl_state
+
+VERTEX_STRIDE = 24  # Interleaved position vec3 | normal vec3
+
+
+class Mesh:
+    def __init__(self, key, vertices, indices):
+        """
+        GPU-resident geometry shared by every object with the same shape parameters.
+
+        :param key: Hashable (shape_type, *tessellation parameters) tuple identifying the mesh.
+        :param vertices: Interleaved (N, 6) float32 position/normal array.
+        :param indices: Flat uint32 triangle index array.
+        """
+        self.key = key
+        self.vertices = vertices
+        self.indices = indices
+        self.index_count = len(indices)
+
+        # Model-space bounding sphere, computed once with the geometry, for frustum culling
+        positions = vertices[:, :3]
+        self.bounding_center = ((positions.min(axis=0) + positions.max(axis=0)) / 2.0).astype(np.float32)
+        self.bounding_radius = float(np.linalg.norm(positions - self.bounding_center, axis=1).max(initial=0.0))
+
+        self.vbo = None
+        self.ebo = None
+        self.vao = None
+        self.ref_count = 0
+
+    def upload(self):
+        """Upload the VBO and EBO once and record the attribute layout in a VAO, so drawing is bind-and-draw."""
+        self.vao = glGenVertexArrays(1)
+        gl_state.bind_vertex_array(self.vao)
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        self.bind_vertex_attributes()
+
+        # The element buffer binding is part of the VAO state
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+
+        gl_state.bind_vertex_array(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def bind_vertex_attributes(self):
+        """Point the position and normal attributes of the bound VAO at this mesh's VBO."""
+        position = ATTRIBUTE_LOCATIONS["aPos"]
+        normal = ATTRIBUTE_LOCATIONS["aNormal"]
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(position)
+        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(12))
+        glEnableVertexAttribArray(normal)
+
+    def delete(self):
+        """Free the GPU buffers owned by this mesh."""
+        if self.vao is not None:
+            if gl_state.vertex_array == self.vao:
+                gl_state.bind_vertex_array(0)
+            glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+        if self.ebo is not None:
+            glDeleteBuffers(1, [self.ebo])
+            self.ebo = None
+
+
+class MeshRegistry:
+    def __init__(self):
+        """Content-addressed cache that generates and uploads each distinct mesh exactly once."""
+        self.meshes = {}
+
+    def acquire(self, key, generate):
+        """
+        Return the mesh for `key`, generating and uploading it on first use.
+
+        :param key: Hashable (shape_type, *tessellation parameters) tuple.
+        :param generate: Callable returning (vertices, normals, indices) for a cache miss.
+        """
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            vertices, normals, indices = generate()
+            mesh = Mesh(key, np.hstack([vertices, normals]), indices)
+            mesh.upload()
+            self.meshes[key] = mesh
+        mesh.ref_count += 1
+        return mesh
+
+    def adopt(self, key, vertices, indices, references=1):
+        """
+        Like `acquire`, for geometry that already exists as arrays, such as pages mapped from a snapshot,
+        which are uploaded as they are.
+
+        :param vertices: Interleaved (N, 6) float32 position/normal array.
+        :param indices: Flat uint32 triangle index array.
+        :param references: Users to count at once.
+        """
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            mesh = Mesh(key, vertices, indices)
+            mesh.upload()
+            self.meshes[key] = mesh
+        mesh.ref_count += references
+        return mesh
+
+    def release(self, mesh):
+        """Drop one reference to `mesh` and free its GPU buffers when nothing uses it anymore."""
+        mesh.ref_count -= 1
+        if mesh.ref_count <= 0 and self.meshes.get(mesh.key) is mesh:
+            mesh.delete()
+            del self.meshes[mesh.key]
+
+    def cleanup(self):
+        """Free every mesh regardless of outstanding references."""
+        for mesh in self.meshes.values():
+            mesh.delete()
+        self.meshes.clear()
+
+
+# Shared registry used by ObjectFactory-created objects
+mesh_registry = MeshRegistry()
@@ -1,10 +1,22 @@
 from abc import ABC, abstractmethod
 import numpy as np
 from OpenGL.GL import *
-import pyrr
 from dataclasses import dataclass
 from typing import Tuple, Optional
 
+from animation import KeyframeAnimator
+from log import get_logger
+from mesh import Mesh, mesh_registry
+from state import gl_state
+from textures import NO_TEXTURES, TEXTURE_SLOTS
+from transform import transform_system
+
+log = get_logger("objects")
+
+# Level-of-detail chain for smooth shapes: each level halves the tessellation, down to MIN_LOD_STEPS
+LOD_LEVELS = 4
+MIN_LOD_STEPS = 8
+
 @dataclass
 class ObjectProperties:
     albedo: Tuple[float, float, float] = (1.0, 1.0, 1.0)
@@ -108,302 +120,321 @@ class GeometryGenerator:
 
         return vertices, normals, indices
 
+    @staticmethod
+    def _quad_indices(first, second):
+        """Expand per-quad corner indices into two triangles per quad."""
+        first = first.ravel()
+        second = second.ravel()
+        quads = np.stack([first, second, first + 1, second, second + 1, first + 1], axis=-1)
+        return quads.reshape(-1).astype(np.uint32)
+
+    @staticmethod
+    def _lat_lon_indices(lat_steps, lon_steps):
+        """Triangle indices for a (lat_steps + 1) x (lon_steps + 1) vertex grid."""
+        i, j = np.meshgrid(np.arange(lat_steps), np.arange(lon_steps), indexing='ij')
+        first = i * (lon_steps + 1) + j
+        second = first + lon_steps + 1
+        return GeometryGenerator._quad_indices(first, second)
+
     @staticmethod
     def create_sphere(radius, lat_steps, lon_steps):
-        vertices, normals, indices = [], [], []
-        for i in range(lat_steps + 1):
-            theta = np.pi * i / lat_steps
-            sin_theta = np.sin(theta)
-            cos_theta = np.cos(theta)
-            for j in range(lon_steps + 1):
-                phi = 2 * np.pi * j / lon_steps
-                sin_phi = np.sin(phi)
-                cos_phi = np.cos(phi)
-                x = cos_phi * sin_theta
-                y = cos_theta
-                z = sin_phi * sin_theta
-                vertices.append([radius * x, radius * y, radius * z])
-                normals.append([x, y, z])  # Normals are just the normalized position vectors
-        vertices = np.array(vertices, dtype=np.float32)
-        normals = np.array(normals, dtype=np.float32)
-        for i in range(lat_steps):
-            for j in range(lon_steps):
-                first = i * (lon_steps + 1) + j
-                second = first + lon_steps + 1
-                indices.extend([first, second, first + 1, second, second + 1, first + 1])
-        indices = np.array(indices, dtype=np.uint32)
-        return vertices, normals, indices
+        theta = np.pi * np.arange(lat_steps + 1) / lat_steps
+        phi = 2 * np.pi * np.arange(lon_steps + 1) / lon_steps
+        sin_theta, cos_theta = np.sin(theta)[:, None], np.cos(theta)[:, None]
+        sin_phi, cos_phi = np.sin(phi)[None, :], np.cos(phi)[None, :]
+
+        x = cos_phi * sin_theta
+        y = np.broadcast_to(cos_theta, x.shape)
+        z = sin_phi * sin_theta
+        # Normals are just the normalized position vectors
+        normals = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+        vertices = np.stack([radius * x, radius * y, radius * z], axis=-1).reshape(-1, 3)
+        indices = GeometryGenerator._lat_lon_indices(lat_steps, lon_steps)
+        return vertices.astype(np.float32), normals.astype(np.float32), indices
 
     @staticmethod
     def create_ellipsoid(radius_x, radius_y, radius_z, lat_steps, lon_steps):
-        vertices, normals, indices = [], [], []
-        for i in range(lat_steps + 1):
-            theta = np.pi * i / lat_steps
-            sin_theta = np.sin(theta)
-            cos_theta = np.cos(theta)
-            for j in range(lon_steps + 1):
-                phi = 2 * np.pi * j / lon_steps
-                sin_phi = np.sin(phi)
-                cos_phi = np.cos(phi)
-                x = cos_phi * sin_theta * radius_x
-                y = cos_theta * radius_y
-                z = sin_phi * sin_theta * radius_z
-                vertices.append([x, y, z])
-                normals.append([x / radius_x, y / radius_y, z / radius_z])  # Normals are proportional to the ellipsoid
-        vertices = np.array(vertices, dtype=np.float32)
-        normals = np.array(normals, dtype=np.float32)
-        for i in range(lat_steps):
-            for j in range(lon_steps):
-                first = i * (lon_steps + 1) + j
-                second = first + lon_steps + 1
-                indices.extend([first, second, first + 1, second, second + 1, first + 1])
-        indices = np.array(indices, dtype=np.uint32)
-        return vertices, normals, indices
+        theta = np.pi * np.arange(lat_steps + 1) / lat_steps
+        phi = 2 * np.pi * np.arange(lon_steps + 1) / lon_steps
+        sin_theta, cos_theta = np.sin(theta)[:, None], np.cos(theta)[:, None]
+        sin_phi, cos_phi = np.sin(phi)[None, :], np.cos(phi)[None, :]
+
+        x = cos_phi * sin_theta * radius_x
+        y = np.broadcast_to(cos_theta * radius_y, x.shape)
+        z = sin_phi * sin_theta * radius_z
+        vertices = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+        # Normals are proportional to the ellipsoid
+        normals = np.stack([x / radius_x, y / radius_y, z / radius_z], axis=-1).reshape(-1, 3)
+        indices = GeometryGenerator._lat_lon_indices(lat_steps, lon_steps)
+        return vertices.astype(np.float32), normals.astype(np.float32), indices
 
     @staticmethod
     def create_cylinder(radius, height, lat_steps):
-        vertices, normals, indices = [], [], []
-        for i in range(lat_steps + 1):
-            theta = 2 * np.pi * i / lat_steps
-            sin_theta = np.sin(theta)
-            cos_theta = np.cos(theta)
-            for j in [0, 1]:
-                y = (j - 0.5) * height  # Top and bottom
-                vertices.append([radius * cos_theta, y, radius * sin_theta])
-                normals.append([cos_theta, 0, sin_theta])
-        vertices = np.array(vertices, dtype=np.float32)
-        normals = np.array(normals, dtype=np.float32)
-        for i in range(lat_steps):
-            first = 2 * i
-            second = first + 2
-            indices.extend([first, second, first + 1, second, second + 1, first + 1])
-        indices = np.array(indices, dtype=np.uint32)
-        return vertices, normals, indices
+        theta = 2 * np.pi * np.arange(lat_steps + 1) / lat_steps
+        sin_theta, cos_theta = np.sin(theta)[:, None], np.cos(theta)[:, None]
+        y = (np.arange(2) - 0.5)[None, :] * height  # Bottom and top
+
+        shape = (lat_steps + 1, 2)
+        vertices = np.stack([
+            np.broadcast_to(radius * cos_theta, shape),
+            np.broadcast_to(y, shape),
+            np.broadcast_to(radius * sin_theta, shape),
+        ], axis=-1).reshape(-1, 3)
+        normals = np.stack([
+            np.broadcast_to(cos_theta, shape),
+            np.zeros(shape),
+            np.broadcast_to(sin_theta, shape),
+        ], axis=-1).reshape(-1, 3)
+
+        first = 2 * np.arange(lat_steps)
+        indices = GeometryGenerator._quad_indices(first, first + 2)
+        return vertices.astype(np.float32), normals.astype(np.float32), indices
 
     @staticmethod
     def create_torus(outer_radius, inner_radius, radial_steps, tube_steps):
-        vertices, normals, indices = [], [], []
-        for i in range(radial_steps):
-            theta = 2 * np.pi * i / radial_steps
-            cos_theta = np.cos(theta)
-            sin_theta = np.sin(theta)
-            for j in range(tube_steps):
-                phi = 2 * np.pi * j / tube_steps
-                cos_phi = np.cos(phi)
-                sin_phi = np.sin(phi)
-                x = (outer_radius + inner_radius * cos_theta) * cos_phi
-                y = (outer_radius + inner_radius * cos_theta) * sin_phi
-                z = inner_radius * sin_theta
-                vertices.append([x, y, z])
-                normals.append([cos_theta * cos_phi, cos_theta * sin_phi, sin_theta])
-        vertices = np.array(vertices, dtype=np.float32)
-        normals = np.array(normals, dtype=np.float32)
-        for i in range(radial_steps):
-            for j in range(tube_steps):
-                first = i * tube_steps + j
-                second = ((i + 1) % radial_steps) * tube_steps + j
-                indices.extend([first, second, first + 1, second, second + 1, first + 1])
-        indices = np.array(indices, dtype=np.uint32)
-        return vertices, normals, indices
+        theta = 2 * np.pi * np.arange(radial_steps) / radial_steps
+        phi = 2 * np.pi * np.arange(tube_steps) / tube_steps
+        cos_theta, sin_theta = np.cos(theta)[:, None], np.sin(theta)[:, None]
+        cos_phi, sin_phi = np.cos(phi)[None, :], np.sin(phi)[None, :]
+
+        ring = outer_radius + inner_radius * cos_theta
+        shape = (radial_steps, tube_steps)
+        vertices = np.stack([
+            ring * cos_phi,
+            ring * sin_phi,
+            np.broadcast_to(inner_radius * sin_theta, shape),
+        ], axis=-1).reshape(-1, 3)
+        normals = np.stack([
+            cos_theta * cos_phi,
+            cos_theta * sin_phi,
+            np.broadcast_to(sin_theta, shape),
+        ], axis=-1).reshape(-1, 3)
+
+        i, j = np.meshgrid(np.arange(radial_steps), np.arange(tube_steps), indexing='ij')
+        first = i * tube_steps + j
+        second = ((i + 1) % radial_steps) * tube_steps + j
+        indices = GeometryGenerator._quad_indices(first, second)
+        return vertices.astype(np.float32), normals.astype(np.float32), indices
 
     @staticmethod
     def create_curved_plane(lat_steps, lon_steps, curvature, concave=True):
-        vertices, normals, indices = [], [], []
         sign = -1 if concave else 1
-        for i in range(lat_steps + 1):
-            theta = np.pi * i / lat_steps
-            for j in range(lon_steps + 1):
-                phi = 2 * np.pi * j / lon_steps
-                x = np.cos(phi) * np.sin(theta)
-                y = np.sin(sign * curvature * theta)
-                z = np.sin(phi) * np.sin(theta)
-                vertices.append([x, y, z])
-                normals.append([x, y, z])  # Normals are proportional to the shape
-        vertices = np.array(vertices, dtype=np.float32)
-        normals = np.array(normals, dtype=np.float32)
-        for i in range(lat_steps):
-            for j in range(lon_steps):
-                first = i * (lon_steps + 1) + j
-                second = first + lon_steps + 1
-                indices.extend([first, second, first + 1, second, second + 1, first + 1])
-        indices = np.array(indices, dtype=np.uint32)
+        theta = np.pi * np.arange(lat_steps + 1) / lat_steps
+        phi = 2 * np.pi * np.arange(lon_steps + 1) / lon_steps
+
+        x = np.cos(phi)[None, :] * np.sin(theta)[:, None]
+        y = np.broadcast_to(np.sin(sign * curvature * theta)[:, None], x.shape)
+        z = np.sin(phi)[None, :] * np.sin(theta)[:, None]
+        vertices = np.stack([x, y, z], axis=-1).reshape(-1, 3).astype(np.float32)
+        normals = vertices.copy()  # Normals are proportional to the shape
+        indices = GeometryGenerator._lat_lon_indices(lat_steps, lon_steps)
         return vertices, normals, indices
 
 
 
 class Object3D(ABC):
-    def __init__(self, vertices, indices, properties: ObjectProperties, name=None):
-        self.vertices = vertices
-        self.indices = indices
+    def __init__(self, mesh: Mesh, properties: ObjectProperties, name=None, row=None):
+        """
+        :param row: Transform row already allocated and filled for this object (TransformSystem.add_rows),
+                    as when restoring a snapshot; by default a new row is added.
+        """
+        self.mesh = mesh
+        self.lods = [mesh]  # Meshes from finest to coarsest; `mesh` is the one currently drawn
+        self.lod = 0
         self.properties = properties
-        self.vbo = None
-        self.ebo = None
-        self.position = np.random.rand(3) * 10.0 - 5.0
-        self.scale = np.array([1.0, 1.0, 1.0], dtype=np.float32)
-        self.rotation = np.array([0.0, 0.0, 0.0], dtype=np.float32)
-        self.init_buffers()
-
-    def init_buffers(self):
-        self.vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
-
-        self.ebo = glGenBuffers(1)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
-
-        # Unbind buffers
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.name = name
+        self.textures = NO_TEXTURES  # Map paths per TEXTURE_SLOTS, None where the object has none
+
+        # Transform state lives in a row of the shared structure-of-arrays store
+        self.transforms = transform_system
+        if row is not None:
+            self.row = row
+            self.transforms.owners[row] = self
+            return
+        self.row = self.transforms.add(
+            self,
+            position=(0.0, 0.0, 0.0),  # Placed by Genesis from its seeded generator
+            rotation_speed=properties.rotation_speed,
+            movement_speed=properties.movement_speed,
+            scale_speed=properties.scale_speed
+        )
+
+    @property
+    def position(self):
+        return self.transforms.position[self.row]
+
+    @position.setter
+    def position(self, value):
+        self.transforms.position[self.row] = value
+
+    @property
+    def rotation(self):
+        return self.transforms.rotation[self.row]
+
+    @rotation.setter
+    def rotation(self, value):
+        self.transforms.rotation[self.row] = value
+
+    @property
+    def scale(self):
+        return self.transforms.scale[self.row]
+
+    @scale.setter
+    def scale(self, value):
+        self.transforms.scale[self.row] = value
+
+    @property
+    def model_matrix(self):
+        return self.transforms.model_matrices[self.row]
+
+    @property
+    def normal_matrix(self):
+        return self.transforms.normal_matrices[self.row]
 
     def draw(self, shader):
-        # Bind the object's VBO and EBO
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        error = glGetError()
-        if error != GL_NO_ERROR:
-            print(f"Error binding VBO: {error}")
-            return  # Exit the draw function if there’s an error
-
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        error = glGetError()
-        if error != GL_NO_ERROR:
-            print(f"Error binding EBO: {error}")
-            return  # Exit if there’s an error
-
-        # Query attribute locations from the shader
-        posAttrib = glGetAttribLocation(shader, "aPos")
-        normalAttrib = glGetAttribLocation(shader, "aNormal")
-
-        # Set up vertex attribute pointers
-        glVertexAttribPointer(posAttrib, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(posAttrib)
-
-        glVertexAttribPointer(normalAttrib, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(normalAttrib)
-
-        # Draw the object using indices
-        glDrawElements(GL_TRIANGLES, len(self.indices), GL_UNSIGNED_INT, None)
-
-        # Disable vertex attribute arrays after drawing
-        glDisableVertexAttribArray(normalAttrib)
-        glDisableVertexAttribArray(posAttrib)
-
-        # Unbind buffers
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
-
-        error = glGetError()
-        if error != GL_NO_ERROR:
-            print(f"Error setting vertex attributes: {error}")
+        # The mesh's VAO already holds the buffers and attribute layout; consecutive objects sharing
+        # a mesh skip even the bind
+        gl_state.bind_vertex_array(self.mesh.vao)
+        glDrawElements(GL_TRIANGLES, self.mesh.index_count, GL_UNSIGNED_INT, None)
 
     def animate(self, delta_time):
-        # Apply rotation based on rotation speed
-        print(f"Object rotation before: {self.rotation}")
-        self.rotation += delta_time * np.array(self.properties.rotation_speed)
-        print(f"Object rotation after: {self.rotation}")
+        """Advance only this object's transform row; scenes update every row at once through the TransformSystem."""
+        self.transforms.update(delta_time, rows=slice(self.row, self.row + 1))
+        log.debug("Object %s animated: rotation = %s, position = %s", self.name, self.rotation, self.position)
 
-        # Apply translation (movement)
-        print(f"Object position before: {self.position}")
-        self.position += delta_time * np.array(self.properties.movement_speed)
-        print(f"Object position after: {self.position}")
+        return self.model_matrix
 
-        # Apply scaling if necessary (if scaling is changing over time)
-        self.scale += delta_time * np.array(self.properties.scale_speed)
 
-        # Create transformation matrices
-        rotation_matrix = pyrr.matrix44.create_from_eulers(self.rotation, dtype=np.float32)
-        translation_matrix = pyrr.matrix44.create_from_translation(self.position, dtype=np.float32)
-        scaling_matrix = pyrr.matrix44.create_from_scale(self.scale, dtype=np.float32)
 
-        # Combine transformations: Scale -> Rotate -> Translate
-        model_matrix = pyrr.matrix44.multiply(rotation_matrix, scaling_matrix)
-        model_matrix = pyrr.matrix44.multiply(model_matrix, translation_matrix)
+    def attach_animation(self, keyframes, interpolation='linear', mode='once'):
+        """
+        Drive this object's position, rotation and/or scale from keyframes instead of its constant speeds.
 
-        return model_matrix
+        :param keyframes: Dicts with a "time" in seconds and any of "position", "rotation" (degrees) and "scale".
+        :param interpolation: 'step', 'linear' or 'cubic', or a dict of them per channel.
+        :param mode: 'once', 'loop' or 'pingpong'.
+        """
+        if self.transforms.animator is None:
+            self.transforms.animator = KeyframeAnimator()
+        self.transforms.animator.attach(self.row, keyframes, interpolation, mode)
 
+    def detach_animation(self):
+        """Drop this object's keyframe tracks; its constant speeds drive it again."""
+        if self.transforms.animator is not None:
+            self.transforms.animator.detach(self.row)
 
+    def set_lod(self, level):
+        """Draw the mesh of LOD `level` (0 is the finest) from now on."""
+        self.lod = level
+        self.mesh = self.lods[level]
 
     def cleanup(self):
-        glDeleteBuffers(1, [self.vbo])
-        glDeleteBuffers(1, [self.ebo])
+        for mesh in self.lods:
+            mesh_registry.release(mesh)
+        self.transforms.remove(self.row)
 
 class PolyhedralObject(Object3D):
     def __init__(self, shape_type: str, properties: ObjectProperties, name=None):
         if shape_type == 'cube':
-            vertices, normals, indices = GeometryGenerator.create_cube()
+            generate = GeometryGenerator.create_cube
         elif shape_type == 'pyramid':
-            vertices, normals, indices = GeometryGenerator.create_pyramid()
+            generate = GeometryGenerator.create_pyramid
         elif shape_type == 'icosahedron':
-            vertices, normals, indices = GeometryGenerator.create_icosahedron()
+            generate = GeometryGenerator.create_icosahedron
         else:
             raise ValueError(f"Unsupported shape type: {shape_type}")
 
-        combined_data = np.hstack([vertices, normals])
-        super().__init__(combined_data, indices, properties, name)
+        mesh = mesh_registry.acquire((shape_type,), generate)
+        super().__init__(mesh, properties, name)
 
 
 class SmoothObject(Object3D):
     def __init__(self, shape_type: str, properties: ObjectProperties, **kwargs):
+        """
+        :param lod: Build a chain of LOD_LEVELS meshes at decreasing tessellation (default True); the scene
+                    picks one per frame from the object's size on screen.
+        """
         if shape_type == 'sphere':
-            vertices, normals, indices = GeometryGenerator.create_sphere(
+            generate = GeometryGenerator.create_sphere
+            params = (
                 kwargs.get('radius', 1.0),
                 kwargs.get('lat_steps', 50),
                 kwargs.get('lon_steps', 50)
             )
+            steps = (1, 2)
         elif shape_type == 'torus':
-            vertices, normals, indices = GeometryGenerator.create_torus(
+            generate = GeometryGenerator.create_torus
+            params = (
                 kwargs.get('outer_radius', 1.5),
                 kwargs.get('inner_radius', 0.5),
                 kwargs.get('radial_steps', 40),
                 kwargs.get('tube_steps', 20)
             )
+            steps = (2, 3)
         elif shape_type == 'ellipsoid':
-            vertices, normals, indices = GeometryGenerator.create_ellipsoid(
+            generate = GeometryGenerator.create_ellipsoid
+            params = (
                 kwargs.get('radius_x', 1.0),
                 kwargs.get('radius_y', 0.7),
                 kwargs.get('radius_z', 1.5),
                 kwargs.get('lat_steps', 40),
                 kwargs.get('lon_steps', 40)
             )
+            steps = (3, 4)
         elif shape_type == 'cylinder':
-            vertices, normals, indices = GeometryGenerator.create_cylinder(
+            generate = GeometryGenerator.create_cylinder
+            params = (
                 kwargs.get('radius', 1.0),
                 kwargs.get('height', 2.0),
                 kwargs.get('lat_steps', 50)
             )
-        elif shape_type == 'convex_plane':
-            vertices, normals, indices = GeometryGenerator.create_curved_plane(
-                radius=kwargs.get('radius', 1.0),
-                lat_steps=kwargs.get('lat_steps', 50),
-                lon_steps=kwargs.get('lon_steps', 50),
-                curvature_direction='convex'
-            )
-        elif shape_type == 'concave_plane':
-            vertices, normals, indices = GeometryGenerator.create_curved_plane(
-                radius=kwargs.get('radius', 1.0),
-                lat_steps=kwargs.get('lat_steps', 50),
-                lon_steps=kwargs.get('lon_steps', 50),
-                curvature_direction='concave'
+            steps = (2,)
+        elif shape_type in ('convex_plane', 'concave_plane'):
+            generate = GeometryGenerator.create_curved_plane
+            params = (
+                kwargs.get('lat_steps', 50),
+                kwargs.get('lon_steps', 50),
+                kwargs.get('curvature', 1.0),
+                shape_type == 'concave_plane'
             )
+            steps = (0, 1)
         else:
             raise ValueError(f"Unsupported shape type: {shape_type}")
 
-        combined_data = np.hstack([vertices, normals])
-        super().__init__(combined_data, indices, properties, kwargs.get('name'))
+        levels = [params]
+        for level in range(1, LOD_LEVELS if kwargs.get('lod', True) else 1):
+            coarser = tuple(max(min(MIN_LOD_STEPS, value), value >> level) if i in steps else value
+                            for i, value in enumerate(params))
+            if coarser == levels[-1]:
+                break
+            levels.append(coarser)
+
+        # Identical shape parameters resolve to the same cached VBO/EBO, so equal objects share the whole chain
+        lods = [mesh_registry.acquire((shape_type,) + level_params, lambda p=level_params: generate(*p))
+                for level_params in levels]
+        super().__init__(lods[0], properties, kwargs.get('name'))
+        self.lods = lods
 
 
 class ObjectFactory:
     @staticmethod
     def create_object(shape_type: str, properties: ObjectProperties, **kwargs) -> Object3D:
+        """
+        :param kwargs: Shape parameters, plus the image path of any of the TEXTURE_SLOTS maps (diffuse_map,
+                       normal_map, specular_map).
+        """
         if not isinstance(kwargs, dict):
             raise TypeError(f"Expected a dictionary for kwargs, but got {type(kwargs).__name__}")
+        textures = tuple(kwargs.pop(slot, None) for slot in TEXTURE_SLOTS)
 
         if shape_type in ['cube', 'pyramid', 'icosahedron']:
-            return PolyhedralObject(shape_type, properties)
+            obj = PolyhedralObject(shape_type, properties)
         elif shape_type in ['sphere', 'ellipsoid', 'torus', 'cylinder', 'convex_plane', 'concave_plane']:
-            return SmoothObject(shape_type, properties, **kwargs)
+            obj = SmoothObject(shape_type, properties, **kwargs)
         else:
             raise ValueError(f"Unsupported shape type: {shape_type}")
+        obj.textures = textures
+        return obj
 
 # Usage example:
 # properties = ObjectProperties(albedo=(1.0, 0.0, 0.0), metallic=0.5, roughness=0.2)
@@ -1,42 +1,158 @@
+import ctypes
+import hashlib
+import itertools
+import os
+import re
+
+import numpy as np
 from OpenGL.GL import *
-from OpenGL.GL.shaders import compileProgram, compileShader
+from OpenGL.GL.shaders import compileShader
+from OpenGL.error import GLError
+from OpenGL.raw.GL.VERSION.GL_4_1 import glGetProgramBinary as raw_glGetProgramBinary
+from OpenGL.raw.GL.VERSION.GL_4_1 import glProgramBinary as raw_glProgramBinary
+
+from log import get_logger
+from state import gl_state
+from textures import SPECULAR_MAP
+
+log = get_logger("shaders")
+
+# Fixed attribute locations shared by every program variant, so one VAO per mesh works with all of them.
+# Matrix attributes take one location per column.
+ATTRIBUTE_LOCATIONS = {
+    "aPos": 0,
+    "aNormal": 1,
+    "aModel": 2,          # 2-5
+    "aNormalMatrix": 6,   # 6-8
+    "aAlbedo": 9,
+    "aMaterial": 10,
+}
+
+# Uniform block binding points shared by every program, so one buffer per block serves all of them
+UNIFORM_BLOCK_BINDINGS = {
+    "Camera": 0,
+    "Lights": 1,
+}
+
+# Default size of the light array in the Lights block
+MAX_LIGHTS = 10
+
+# Every preprocessor symbol the sources react to. The NO_*/METALLIC_ONLY ones only drop work a scene does
+# not need (specialization_defines), so any combination draws the same image as the general program.
+SHADER_VARIANTS = ('INSTANCED', 'CLUSTERED', 'TEXTURED', 'NO_POINT_LIGHTS', 'NO_DIRECTIONAL_LIGHTS', 'METALLIC_ONLY')
+
+# Where ShaderManager keeps linked program binaries between runs
+PROGRAM_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "anima-fresnel", "shaders")
+
+# Lines placed before the sources for each GLSL profile. The sources are written in GLSL 1.20 terms;
+# for 3.30 core the removed `attribute`/`varying` qualifiers are mapped onto in/out by the preprocessor.
+PROFILE_HEADERS = {
+    'compat': {
+        GL_VERTEX_SHADER: "#version 120\n#extension GL_ARB_uniform_buffer_object : require\n",
+        GL_FRAGMENT_SHADER: "#version 120\n#extension GL_ARB_uniform_buffer_object : require\n"
+                            "#define fragColor gl_FragColor\n",
+    },
+    'core': {
+        GL_VERTEX_SHADER: "#version 330 core\n#define attribute in\n#define varying out\n",
+        GL_FRAGMENT_SHADER: "#version 330 core\n#define varying in\nout vec4 fragColor;\n",
+    },
+}
+
+
+# Extra header lines some variants need in GLSL 1.20, where texture buffers are an extension
+VARIANT_HEADERS = {
+    ('compat', 'CLUSTERED'): "#extension GL_EXT_gpu_shader4 : require\n#define texelFetch texelFetchBuffer\n",
+    ('core', 'TEXTURED'): "#define texture2D texture\n",
+}
+
+# std140 blocks declared identically in both stages; uniform_blocks.py packs the matching buffers
+UNIFORM_BLOCKS = """
+layout(std140) uniform Camera {
+    mat4 view;
+    mat4 projection;
+    vec4 viewPos;  // xyz
+};
+layout(std140) uniform Lights {
+    int numLights;
+    vec4 lightPos[MAX_LIGHTS];    // xyz, zero for directional lights; w = point light radius
+    vec4 lightDir[MAX_LIGHTS];    // xyz
+    vec4 lightColor[MAX_LIGHTS];  // rgb premultiplied by intensity
+};
+"""
+
 
 class Shader:
-    def __init__(self):
+    def __init__(self, defines=(), profile='compat', max_lights=MAX_LIGHTS):
+        """
+        PBR shader program source.
+
+        :param defines: Preprocessor symbols enabling shader variants, e.g. ('INSTANCED',) to read the
+                        model/normal matrices and material from per-instance attributes instead of uniforms,
+                        or ('CLUSTERED',) to shade only the lights assigned to the fragment's cluster,
+                        or ('TEXTURED',) to modulate the material by diffuse, normal and specular maps.
+                        See SHADER_VARIANTS for the full list.
+        :param profile: 'compat' compiles as GLSL 1.20; 'core' as GLSL 3.30 core for core-profile contexts.
+        :param max_lights: Capacity of the light array in the Lights uniform block (unused when CLUSTERED).
+        """
+        if profile not in PROFILE_HEADERS:
+            raise ValueError(f"Unsupported shader profile: {profile}")
+        self.defines = tuple(defines)
+        self.profile = profile
+        self.max_lights = max_lights
         self.vertex_shader = """
-        #version 120
         attribute vec3 aPos;
         attribute vec3 aNormal;
         varying vec3 FragPos;
         varying vec3 Normal;
+        #ifdef INSTANCED
+        attribute mat4 aModel;
+        attribute mat3 aNormalMatrix;
+        attribute vec3 aAlbedo;
+        attribute vec3 aMaterial;  // metallic, roughness, ao
+        varying vec3 vAlbedo;
+        varying vec3 vMaterial;
+        #else
         uniform mat4 model;
-        uniform mat4 view;
-        uniform mat4 projection;
         uniform mat3 normalMatrix;
+        #endif
+        #ifdef TEXTURED
+        varying vec3 LocalPos;
+        varying vec3 LocalNormal;
+        varying mat3 vNormalMatrix;
+        #endif
         void main()
         {
+        #ifdef INSTANCED
+            mat4 model = aModel;
+            mat3 normalMatrix = aNormalMatrix;
+            vAlbedo = aAlbedo;
+            vMaterial = aMaterial;
+        #endif
             FragPos = vec3(model * vec4(aPos, 1.0));
             Normal = normalMatrix * aNormal;
+        #ifdef TEXTURED
+            // Maps are projected in object space, so they move with the object
+            LocalPos = aPos;
+            LocalNormal = aNormal;
+            vNormalMatrix = normalMatrix;
+        #endif
             gl_Position = projection * view * vec4(FragPos, 1.0);
         }
         """
 
         self.fragment_shader = """
-        #version 120
         varying vec3 FragPos;
         varying vec3 Normal;
 
-        uniform vec3 viewPos;
+        #ifdef INSTANCED
+        varying vec3 vAlbedo;
+        varying vec3 vMaterial;
+        #else
         uniform vec3 albedo;
         uniform float metallic;
         uniform float roughness;
         uniform float ao;
-
-        const int MAX_LIGHTS = 10;
-        uniform vec3 lightPos[MAX_LIGHTS];
-        uniform vec3 lightDir[MAX_LIGHTS];  // Add lightDir for directional lights
-        uniform vec3 lightColor[MAX_LIGHTS];
-        uniform int numLights;
+        #endif
 
         const float PI = 3.14159265359;
 
@@ -71,45 +187,135 @@ class Shader:
             return ggx1 * ggx2;
         }
 
-        void main() {
-            vec3 N = normalize(Normal);
-            vec3 V = normalize(viewPos - FragPos);
+        // Smoothly fades a point light to zero at its radius, so culling lights by radius leaves no seams
+        float rangeWindow(float distance, float radius) {
+            float ratio = distance / radius;
+            float falloff = clamp(1.0 - ratio * ratio * ratio * ratio, 0.0, 1.0);
+            return falloff * falloff;
+        }
+
+        // Cook-Torrance contribution of one light; position.w holds a point light's radius, which only the
+        // clustered path fades to (the forward path keeps plain inverse-square attenuation)
+        vec3 shadeLight(vec4 position, vec3 direction, vec3 color, vec3 N, vec3 V, vec3 F0, vec3 albedo,
+                        float metallic, float roughness) {
+            vec3 L;
+            float attenuation = 1.0;
+        #if defined(NO_POINT_LIGHTS)
+            bool pointLight = false;
+        #elif defined(NO_DIRECTIONAL_LIGHTS)
+            bool pointLight = true;
+        #else
+            bool pointLight = length(position.xyz) > 0.0;
+        #endif
+            if (pointLight) {  // Point light
+                L = normalize(position.xyz - FragPos);
+                float distance = length(position.xyz - FragPos);
+            #ifdef CLUSTERED
+                attenuation = rangeWindow(distance, position.w) / (0.1 + distance * distance);
+            #else
+                attenuation = 1.0 / (0.1 + distance * distance);
+            #endif
+            } else {  // Directional light
+                L = normalize(-direction);  // Directional light uses a fixed direction
+            }
+
+            vec3 H = normalize(V + L);
+            vec3 radiance = color * attenuation;
 
+            // Cook-Torrance BRDF
+            float NDF = DistributionGGX(N, H, roughness);
+            float G = GeometrySmith(N, V, L, roughness);
+            vec3 F = fresnelSchlick(clamp(dot(H, V), 0.0, 1.0), F0);
+
+            vec3 numerator = NDF * G * F;
+            float denominator = 4.0 * max(dot(N, V), 0.0) * max(dot(N, L), 0.0) + 0.0001;
+            vec3 specular = numerator / denominator;
+
+        #ifdef METALLIC_ONLY
+            vec3 kD = vec3(0.0);  // Metals have no diffuse term
+        #else
+            vec3 kS = F;
+            vec3 kD = vec3(1.0) - kS;
+            kD *= 1.0 - metallic;
+        #endif
+
+            float NdotL = max(dot(N, L), 0.0);
+            return (kD * albedo / PI + specular) * radiance * NdotL;
+        }
+
+        #ifdef CLUSTERED
+        uniform samplerBuffer lightData;      // 3 texels per light: position + radius, direction, color
+        uniform samplerBuffer clusterRanges;  // (first entry in clusterLights, light count) per cluster
+        uniform samplerBuffer clusterLights;  // light indices grouped by cluster
+        uniform vec3 clusterCounts;           // tiles across, tiles down, depth slices
+        uniform vec4 clusterScale;            // tiles per pixel (x, y), slices per unit of log depth, near plane
+
+        int clusterIndex() {
+            float depth = -(view * vec4(FragPos, 1.0)).z;
+            float x = min(floor(gl_FragCoord.x * clusterScale.x), clusterCounts.x - 1.0);
+            float y = min(floor(gl_FragCoord.y * clusterScale.y), clusterCounts.y - 1.0);
+            float z = clamp(floor(log(max(depth, clusterScale.w) / clusterScale.w) * clusterScale.z),
+                            0.0, clusterCounts.z - 1.0);
+            return int((z * clusterCounts.y + y) * clusterCounts.x + x);
+        }
+        #endif
+
+        #ifdef TEXTURED
+        varying vec3 LocalPos;
+        varying vec3 LocalNormal;
+        varying mat3 vNormalMatrix;
+        uniform sampler2D diffuseMap;   // sRGB albedo factor
+        uniform sampler2D normalMap;    // tangent-space normal
+        uniform sampler2D specularMap;  // roughness factor in green, metallic factor in blue (glTF packing)
+
+        // The meshes have no texture coordinates, so each map is projected along the three object-space axes
+        // and the projections are blended by how squarely the surface faces each axis (triplanar mapping)
+        vec3 triplanarWeights(vec3 n) {
+            vec3 w = pow(abs(n), vec3(4.0));
+            return w / (w.x + w.y + w.z);
+        }
+
+        vec4 triplanar(sampler2D map, vec3 p, vec3 w) {
+            return texture2D(map, p.zy) * w.x + texture2D(map, p.xz) * w.y + texture2D(map, p.xy) * w.z;
+        }
+
+        // Whiteout blend: each projection's tangent-space normal is swizzled onto its axis around n
+        vec3 triplanarNormal(vec3 p, vec3 n, vec3 w) {
+            vec3 tx = texture2D(normalMap, p.zy).xyz * 2.0 - 1.0;
+            vec3 ty = texture2D(normalMap, p.xz).xyz * 2.0 - 1.0;
+            vec3 tz = texture2D(normalMap, p.xy).xyz * 2.0 - 1.0;
+            tx = vec3(tx.xy + n.zy, abs(tx.z) * n.x);
+            ty = vec3(ty.xy + n.xz, abs(ty.z) * n.y);
+            tz = vec3(tz.xy + n.xy, abs(tz.z) * n.z);
+            return normalize(tx.zyx * w.x + ty.xzy * w.y + tz.xyz * w.z);
+        }
+        #endif
+
+        vec4 shadeSurface(vec3 N, vec3 albedo, float metallic, float roughness, float ao) {
+            vec3 V = normalize(viewPos.xyz - FragPos);
+
+        #ifdef METALLIC_ONLY
+            vec3 F0 = albedo;
+        #else
             vec3 F0 = vec3(0.04);  // Default reflective base color
             F0 = mix(F0, albedo, metallic);
+        #endif
 
             vec3 Lo = vec3(0.0);
 
+        #ifdef CLUSTERED
+            // Only the lights whose range reaches this fragment's cluster
+            vec2 range = texelFetch(clusterRanges, clusterIndex()).rg;
+            for(int j = 0; j < int(range.y); j++) {
+                int i = int(texelFetch(clusterLights, int(range.x) + j).r);
+                Lo += shadeLight(texelFetch(lightData, 3 * i), texelFetch(lightData, 3 * i + 1).xyz,
+                                 texelFetch(lightData, 3 * i + 2).rgb, N, V, F0, albedo, metallic, roughness);
+            }
+        #else
             for(int i = 0; i < numLights; i++) {
-                vec3 L;
-                float attenuation = 1.0;
-                if (length(lightPos[i]) > 0.0) {  // Point light
-                    L = normalize(lightPos[i] - FragPos);
-                    float distance = length(lightPos[i] - FragPos);
-                    attenuation = 1.0 / (0.1 + distance * distance);  // Attenuation for point light
-                } else {  // Directional light
-                    L = normalize(-lightDir[i]);  // Directional light uses a fixed direction
-                }
-
-                vec3 H = normalize(V + L);
-                vec3 radiance = lightColor[i] * attenuation;
-
-                // Cook-Torrance BRDF
-                float NDF = DistributionGGX(N, H, roughness);
-                float G = GeometrySmith(N, V, L, roughness);
-                vec3 F = fresnelSchlick(clamp(dot(H, V), 0.0, 1.0), F0);
-
-                vec3 numerator = NDF * G * F;
-                float denominator = 4.0 * max(dot(N, V), 0.0) * max(dot(N, L), 0.0) + 0.0001;
-                vec3 specular = numerator / denominator;
-
-                vec3 kS = F;
-                vec3 kD = vec3(1.0) - kS;
-                kD *= 1.0 - metallic;
-
-                float NdotL = max(dot(N, L), 0.0);
-                Lo += (kD * albedo / PI + specular) * radiance * NdotL;
+                Lo += shadeLight(lightPos[i], lightDir[i].xyz, lightColor[i].rgb, N, V, F0, albedo, metallic, roughness);
             }
+        #endif
 
             vec3 ambient = vec3(0.03) * albedo * ao;
             vec3 color = ambient + Lo;
@@ -117,10 +323,314 @@ class Shader:
             color = color / (color + vec3(1.0));
             color = pow(color, vec3(1.0/2.2));
 
-            gl_FragColor = vec4(color, 1.0);
+            return vec4(color, 1.0);
+        }
+
+        void main() {
+        #ifdef INSTANCED
+            vec3 albedo = vAlbedo;
+            float metallic = vMaterial.x;
+            float roughness = vMaterial.y;
+            float ao = vMaterial.z;
+        #endif
+        #ifdef TEXTURED
+            vec3 n = normalize(LocalNormal);
+            vec3 weights = triplanarWeights(n);
+            vec2 roughnessMetallic = triplanar(specularMap, LocalPos, weights).gb;
+            fragColor = shadeSurface(normalize(vNormalMatrix * triplanarNormal(LocalPos, n, weights)),
+                                     albedo * triplanar(diffuseMap, LocalPos, weights).rgb,
+                                     metallic * roughnessMetallic.y, roughness * roughnessMetallic.x, ao);
+        #else
+            fragColor = shadeSurface(normalize(Normal), albedo, metallic, roughness, ao);
+        #endif
         }
         """
 
-    def compile(self):
-        return compileProgram(compileShader(self.vertex_shader, GL_VERTEX_SHADER),
-                            compileShader(self.fragment_shader, GL_FRAGMENT_SHADER))
+    def apply_defines(self, source, stage):
+        """Prefix `source` with the profile's #version header, a #define line per enabled variant and the uniform blocks."""
+        extensions = "".join(VARIANT_HEADERS.get((self.profile, define), "") for define in self.defines)
+        defines = "".join(f"#define {define}\n" for define in self.defines + (f"MAX_LIGHTS {self.max_lights}",))
+        return f"{PROFILE_HEADERS[self.profile][stage]}{extensions}{defines}{UNIFORM_BLOCKS}{source.strip()}\n"
+
+    def sources(self):
+        """The final (vertex, fragment) source strings."""
+        return (self.apply_defines(self.vertex_shader, GL_VERTEX_SHADER),
+                self.apply_defines(self.fragment_shader, GL_FRAGMENT_SHADER))
+
+    def compile(self, retrievable=False):
+        """
+        Compile and link the program.
+
+        :param retrievable: Ask the driver to keep the linked binary available to glGetProgramBinary.
+        """
+        vertex_source, fragment_source = self.sources()
+        shaders = [compileShader(vertex_source, GL_VERTEX_SHADER), compileShader(fragment_source, GL_FRAGMENT_SHADER)]
+        program = glCreateProgram()
+        for shader in shaders:
+            glAttachShader(program, shader)
+        # Attribute locations must be fixed before linking for the per-mesh VAOs to match every variant
+        for name, location in ATTRIBUTE_LOCATIONS.items():
+            glBindAttribLocation(program, location, name)
+        if retrievable:
+            glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        glLinkProgram(program)
+        for shader in shaders:
+            glDeleteShader(shader)
+        if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+            info_log = glGetProgramInfoLog(program)
+            glDeleteProgram(program)
+            raise RuntimeError(f"Shader link failure: {info_log}")
+
+        bind_uniform_blocks(program)
+        return program
+
+
+def bind_uniform_blocks(program):
+    """Point the program's uniform blocks at their shared binding points."""
+    for name, binding in UNIFORM_BLOCK_BINDINGS.items():
+        index = glGetUniformBlockIndex(program, name)
+        if index != GL_INVALID_INDEX:
+            glUniformBlockBinding(program, index, binding)
+
+
+def specialization_defines(lights, objects):
+    """
+    Variant defines that remove work the scene never needs: a light kind it has no lights of, or the
+    diffuse term when every object is fully metallic (and has no specular map lowering that). Each produces
+    the same image as the general program.
+    """
+    defines = []
+    if not any(light.type == 'point' for light in lights):
+        defines.append('NO_POINT_LIGHTS')
+    if not any(light.type == 'directional' for light in lights):
+        defines.append('NO_DIRECTIONAL_LIGHTS')
+    if objects and all(obj.properties.metallic == 1.0 and obj.textures[SPECULAR_MAP] is None for obj in objects):
+        defines.append('METALLIC_ONLY')
+    return tuple(defines)
+
+
+# Uploads for each active uniform type: (numpy dtype the value is stored as, setter)
+UNIFORM_SETTERS = {
+    GL_FLOAT: (np.float32, lambda location, value: glUniform1f(location, value)),
+    GL_FLOAT_VEC2: (np.float32, lambda location, value: glUniform2fv(location, 1, value)),
+    GL_FLOAT_VEC3: (np.float32, lambda location, value: glUniform3fv(location, 1, value)),
+    GL_FLOAT_VEC4: (np.float32, lambda location, value: glUniform4fv(location, 1, value)),
+    GL_FLOAT_MAT3: (np.float32, lambda location, value: glUniformMatrix3fv(location, 1, GL_FALSE, value)),
+    GL_FLOAT_MAT4: (np.float32, lambda location, value: glUniformMatrix4fv(location, 1, GL_FALSE, value)),
+    GL_INT: (np.int32, lambda location, value: glUniform1i(location, value)),
+    GL_BOOL: (np.int32, lambda location, value: glUniform1i(location, value)),
+    GL_SAMPLER_2D: (np.int32, lambda location, value: glUniform1i(location, value)),
+    GL_SAMPLER_BUFFER: (np.int32, lambda location, value: glUniform1i(location, value)),
+}
+
+
+class ShaderProgram:
+    def __init__(self, program):
+        """
+        A linked program with every active uniform and attribute looked up once.
+
+        Uniform values are remembered per location, so `set_uniform` only calls into GL when a value
+        actually changes. That relies on all uploads to this program going through the wrapper.
+
+        :param program: Program name, e.g. from Shader.compile().
+        """
+        self.program = program
+        self.uniforms = {}    # name -> (location, GL type); arrays also get one entry per element
+        self.attributes = {}  # name -> location
+        self.values = {}      # location -> last uploaded value
+        self.uploads = 0
+        self.skipped_uploads = 0
+        self.introspect()
+
+    @classmethod
+    def from_shader(cls, shader):
+        return cls(shader.compile())
+
+    def introspect(self):
+        for index in range(glGetProgramiv(self.program, GL_ACTIVE_UNIFORMS)):
+            name, size, uniform_type = glGetActiveUniform(self.program, index)
+            name = name.decode()
+            # Arrays are reported once as "name[0]" with their length as the size
+            base = re.sub(r"\[0\]$", "", name)
+            self.uniforms[base] = (glGetUniformLocation(self.program, name), int(uniform_type))
+            if name != base:
+                for element in range(int(size)):
+                    element_name = f"{base}[{element}]"
+                    self.uniforms[element_name] = (glGetUniformLocation(self.program, element_name), int(uniform_type))
+
+        for index in range(glGetProgramiv(self.program, GL_ACTIVE_ATTRIBUTES)):
+            name, _, _ = glGetActiveAttrib(self.program, index)
+            name = name.decode()
+            self.attributes[name] = glGetAttribLocation(self.program, name)
+
+    def uniform_location(self, name):
+        """Location of an active uniform, or -1 if the linker dropped it."""
+        return self.uniforms.get(name, (-1, None))[0]
+
+    def attribute_location(self, name):
+        """Location of an active attribute, or -1 if the linker dropped it."""
+        return self.attributes.get(name, -1)
+
+    def use(self):
+        gl_state.use_program(self.program)
+
+    def set_uniform(self, name, value):
+        """
+        Upload `value` with the setter matching the uniform's declared type, unless it already holds it.
+
+        Must be called with this program current. Uniforms the program does not use are ignored.
+        :return: True if GL was called.
+        """
+        uniform = self.uniforms.get(name)
+        if uniform is None:
+            return False
+        location, uniform_type = uniform
+        dtype, setter = UNIFORM_SETTERS[uniform_type]
+        value = np.asarray(value, dtype=dtype)
+        cached = self.values.get(location)
+        if cached is not None and np.array_equal(cached, value):
+            self.skipped_uploads += 1
+            return False
+        setter(location, value)
+        self.values[location] = value.copy()
+        self.uploads += 1
+        return True
+
+    def delete(self):
+        if gl_state.program == self.program:
+            gl_state.use_program(0)
+        glDeleteProgram(self.program)
+        self.values.clear()
+
+
+class ShaderManager:
+    def __init__(self, profile='compat', max_lights=MAX_LIGHTS, cache_dir=PROGRAM_CACHE_DIR):
+        """
+        Builds and owns one ShaderProgram per variant (set of defines), linking each at most once.
+
+        Linked programs are stored in `cache_dir` through glGetProgramBinary and restored with glProgramBinary
+        on later runs, which skips compiling and linking. Entries are keyed by a hash of the final sources,
+        the attribute locations and the GL vendor, renderer and version strings, so edited shaders or a driver
+        update miss the cache; a binary the driver still rejects is deleted and the program compiled instead.
+
+        :param profile: GLSL profile, 'compat' or 'core'; see Shader.
+        :param max_lights: Size of the light array every variant is compiled with.
+        :param cache_dir: Directory for program binaries; None disables the disk cache.
+        """
+        self.profile = profile
+        self.max_lights = max_lights
+        self.cache_dir = cache_dir
+        self.programs = {}  # sorted defines -> ShaderProgram
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._driver = None
+        self._binary_formats = None
+
+    def program(self, defines=()):
+        """The linked ShaderProgram for the variant `defines`; the context must be current."""
+        key = tuple(sorted(set(defines)))
+        program = self.programs.get(key)
+        if program is None:
+            program = ShaderProgram(self.build(Shader(key, self.profile, self.max_lights)))
+            self.programs[key] = program
+        return program
+
+    @staticmethod
+    def permutations(defines):
+        """Every subset of `defines`, smallest first."""
+        return [combination for count in range(len(defines) + 1)
+                for combination in itertools.combinations(defines, count)]
+
+    def preload(self, variants):
+        """Build every variant in `variants` now instead of on first use."""
+        for defines in variants:
+            self.program(defines)
+
+    def build(self, shader):
+        """Program name for `shader`, restored from the disk cache when possible."""
+        sources = shader.sources()
+        path = self.cache_path(sources)
+        if path:
+            program = self.load_binary(path)
+            if program:
+                self.cache_hits += 1
+                return program
+            self.cache_misses += 1
+        program = shader.compile(retrievable=bool(path))
+        if path:
+            self.store_binary(program, path)
+        return program
+
+    def binaries_supported(self):
+        # Mesa reports no formats when its own shader cache is disabled
+        if self._binary_formats is None:
+            self._binary_formats = int(glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS))
+            if not self._binary_formats:
+                log.info("Driver offers no program binary formats; shader cache disabled")
+        return self._binary_formats > 0
+
+    def cache_path(self, sources):
+        if not self.cache_dir or not self.binaries_supported():
+            return None
+        if self._driver is None:
+            self._driver = "\n".join(glGetString(name).decode(errors='replace')
+                                     for name in (GL_VENDOR, GL_RENDERER, GL_VERSION))
+        digest = hashlib.sha256()
+        for part in (self._driver, repr(sorted(ATTRIBUTE_LOCATIONS.items())), *sources):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return os.path.join(self.cache_dir, digest.hexdigest() + ".bin")
+
+    def load_binary(self, path):
+        """Program restored from the binary at `path`, or None when missing or rejected by the driver."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # File layout: little-endian uint32 binary format, then the driver's binary
+        binary_format = int.from_bytes(data[:4], 'little')
+        binary = data[4:]
+        program = glCreateProgram()
+        try:
+            raw_glProgramBinary(program, binary_format, binary, len(binary))
+            linked = glGetProgramiv(program, GL_LINK_STATUS) == GL_TRUE
+        except GLError:
+            linked = False
+        if not linked:
+            # A rejected binary only fails the link (or raises GL_INVALID_ENUM for an unknown format);
+            # clear the flag so the frame's error check does not report it
+            glGetError()
+            glDeleteProgram(program)
+            log.info("Discarding stale program binary %s", os.path.basename(path))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        bind_uniform_blocks(program)
+        return program
+
+    def store_binary(self, program, path):
+        length = int(glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH))
+        if length <= 0:
+            return
+        binary = ctypes.create_string_buffer(length)
+        written = GLsizei()
+        binary_format = GLenum()
+        raw_glGetProgramBinary(program, length, ctypes.byref(written), ctypes.byref(binary_format), binary)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename, so a concurrent or interrupted run never reads a partial binary
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(int(binary_format.value).to_bytes(4, 'little'))
+                f.write(binary.raw[:written.value])
+            os.replace(temporary, path)
+        except OSError as e:
+            log.warning("Could not store program binary: %s", e)
+
+    def delete(self):
+        for program in self.programs.values():
+            program.delete()
+        self.programs.clear()
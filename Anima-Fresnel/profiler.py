@@ -0,0 +1,186 @@
+import contextlib
+import csv
+import ctypes
+import json
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as raw_glGetQueryObjectui64v
+
+from log import get_logger
+
+log = get_logger("profiler")
+
+# Frames of history kept for the percentile summary
+PROFILE_WINDOW = 300
+
+# Frames of events kept for the Chrome trace (five minutes at 30 fps, some 10 MB); older frames are dropped so long
+# runs do not grow without bound
+TRACE_FRAMES = 9000
+
+# GL_TIME_ELAPSED queries read back per phase; results arrive a few frames late, so keep a pool
+QUERY_POOL_SIZE = 64
+
+PERCENTILES = (50, 95, 99)
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off: every hook is a no-op and `phase` hands out one shared context."""
+    enabled = False
+    _null = contextlib.nullcontext()
+
+    def begin_frame(self, frame_index):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def phase(self, name, gpu=False):
+        return self._null
+
+    def finish(self):
+        pass
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, window=PROFILE_WINDOW, gpu=True, trace_frames=TRACE_FRAMES):
+        """
+        Per-phase CPU and GPU frame timings.
+
+        Phases are timed with perf_counter on the CPU and, when `gpu` is set for the phase and the context
+        supports timer queries, with a GL_TIME_ELAPSED query around the same commands. Query results are
+        collected without stalling once the GPU has them, usually a frame or two later. Phases may nest on the
+        CPU (the inner time is included in the outer); GPU phases must not, since elapsed-time queries cannot.
+
+        :param window: Frames of history the percentile summary covers.
+        :param gpu: Time GPU work too; requires GL 3.3 or ARB_timer_query and a current context.
+        :param trace_frames: Most recent frames whose events are kept for the trace (None keeps every frame).
+        """
+        self.window = window
+        self.trace_frames = trace_frames
+        self.gpu = gpu and self.timer_queries_supported()
+        self.cpu_times = defaultdict(lambda: deque(maxlen=window))
+        self.gpu_times = defaultdict(lambda: deque(maxlen=window))
+        self.events = deque()  # (phase, frame, start seconds, CPU seconds), in phase end order
+        self.gpu_events = deque()  # (phase, frame, start seconds, GPU seconds)
+        self.frame_index = 0
+        self.frame_start = None
+        self.origin = time.perf_counter()
+        self.free_queries = list(glGenQueries(QUERY_POOL_SIZE)) if self.gpu else []
+        self.pending_queries = deque()  # (query, phase, frame, CPU start)
+        # PyOpenGL's wrapper has no array type for 64-bit query results, so the raw entry point fills this
+        self.query_result = ctypes.c_uint64()
+
+    @staticmethod
+    def timer_queries_supported():
+        version = glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION)
+        if tuple(int(v) for v in version) >= (3, 3):
+            return True
+        return any(glGetStringi(GL_EXTENSIONS, i) == b"GL_ARB_timer_query"
+                   for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
+    def begin_frame(self, frame_index):
+        self.frame_index = frame_index
+        self.collect_queries()
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        end = time.perf_counter()
+        self.record("frame", self.frame_start, end - self.frame_start)
+        if self.trace_frames is not None:
+            self.trim_trace(self.frame_index - self.trace_frames)
+
+    def trim_trace(self, last_dropped):
+        """Drop the trace events of every frame up to and including `last_dropped`."""
+        for events in (self.events, self.gpu_events):
+            while events and events[0][1] <= last_dropped:
+                events.popleft()
+
+    @contextlib.contextmanager
+    def phase(self, name, gpu=False):
+        query = None
+        if gpu and self.gpu:
+            if not self.free_queries:
+                self.collect_queries(wait=True)
+            query = self.free_queries.pop()
+            glBeginQuery(GL_TIME_ELAPSED, query)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if query is not None:
+                glEndQuery(GL_TIME_ELAPSED)
+                self.pending_queries.append((query, name, self.frame_index, start))
+            self.record(name, start, end - start)
+
+    def record(self, name, start, seconds):
+        self.cpu_times[name].append(seconds)
+        self.events.append((name, self.frame_index, start - self.origin, seconds))
+
+    def collect_queries(self, wait=False):
+        """Read every finished timer query, oldest first; with `wait` block on the oldest one."""
+        while self.pending_queries:
+            query, name, frame, start = self.pending_queries[0]
+            if not wait and not glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            wait = False
+            raw_glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(self.query_result))
+            seconds = self.query_result.value * 1e-9
+            self.pending_queries.popleft()
+            self.free_queries.append(query)
+            self.gpu_times[name].append(seconds)
+            self.gpu_events.append((name, frame, start - self.origin, seconds))
+
+    def finish(self):
+        """Wait for outstanding GPU timings and release the queries; call with the context current."""
+        while self.pending_queries:
+            self.collect_queries(wait=True)
+        if self.gpu:
+            glDeleteQueries(len(self.free_queries), self.free_queries)
+            self.free_queries = []
+
+    def summary(self):
+        """{(phase, 'cpu' or 'gpu'): {'mean', 'p50', 'p95', 'p99', 'frames'}} in milliseconds over the window."""
+        rows = {}
+        for clock, times in (("cpu", self.cpu_times), ("gpu", self.gpu_times)):
+            for name, samples in times.items():
+                samples = np.asarray(samples) * 1000.0
+                row = {"mean": float(samples.mean()), "frames": len(samples)}
+                row.update({f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(samples, PERCENTILES))})
+                rows[(name, clock)] = row
+        return rows
+
+    def log_summary(self):
+        for (name, clock), row in self.summary().items():
+            log.info("%-10s %s  mean %7.2f ms  p50 %7.2f  p95 %7.2f  p99 %7.2f  (%d frames)", name, clock,
+                     row["mean"], row["p50"], row["p95"], row["p99"], row["frames"])
+
+    def export_chrome_trace(self, path):
+        """
+        Write the phases of the last `trace_frames` frames as complete ('X') events in Chrome trace JSON (chrome://tracing, Perfetto).
+
+        GPU phases go on their own track, placed at the CPU time their commands were issued; the GPU may have
+        executed them later.
+        """
+        events = [{"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "Anima Fresnel"}},
+                  {"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "CPU"}},
+                  {"name": "thread_name", "ph": "M", "pid": 0, "tid": 1, "args": {"name": "GPU"}}]
+        for tid, recorded in ((0, self.events), (1, self.gpu_events)):
+            events.extend({"name": name, "ph": "X", "pid": 0, "tid": tid, "ts": start * 1e6, "dur": seconds * 1e6,
+                           "args": {"frame": frame}} for name, frame, start, seconds in recorded)
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path):
+        """Write the percentile summary, one row per phase and clock."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase", "clock", "frames", "mean_ms"] + [f"p{p}_ms" for p in PERCENTILES])
+            for (name, clock), row in self.summary().items():
+                writer.writerow([name, clock, row["frames"], f"{row['mean']:.4f}"] +
+                                [f"{row[f'p{p}']:.4f}" for p in PERCENTILES])
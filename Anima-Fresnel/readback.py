@@ -0,0 +1,80 @@
+import ctypes
+import time
+
+import numpy as np
+from OpenGL.GL import *
+
+
+class PixelReadback:
+    def __init__(self, width, height, depth=3):
+        """
+        Ring of pixel buffer objects for asynchronous framebuffer readback.
+
+        Frame k is read into slot k % depth and mapped `depth` frames later, by which time the GPU has long
+        finished the transfer, so mapping does not stall the render loop.
+
+        :param depth: Number of pixel buffer objects (frames of latency) in the ring.
+        """
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.frame_size = width * height * 3
+        self.frames_issued = 0
+        self.frames_consumed = 0
+
+        self.pbos = []
+        for _ in range(depth):
+            pbo = glGenBuffers(1)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_size, None, GL_STREAM_READ)
+            self.pbos.append(pbo)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def capture(self, consumer):
+        """
+        Start reading the bound framebuffer and hand the frame from `depth` frames ago to `consumer`.
+
+        :param consumer: Callable receiving an (height, width, 3) uint8 view of the mapped buffer, already
+                         flipped top-down. The view is only valid for the duration of the call.
+        :return: Seconds the render thread was blocked by the readback this frame.
+        """
+        start = time.perf_counter()
+        consumer_time = 0.0
+        slot = self.frames_issued % self.depth
+        if self.frames_issued - self.frames_consumed == self.depth:
+            consumer_time = self.consume(slot, consumer)
+
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[slot])
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.frames_issued += 1
+
+        # Time spent inside the consumer is encoding, not readback
+        return time.perf_counter() - start - consumer_time
+
+    def consume(self, slot, consumer):
+        """Map `slot`, pass its pixels to `consumer` without copying, then unmap it. Returns the consumer's run time."""
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[slot])
+        address = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.frame_size, GL_MAP_READ_BIT)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * self.frame_size).from_address(address))
+        image = pixels.reshape(self.height, self.width, 3)[::-1]  # Flip vertically
+
+        consumer_start = time.perf_counter()
+        consumer(image)
+        consumer_time = time.perf_counter() - consumer_start
+
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.frames_consumed += 1
+        return consumer_time
+
+    def flush(self, consumer):
+        """Hand every frame still in flight to `consumer`, oldest first."""
+        while self.frames_consumed < self.frames_issued:
+            self.consume(self.frames_consumed % self.depth, consumer)
+
+    def cleanup(self):
+        for pbo in self.pbos:
+            glDeleteBuffers(1, [pbo])
+        self.pbos = []
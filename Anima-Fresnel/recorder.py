@@ -2,59 +2,267 @@ import os
 import imageio
 import numpy as np
 import datetime
+import multiprocessing
 import threading
+import queue
 import time
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from log import get_logger
+
+log = get_logger("recorder")
+
+
+def encode_png(segment_name, shape, frame_path):
+    """
+    Pool worker: write the frame stored in shared memory segment `segment_name` as a PNG.
+
+    The segment is attached for this frame only and closed again, so workers hold no mappings between
+    frames and nothing is left open when the pool shuts down; attaching costs far less than the encode.
+    """
+    segment = shared_memory.SharedMemory(name=segment_name)
+    try:
+        imageio.imwrite(frame_path, np.ndarray(shape, dtype=np.uint8, buffer=segment.buf))
+    finally:
+        try:
+            segment.close()
+        except BufferError:
+            pass  # A failed write's traceback still holds the frame view; the mapping goes when it is freed
+
 
 class Recorder:
-    def __init__(self, width, height, fps=30):
+    def __init__(self, width, height, fps=30, mode='png', codec='libx264', preset='slow', crf=18,
+                 queue_size=8, output_filename=None, encode_workers=0, max_in_flight=None, lossless=False):
+        """
+        Capture rendered frames to a video.
+
+        :param mode: 'png' writes a PNG sequence into frames/ and encodes it at the end;
+                     'stream' pipes raw RGB frames straight into one ffmpeg process while rendering.
+        :param codec: ffmpeg video codec.
+        :param preset: ffmpeg encoder preset.
+        :param crf: Constant rate factor passed to the encoder.
+        :param queue_size: Frames buffered for the streaming writer thread before capture_frame blocks.
+        :param output_filename: Video path; defaults to a timestamped output_*.mp4 (output_*.mkv when lossless).
+        :param encode_workers: In 'png' mode, number of worker processes encoding frames in parallel
+                               (0 encodes serially on the calling thread). Workers start from a forkserver,
+                               so the main script must guard its entry point with `if __name__ == "__main__"`.
+        :param max_in_flight: Frames handed to the pool but not yet written before capture_frame blocks
+                              (defaults to twice the worker count).
+        :param lossless: Encode with FFV1 in RGB instead of `codec`, so segments can be joined without
+                         generation loss (see sharding.py).
+        """
         self.width = width
         self.height = height
         self.fps = fps
+        self.mode = mode
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.lossless = lossless
         self.frame_count = 0
         self.frames_dir = 'frames'
-        self.ensure_directory(self.frames_dir)
+        self.backpressure_time = 0.0
+
+        if output_filename is None:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            output_filename = f"output_{timestamp}.{'mkv' if lossless else 'mp4'}"
+        self.output_filename = output_filename
+
+        self.encode_pool = None
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.encode_latencies = []
+        self.stats_lock = threading.Lock()
+
+        if self.mode == 'png':
+            self.ensure_directory(self.frames_dir)
+            if encode_workers > 0:
+                self.start_encode_pool(encode_workers, max_in_flight or 2 * encode_workers)
+        elif self.mode == 'stream':
+            self.start_stream(queue_size)
+        else:
+            raise ValueError(f"Unsupported recorder mode: {mode}")
 
     def ensure_directory(self, directory):
         if not os.path.exists(directory):
             os.makedirs(directory)
 
+    def encoder_args(self):
+        if self.lossless:
+            return ['-c:v', 'ffv1', '-level', '3', '-pix_fmt', 'bgr0']
+        return [
+            '-c:v', self.codec,
+            '-preset', self.preset,
+            '-crf', str(self.crf),
+            '-pix_fmt', 'yuv420p',
+        ]
+
+    def start_stream(self, queue_size):
+        """Open the ffmpeg process and the writer thread that feeds its stdin."""
+        ffmpeg_command = [
+            'ffmpeg', '-y',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f'{self.width}x{self.height}',
+            '-framerate', str(self.fps),
+            '-i', '-',
+            *self.encoder_args(),
+            self.output_filename
+        ]
+        log.info("Running ffmpeg command: %s", ' '.join(ffmpeg_command))
+        self.ffmpeg = subprocess.Popen(ffmpeg_command, stdin=subprocess.PIPE)
+
+        # Bounded queue: when the encoder falls behind, capture_frame blocks the render loop
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.stream_failed = False  # Set by the writer once ffmpeg stops accepting frames
+        self.writer = threading.Thread(target=self.write_frames, daemon=True)
+        self.writer.start()
+
+    def write_frames(self):
+        written = 0
+        while True:
+            frame = self.frame_queue.get()
+            if frame is None:
+                break
+            if self.stream_failed:
+                continue  # Keep draining, or capture_frame and finalize_stream would block on the full queue
+            try:
+                self.ffmpeg.stdin.write(memoryview(frame))
+                written += 1
+            except BrokenPipeError:
+                self.stream_failed = True
+                log.error("ffmpeg closed its input after %d frames; dropping the remaining frames", written)
+
+    def start_encode_pool(self, workers, max_in_flight):
+        """Create the worker pool and one shared memory frame slot per in-flight frame."""
+        # Workers come from a clean forkserver process: forking the renderer would copy its GL context and
+        # the state of its other threads (locks held mid-call) into every worker
+        self.encode_pool = ProcessPoolExecutor(max_workers=workers,
+                                               mp_context=multiprocessing.get_context("forkserver"))
+        frame_bytes = self.width * self.height * 3
+        self.segments = [shared_memory.SharedMemory(create=True, size=frame_bytes) for _ in range(max_in_flight)]
+        self.free_segments = queue.Queue()
+        for segment in self.segments:
+            self.free_segments.put(segment)
+
+    def submit_frame(self, image, frame_path):
+        """Copy `image` into a free shared memory slot and queue it for a pool worker."""
+        start = time.perf_counter()
+        segment = self.free_segments.get()  # Blocks while max_in_flight frames are outstanding
+        self.backpressure_time += time.perf_counter() - start
+
+        frame = np.ndarray(image.shape, dtype=np.uint8, buffer=segment.buf)
+        frame[...] = image
+        with self.stats_lock:
+            self.in_flight += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.in_flight)
+
+        submitted = time.perf_counter()
+        future = self.encode_pool.submit(encode_png, segment.name, image.shape, frame_path)
+
+        def on_done(future):
+            with self.stats_lock:
+                self.in_flight -= 1
+                self.encode_latencies.append(time.perf_counter() - submitted)
+            if future.exception() is not None:
+                log.error("Could not write %s: %s", frame_path, future.exception())
+            self.free_segments.put(segment)
+
+        future.add_done_callback(on_done)
+
+    def encode_stats(self):
+        """Queue depth and encode latency counters for sizing the worker pool."""
+        with self.stats_lock:
+            latencies = np.array(self.encode_latencies) if self.encode_latencies else np.zeros(1)
+            return {
+                "queue_depth": self.in_flight,
+                "max_queue_depth": self.max_queue_depth,
+                "encoded_frames": len(self.encode_latencies),
+                "mean_latency": float(latencies.mean()),
+                "p95_latency": float(np.percentile(latencies, 95)),
+                "backpressure_time": self.backpressure_time,
+            }
+
     def capture_frame(self, image):
-        frame_path = os.path.join(self.frames_dir, f'frame_{self.frame_count:06d}.png')
-        imageio.imwrite(frame_path, image)
-        print(f"Saved frame {self.frame_count}")
+        if self.mode == 'stream':
+            if not self.stream_failed:
+                # The caller's buffer is only valid during this call, so queue one contiguous copy; the writer
+                # hands it to ffmpeg through a memoryview rather than copying it again into a bytes object
+                frame = np.array(image, dtype=np.uint8, order='C', copy=True)
+                start = time.perf_counter()
+                self.frame_queue.put(frame)
+                self.backpressure_time += time.perf_counter() - start
+        else:
+            frame_path = os.path.join(self.frames_dir, f'frame_{self.frame_count:06d}.png')
+            if self.encode_pool:
+                self.submit_frame(image, frame_path)
+            else:
+                imageio.imwrite(frame_path, image)
+        log.debug("Saved frame %d", self.frame_count)
         self.frame_count += 1
 
     def finalize_video(self):
-        if self.frame_count == 0:
-            print("No frames were captured. Cannot create video.")
+        if self.mode == 'stream':
+            self.finalize_stream()
             return
 
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        output_filename = f"output_{timestamp}.mp4"
+        if self.encode_pool:
+            self.shutdown_encode_pool()
+
+        if self.frame_count == 0:
+            log.warning("No frames were captured. Cannot create video.")
+            return
 
         # Use ffmpeg to combine frames into a video
         ffmpeg_command = [
             'ffmpeg',
             '-framerate', str(self.fps),
             '-i', os.path.join(self.frames_dir, 'frame_%06d.png'),
-            '-c:v', 'libx264',
-            '-preset', 'slow',
-            '-crf', '18',
+            *self.encoder_args(),
             '-vf', f'fps={self.fps},scale={self.width}:{self.height}',
-            '-pix_fmt', 'yuv420p',
-            output_filename
+            self.output_filename
         ]
 
-        print(f"Running ffmpeg command: {' '.join(ffmpeg_command)}")
+        log.info("Running ffmpeg command: %s", ' '.join(ffmpeg_command))
 
         try:
             subprocess.run(ffmpeg_command, check=True)
-            print(f"Video saved as {output_filename}")
+            log.info("Video saved as %s", self.output_filename)
         except subprocess.CalledProcessError as e:
-            print(f"Error creating video: {e}")
+            log.error("Error creating video: %s", e)
 
         # Optionally, clean up frame images
         for file in os.listdir(self.frames_dir):
             os.remove(os.path.join(self.frames_dir, file))
         os.rmdir(self.frames_dir)
+
+    def shutdown_encode_pool(self):
+        """Wait for every outstanding PNG write, then release the pool and its shared memory."""
+        log.info("Waiting for outstanding frame writes...")
+        self.encode_pool.shutdown(wait=True)
+        stats = self.encode_stats()
+        log.info("Encoded %d frames: mean latency %.1f ms, p95 %.1f ms, max queue depth %d, "
+                 "render loop blocked %.2f s", stats['encoded_frames'], stats['mean_latency'] * 1000.0,
+                 stats['p95_latency'] * 1000.0, stats['max_queue_depth'], stats['backpressure_time'])
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.encode_pool = None
+
+    def finalize_stream(self):
+        """Drain the queue, close ffmpeg's stdin and wait for the encoder to finish the file."""
+        self.frame_queue.put(None)  # The writer drains the queue even after a broken pipe, so this cannot block
+        self.writer.join()
+        try:
+            self.ffmpeg.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.ffmpeg.wait() != 0:
+            log.error("Error creating video: ffmpeg exited with status %d", self.ffmpeg.returncode)
+        elif self.frame_count == 0:
+            log.warning("No frames were captured.")
+        else:
+            log.info("Video saved as %s", self.output_filename)
+        log.info("Render loop blocked on the encoder for %.2f s in total", self.backpressure_time)
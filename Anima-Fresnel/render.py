@@ -1,12 +1,20 @@
-import glfw
 from OpenGL.GL import *
-from pbr_shaders import Shader
+from pbr_shaders import MAX_LIGHTS, PROGRAM_CACHE_DIR, ShaderManager, specialization_defines
+from lod import LOD_HYSTERESIS
 from scene import Scene
-import numpy as np
+from textures import NO_TEXTURES, TextureStreamer
 from recorder import Recorder
 import time
 from genesis import Genesis
-import traceback
+from mesh import mesh_registry
+from readback import PixelReadback
+from context import create_backend
+from glerrors import gl_errors
+from log import frame_sampler, get_logger
+from profiler import PROFILE_WINDOW, TRACE_FRAMES, NullProfiler, Profiler
+from watcher import WATCH_INTERVAL, ConfigWatcher
+
+log = get_logger("render")
 
 # Define constants for anisotropic filtering
 GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT = 0x84FF
@@ -14,114 +22,288 @@ GL_TEXTURE_MAX_ANISOTROPY_EXT = 0x84FE
 
 
 class Renderer:
-    def __init__(self, width, height, record=False, fps=30):
+    def __init__(self, width, height, record=False, fps=30, instanced=False, readback_depth=3, recorder_options=None,
+                 backend='glfw', config_file="world_config.json", offline=False, seed=0,
+                 start_frame=0, profile='compat', max_lights=MAX_LIGHTS, clustered=False, culling=True,
+                 lod=True, lod_hysteresis=LOD_HYSTERESIS, profiler=False, profiler_window=PROFILE_WINDOW,
+                 profiler_trace_frames=TRACE_FRAMES, profiler_output=None, error_mode='frame',
+                 shader_cache=PROGRAM_CACHE_DIR, specialize=True, watch=False, watch_interval=WATCH_INTERVAL,
+                 snapshot=None, save_snapshot=None, textures=True, texture_options=None, count_triangles=False):
+        """
+        :param offline: Advance the scene by exactly 1/fps per frame and never sleep, so frames render as fast
+                        as the machine allows and are identical across runs. LODs are then picked without
+                        hysteresis, since it makes a frame depend on the frames rendered before it.
+        :param seed: Placement seed for offline renders whose config does not set one.
+        :param start_frame: Frame to begin at; the scene is evaluated at that frame's time instead of being
+                            simulated through the earlier ones.
+        :param profile: 'compat' renders with GLSL 1.20 shaders in a compatibility context; 'core' creates a
+                        3.3 core-profile context and uses the GLSL 3.30 shader variant.
+        :param max_lights: Size of the shader's light array; lights beyond it are ignored.
+        :param clustered: Use clustered forward lighting, which has no light limit and shades each fragment
+                          only with the lights whose radius reaches it.
+        :param culling: Frustum-cull objects on the CPU before they reach the draw path.
+        :param lod: Switch smooth objects to coarser meshes as they get smaller on screen.
+        :param lod_hysteresis: Relative size margin an object must cross before its LOD changes (live renders only).
+        :param profiler: Time the phases of every frame on the CPU and GPU; the percentiles are logged at cleanup.
+        :param profiler_window: Frames the profiler's percentiles cover.
+        :param profiler_trace_frames: Most recent frames kept for the Chrome trace (None keeps the whole run).
+        :param profiler_output: Path prefix for the Chrome trace (.json) and summary (.csv) written at cleanup.
+        :param error_mode: GL error checking: 'off', 'frame' (one glGetError drain per frame) or 'strict'
+                           (KHR_debug callback at the failing call, or polling after every draw step).
+        :param shader_cache: Directory for linked program binaries reused across runs; None always compiles.
+        :param specialize: Compile the shader variant without the light kinds and material terms the scene
+                           does not use.
+        :param watch: Reload the config whenever the file changes, applying only the differences to the scene.
+        :param watch_interval: Seconds between checks of the config file.
+        :param snapshot: Scene snapshot to start from instead of the config (Genesis.load_snapshot).
+        :param save_snapshot: Path to write the loaded scene to as a snapshot.
+        :param textures: Shade objects with the maps named in their "texture_maps", streamed in the background.
+        :param texture_options: TextureStreamer keyword arguments (memory_budget, upload_budget, workers,
+                                synchronous); offline renders load each texture before the first frame using it
+                                unless this sets synchronous.
+        :param count_triangles: Report the triangles drawn each frame in frame_stats["triangles"].
+        """
         self.width = width
         self.height = height
+        self.shaders = None
         self.shader = None
         self.scene = None
         self.fbo = None
         self.hdr_texture = None
         self.recorder = None
+        self.readback = None
+        self.readback_depth = readback_depth
+        self.recorder_options = recorder_options or {}
+        self.stall_stats = {"frames": 0, "total": 0.0, "max": 0.0}  # Readback stall, in seconds, over the run
         self.record = record
-        self.window = None
+        self.instanced = instanced
+        self.profile = profile
+        self.max_lights = max_lights
+        self.clustered = clustered
+        self.culling = culling
+        self.lod = lod
+        # A process seeking to frame k has no earlier frames to carry LOD state over from, so offline renders
+        # pick each level from the frame alone; that keeps frame k the same in a shard and a continuous render
+        self.lod_hysteresis = 0.0 if offline else lod_hysteresis
+        self.profiling = profiler
+        self.profiler_window = profiler_window
+        self.profiler_trace_frames = profiler_trace_frames
+        self.profiler_output = profiler_output
+        self.profiler = NullProfiler()
+        self.error_mode = error_mode
+        self.shader_cache = shader_cache
+        self.specialize = specialize
+        self.defines = ()
+        self.texturing = textures
+        self.texture_options = texture_options or {}
+        self.texture_streamer = None
+        self.snapshot = snapshot
+        self.save_snapshot = save_snapshot
+        if watch and snapshot:
+            log.warning("Watching needs the config the scene was built from; not watching snapshot %s", snapshot)
+        self.watcher = ConfigWatcher(config_file, watch_interval) if watch and not snapshot else None
+        self.count_triangles = count_triangles
+        self.frame_stats = {}
+        self.visibility_stats = {"frames": 0, "total": 0, "min": None, "max": 0}  # Visible objects over the run
+        self.backend = create_backend(backend)
         self.initialized = False
         self.context = None
         self.fps = fps
         self.frame_time = 1.0 / fps
-        self.genesis = Genesis("world_config.json")  # Initialize Genesis here
+        self.offline = offline
+        self.frame_index = start_frame
+        self.genesis = Genesis(config_file, seed=seed if offline else None)  # Initialize Genesis here
 
     def initialize(self):
         try:
-            if not glfw.init():
-                raise Exception("GLFW initialization failed")
-            else:
-                print("GLFW initialized.")
-
             if self.record:
                 self.width, self.height = 2880, 1800
-                glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
-                self.window = glfw.create_window(self.width, self.height, "Offscreen", None, None)
+                self.backend.initialize(self.width, self.height, visible=False, core_profile=self.profile == 'core')
             else:
-                glfw.window_hint(glfw.SAMPLES, 8)
-                self.window = glfw.create_window(self.width, self.height, "PBR Scene", None, None)
-                print(f"Creating window with {self.width}x{self.height}")
+                self.backend.initialize(self.width, self.height, visible=True, samples=8,
+                                        core_profile=self.profile == 'core')
+            self.context = self.backend.context
 
-            if not self.window:
-                raise Exception("Failed to create GLFW window")
-
-            glfw.make_context_current(self.window)
-            self.context = glfw.get_current_context()
 
+            gl_errors.install(self.error_mode)
+            if self.profiling:
+                self.profiler = Profiler(self.profiler_window, trace_frames=self.profiler_trace_frames)
 
             glEnable(GL_DEPTH_TEST)
             if not self.record:
                 glEnable(GL_MULTISAMPLE)
 
-            shader_obj = Shader()
-            self.shader = shader_obj.compile()
-            if not self.shader:
-                raise Exception("Shader compilation failed")
+            start = time.perf_counter()
+            if self.snapshot:
+                self.genesis.load_snapshot(self.snapshot)
             else:
-                print("Shader compiled. YAY")
-
-            self.genesis.load()
-            print(f"Genesis created {len(self.genesis.elements)} elements.")
-            self.scene = Scene(self.shader, self.width, self.height)
+                self.genesis.load()
+            log.info("Genesis created %d objects from %s in %.1f ms", len(self.genesis.elements["objects"]),
+                     self.snapshot or self.genesis.config_file, (time.perf_counter() - start) * 1000.0)
+            if self.save_snapshot:
+                self.genesis.save_snapshot(self.save_snapshot)
+
+            # The variant depends on the scene's lights and materials, so it is picked once they are loaded
+            self.defines = defines = self.shader_defines()
+            self.shaders = ShaderManager(self.profile, self.max_lights, cache_dir=self.shader_cache)
+            start = time.perf_counter()
+            self.shader = self.shaders.program(defines)
+            log.info("Shader variant %s ready in %.1f ms (%s)", " ".join(defines) or "default",
+                     (time.perf_counter() - start) * 1000.0, "cached binary" if self.shaders.cache_hits else "compiled")
+            if self.texturing:
+                # Frames of offline renders must not depend on how fast images decode
+                self.texture_streamer = TextureStreamer(**{"synchronous": self.offline, **self.texture_options})
+            self.scene = Scene(self.shader, self.width, self.height, instanced=self.instanced,
+                               max_lights=self.max_lights, clustered=self.clustered, culling=self.culling,
+                               lod=self.lod, lod_hysteresis=self.lod_hysteresis, profiler=self.profiler,
+                               textures=self.scene_textures(), count_triangles=self.count_triangles)
             self.scene.setup_scene(self.genesis)
+            if self.frame_index:
+                self.scene.transforms.seek(self.frame_index * self.frame_time)
 
             # Initialize FBO
             self.fbo, self.hdr_texture = self.create_framebuffer(self.width, self.height)
 
             if self.record:
-                self.recorder = Recorder(self.width, self.height, self.fps)
+                self.recorder = Recorder(self.width, self.height, self.fps, **self.recorder_options)
+                self.readback = PixelReadback(self.width, self.height, self.readback_depth)
 
             self.initialized = True
-            print("Renderer initialized successfully")
+            log.info("Renderer initialized successfully")
 
         except Exception as e:
-            print(f"Error during initialization: {e}")
-            traceback.print_exc()
+            log.exception("Error during initialization: %s", e)
             self.cleanup()
 
 
 
+    def shader_defines(self):
+        defines = (("INSTANCED",) if self.instanced else ()) + (("CLUSTERED",) if self.clustered else ())
+        elements = self.genesis.get_elements()
+        if self.texturing and any(obj.textures != NO_TEXTURES for obj in elements["objects"]):
+            defines += ("TEXTURED",)
+        if self.specialize:
+            defines += specialization_defines(elements["lights"], elements["objects"])
+        return defines
+
+    def scene_textures(self):
+        """The texture streamer if the current variant samples maps, else None."""
+        return self.texture_streamer if "TEXTURED" in self.defines else None
+
+    def reload(self, config=None):
+        """
+        Re-read the config and apply its differences to the live scene; a config that fails to parse (e.g. one
+        caught mid-save) leaves the scene as it was. Needs the context current.
+
+        :param config: Already parsed config to apply instead of reading the file.
+        :return: Genesis.reload's change counts, or None if the config could not be read.
+        """
+        start = time.perf_counter()
+        if config is None:
+            try:
+                config = self.genesis.read_config()
+            except (OSError, ValueError) as e:
+                log.warning("Keeping the current scene; could not read %s: %s", self.genesis.config_file, e)
+                return None
+        parsed = time.perf_counter()
+
+        changes = self.genesis.reload(config)
+        elements = self.genesis.get_elements()
+        self.scene.camera = elements["camera"]
+        if changes["camera"]:
+            self.scene.update_projection_matrix()
+        if changes["structure"]:
+            # A new list, so the culler and LOD selector rebuild their per-object arrays
+            self.scene.objects = elements["objects"]
+            if self.scene.instancer:
+                self.scene.instancer.prune(mesh_registry.meshes)
+
+        # Lights and materials decide the specialized variant; switching is a cache lookup once it was built
+        defines = self.shader_defines()
+        if defines != self.defines:
+            self.defines = defines
+            self.shader = self.shaders.program(defines)
+            self.scene.set_shader(self.shader)
+            self.scene.textures = self.scene_textures()
+            log.info("Switched to shader variant %s", " ".join(defines) or "default")
+
+        end = time.perf_counter()
+        log.info("Reloaded %s in %.1f ms (parse %.1f ms, apply %.1f ms): %d updated, %d rebuilt, %d added, "
+                 "%d removed, %d lights, %d containers%s", self.genesis.config_file, (end - start) * 1000.0,
+                 (parsed - start) * 1000.0, (end - parsed) * 1000.0, changes["updated"], changes["rebuilt"],
+                 changes["added"], changes["removed"], changes["lights"], changes["containers"],
+                 ", camera" if changes["camera"] else "")
+        return changes
+
     def render(self, delta_time):
         if not self.initialized or not self.context:
-            print("Renderer not initialized or no valid context. Skipping render.")
+            log.warning("Renderer not initialized or no valid context. Skipping render.")
             return
 
+        if self.watcher and self.watcher.changed():
+            self.backend.make_current()
+            self.reload()
+
         start_time = time.time()
+        scene_time = None
+        if self.offline:
+            # Fixed timestep: the scene state depends only on the frame index, never on the wall clock,
+            # and frame k looks the same whether or not frames 0..k-1 were rendered in this process
+            scene_time = self.frame_index * self.frame_time
 
-        glfw.make_context_current(self.window)
+        frame_sampler.begin_frame(self.frame_index)
+        self.backend.make_current()
+        self.profiler.begin_frame(self.frame_index)
 
         glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
         glViewport(0, 0, self.width, self.height)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        glUseProgram(self.shader)
-        self.scene.set_camera_and_lighting()
-        self.scene.draw_objects(delta_time)
+        with self.profiler.phase("uniforms", gpu=True):
+            self.shader.use()
+            self.scene.set_camera_and_lighting()
+        self.scene.draw_objects(delta_time, scene_time)
+        self.frame_stats = dict(self.scene.stats)
+        visible = self.frame_stats["visible"]
+        visibility = self.visibility_stats
+        visibility["frames"] += 1
+        visibility["total"] += visible
+        visibility["min"] = visible if visibility["min"] is None else min(visibility["min"], visible)
+        visibility["max"] = max(visibility["max"], visible)
 
         if self.record and self.recorder:
-            pixels = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_FLOAT)
-            image = (np.frombuffer(pixels, dtype=np.float32).reshape(self.height, self.width, 3) * 255).astype(np.uint8)
-            image = np.flip(image, axis=0)  # Flip vertically
-            self.recorder.capture_frame(image)
-            print(f"Captured frame {self.recorder.frame_count}")
-
-        if not self.record:
-            glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
-            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
-            glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
-            glfw.swap_buffers(self.window)
-
-        glfw.poll_events()
-
+            # Asynchronous PBO readback; the recorder receives the frame from `readback_depth` frames ago
+            with self.profiler.phase("readback", gpu=True):
+                stall_time = self.readback.capture(self.encode_frame)
+            self.stall_stats["frames"] += 1
+            self.stall_stats["total"] += stall_time
+            self.stall_stats["max"] = max(self.stall_stats["max"], stall_time)
+            log.debug("Captured frame %d (readback stall %.2f ms)", self.recorder.frame_count, stall_time * 1000.0)
+
+        if not self.record and self.backend.has_window:
+            with self.profiler.phase("present", gpu=True):
+                glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+                glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+                glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+                self.backend.swap_buffers()
+
+        self.backend.poll_events()
+        gl_errors.end_frame(self.frame_index)
+        self.profiler.end_frame()
+        self.frame_index += 1
+
+        if self.offline:
+            return
         end_time = time.time()
         sleep_time = self.frame_time - (end_time - start_time)
         if sleep_time > 0:
             time.sleep(sleep_time)
 
+    def encode_frame(self, image):
+        """Readback consumer: hand the frame to the recorder, timed as the 'encode' phase."""
+        with self.profiler.phase("encode"):
+            self.recorder.capture_frame(image)
+
     def create_framebuffer(self, width, height):
         fbo = glGenFramebuffers(1)
         glBindFramebuffer(GL_FRAMEBUFFER, fbo)
@@ -132,7 +314,7 @@ class Renderer:
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
-        if glGetString(GL_EXTENSIONS) and b"GL_EXT_texture_filter_anisotropic" in glGetString(GL_EXTENSIONS):
+        if self.has_extension(b"GL_EXT_texture_filter_anisotropic"):
             max_anisotropy = glGetFloatv(GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT)
             glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY_EXT, min(16.0, max_anisotropy))
 
@@ -149,33 +331,71 @@ class Renderer:
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
         return fbo, texture
 
+    @staticmethod
+    def has_extension(name):
+        # Core profiles removed glGetString(GL_EXTENSIONS); the indexed query works in both profiles
+        return any(glGetStringi(GL_EXTENSIONS, i) == name for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
     def cleanup(self):
-        print("\nStarting cleanup process")
+        log.info("Starting cleanup process")
+        if self.readback and self.recorder:
+            log.info("Flushing in-flight frames...")
+            self.readback.flush(self.encode_frame)
+            stalls = self.stall_stats
+            if stalls["frames"]:
+                log.info("Readback stall per frame: mean %.2f ms, max %.2f ms",
+                         stalls["total"] / stalls["frames"] * 1000.0, stalls["max"] * 1000.0)
+
+        visibility = self.visibility_stats
+        if visibility["frames"] and self.scene:
+            log.info("Visible objects per frame: mean %.1f of %d, min %d, max %d",
+                     visibility["total"] / visibility["frames"], self.scene.stats['objects'], visibility["min"],
+                     visibility["max"])
+
         if self.recorder:
-            print("Finalizing video...")
+            log.info("Finalizing video...")
             self.recorder.finalize_video()
 
         if self.initialized and self.context:
-            glfw.make_context_current(self.window)
+            self.backend.make_current()
+            if self.profiler.enabled:
+                self.report_profile()
             if self.fbo is not None:
-                print(f"Deleting framebuffer: {self.fbo}")
+                log.debug("Deleting framebuffer: %s", self.fbo)
                 glDeleteFramebuffers(1, [self.fbo])
             if self.hdr_texture is not None:
-                print(f"Deleting texture: {self.hdr_texture}")
+                log.debug("Deleting texture: %s", self.hdr_texture)
                 glDeleteTextures(1, [self.hdr_texture])
-            if self.shader is not None:
-                print(f"Deleting shader program: {self.shader}")
-                glDeleteProgram(self.shader)
-
-        if self.window:
-            glfw.destroy_window(self.window)
-
-        print("Terminating GLFW")
-        glfw.terminate()
-        print("Cleanup complete")
+            if self.readback:
+                self.readback.cleanup()
+            if self.scene:
+                self.scene.cleanup()
+            if self.texture_streamer:
+                log.debug("Deleting %d textures", len(self.texture_streamer.resident))
+                self.texture_streamer.cleanup()
+            log.debug("Deleting %d cached meshes", len(mesh_registry.meshes))
+            mesh_registry.cleanup()
+            if self.shaders is not None:
+                log.debug("Deleting %d shader programs", len(self.shaders.programs))
+                self.shaders.delete()
+            if gl_errors.errors:
+                log.warning("%d OpenGL errors were reported", gl_errors.errors)
+            gl_errors.uninstall()
+
+        self.backend.cleanup()
+        log.info("Cleanup complete")
+
+    def report_profile(self):
+        """Collect the outstanding GPU timings, log the percentiles and write the trace and CSV if requested."""
+        self.profiler.finish()
+        self.profiler.log_summary()
+        if self.profiler_output:
+            self.profiler.export_chrome_trace(f"{self.profiler_output}.json")
+            self.profiler.export_csv(f"{self.profiler_output}.csv")
+            log.info("Profile written to %s.json and %s.csv", self.profiler_output, self.profiler_output)
 
     def should_close(self):
-        return self.window and glfw.window_should_close(self.window)
+        return self.backend.should_close()
 
     def poll_events(self):
-        glfw.poll_events()
+        self.backend.poll_events()
@@ -1,33 +1,80 @@
+import logging
+
 from OpenGL.GL import *
 import pyrr
 import numpy as np
-from OpenGL.GL import glGetError, GL_NO_ERROR
+from culling import FrustumCuller
+from glerrors import gl_errors
+from lod import LODSelector, LOD_HYSTERESIS
+from log import frame_sampler, get_logger
+from profiler import NullProfiler
+from instancing import InstancedRenderer
+from light_clusters import LightClusters
+from pbr_shaders import MAX_LIGHTS
+from transform import transform_system
+from uniform_blocks import CameraBlock, LightBlock
+
+log = get_logger("scene")
+state_log = get_logger("state")  # Per-object dumps on sampled frames
 
 class Scene:
-    def __init__(self, shader, width, height):
+    def __init__(self, shader, width, height, instanced=False, max_lights=MAX_LIGHTS, clustered=False, culling=True,
+                 lod=True, lod_hysteresis=LOD_HYSTERESIS, profiler=None, textures=None, count_triangles=False):
+        """
+        :param shader: ShaderProgram wrapping the linked PBR program; per-object uniform uploads go through it.
+        :param max_lights: Light capacity the shader was compiled with.
+        :param clustered: Cull lights to view-frustum clusters for a program built with the CLUSTERED define.
+        :param culling: Skip objects whose bounding sphere lies outside the view frustum.
+        :param lod: Draw each smooth object with the LOD mesh matching its size on screen.
+        :param lod_hysteresis: Relative size margin before an object's LOD changes.
+        :param profiler: Profiler timing the animate and draw phases.
+        :param textures: TextureStreamer supplying the objects' maps, for a program built with the TEXTURED define.
+        :param count_triangles: Total the triangles drawn each frame into stats["triangles"] (always done when
+                                debug logging is on).
+        """
         self.shader = shader
         self.width = width
         self.height = height
         self.camera = None
         self.lights = []
         self.objects = []
+        self.transforms = transform_system
+        self.view = None
+        self.culler = FrustumCuller(self.transforms) if culling else None
+        self.lod = LODSelector(self.transforms, hysteresis=lod_hysteresis) if lod else None
+        self.profiler = profiler or NullProfiler()
+        self.textures = textures
+        self.count_triangles = count_triangles
+        self.stats = {"objects": 0, "visible": 0, "culled": 0, "triangles": None}
+
+        self.shader.use()
 
-        glUseProgram(self.shader)
+        # Camera and lights live in uniform buffers shared by every program
+        self.camera_block = CameraBlock()
+        self.light_block = LightBlock(max_lights)
+        self.clusters = LightClusters() if clustered else None
 
-        self.model_loc = glGetUniformLocation(self.shader, "model")
-        self.view_loc = glGetUniformLocation(self.shader, "view")
-        self.projection_loc = glGetUniformLocation(self.shader, "projection")
-        self.normal_matrix_loc = glGetUniformLocation(self.shader, "normalMatrix")
+        # Batched path: one instanced draw per distinct mesh instead of one draw per object
+        self.instancer = InstancedRenderer(self.shader) if instanced else None
 
     def setup_scene(self, genesis):
         scene_data = genesis.get_elements()
-        print(scene_data)
+        log.info("Scene: %d objects, %d lights", len(scene_data["objects"]), len(scene_data["lights"]))
         self.camera = scene_data["camera"]
         self.lights = scene_data["lights"]
         self.objects = scene_data["objects"]
+        # Placement is final once Genesis has arranged the containers: that is scene time zero
+        self.transforms.mark_origin()
 
         self.update_projection_matrix()
 
+    def set_shader(self, shader):
+        """Draw with `shader` from now on, e.g. after a reload changed the variant the scene needs."""
+        self.shader = shader
+        if self.instancer:
+            self.instancer.shader = shader
+        self.shader.use()
+
     def update_projection_matrix(self):
         if self.camera:
             self.projection = pyrr.matrix44.create_perspective_projection(
@@ -37,28 +84,13 @@ class Scene:
                 far=self.camera.far_clip,
                 dtype=np.float32
             )
-            glUniformMatrix4fv(self.projection_loc, 1, GL_FALSE, self.projection)
-
-
-    def calculate_normal_matrix(self, model_matrix):
-        # Extract the upper-left 3x3 part of the model matrix (the rotational part)
-        normal_matrix = np.array(model_matrix[:3, :3], dtype=np.float32)
-
-        # Calculate the transpose of the inverse of the normal matrix
-        normal_matrix = np.linalg.inv(normal_matrix).T
-
-        return normal_matrix
+            if self.clusters:
+                self.clusters.set_projection(self.camera.field_of_view, self.width / self.height,
+                                             self.camera.near_clip, self.camera.far_clip, self.width, self.height)
 
 
     def set_camera_and_lighting(self):
-        print(f"Camera: {self.camera}")  # Check if camera is initialized
-        if self.camera:
-            print(f"Camera position: {self.camera.position}, look_at: {self.camera.look_at}, up_vector: {self.camera.up_vector}")
-        else:
-            print("Camera not initialized")
-
-        print(f"Lights: {self.lights}")  # Check if lights are initialized
-        glUseProgram(self.shader)
+        self.shader.use()
 
         # Camera view matrix
         if self.camera:
@@ -68,77 +100,117 @@ class Scene:
                 up=self.camera.up_vector,
                 dtype=np.float32
             )
-            glUniformMatrix4fv(self.view_loc, 1, GL_FALSE, view)
-            check_gl_errors()
-            glUniform3fv(glGetUniformLocation(self.shader, "viewPos"), 1, self.camera.position)
-            check_gl_errors()
+            self.view = view
+            # One buffer upload, and only when the camera moved
+            self.camera_block.set(view, self.projection, self.camera.position)
+            gl_errors.check("camera setup")
         else:
-            print("Camera not set correctly")
-
-        # Ensure the projection matrix is set
-        glUniformMatrix4fv(glGetUniformLocation(self.shader, "projection"), 1, GL_FALSE, self.projection)
-        check_gl_errors()
-
-        # Lighting setup
-        for i, light in enumerate(self.lights):
-            if light.type == 'point':
-                # Point light uses position
-                print(f"Point Light {i}: position = {light.position}, color = {light.color}, intensity = {light.intensity}")
-                glUniform3fv(glGetUniformLocation(self.shader, f"lightPos[{i}]"), 1, light.position)
-            elif light.type == 'directional':
-                # Directional light uses direction
-                print(f"Directional Light {i}: direction = {light.direction}, color = {light.color}, intensity = {light.intensity}")
-                glUniform3fv(glGetUniformLocation(self.shader, f"lightDir[{i}]"), 1, light.direction)
-            check_gl_errors()
-            glUniform3fv(glGetUniformLocation(self.shader, f"lightColor[{i}]"), 1, light.color * light.intensity)
-            check_gl_errors()
-
-        glUniform1i(glGetUniformLocation(self.shader, "numLights"), len(self.lights))
-        check_gl_errors()
-
-        print(f"Amount Lights: {len(self.lights)}")
-
-
-    def draw_objects(self, delta_time):
-        print(f"Drawing {len(self.objects)} objects...")  # Log the number of objects
-        for i, obj in enumerate(self.objects):
-            print(f"Drawing object {i}: {obj}")  # Log each object
-
-            # Animation and model matrix update
-            model_matrix = obj.animate(delta_time)
-            print(f"Object {i} model matrix: {model_matrix}")  # Log the model matrix
-
-            glUniformMatrix4fv(self.model_loc, 1, GL_FALSE, model_matrix)
-            check_gl_errors()  # Check for any OpenGL errors
-
-            # Normal matrix calculation and upload
-            normal_matrix = self.calculate_normal_matrix(model_matrix)
-            print(f"Object {i} normal matrix: {normal_matrix}")  # Log the normal matrix
+            log.warning("Camera not set; drawing without a view")
 
-            glUniformMatrix3fv(self.normal_matrix_loc, 1, GL_FALSE, normal_matrix)
-            check_gl_errors()
+        if self.clusters:
+            # Per-cluster light lists for this frame's view; the shader reads them from texture buffers
+            if self.camera:
+                self.clusters.update(view, self.lights)
+                self.clusters.bind(self.shader)
+        else:
+            # The whole light array goes up in one buffer upload, and only when a light changed
+            self.light_block.set(self.lights)
+        gl_errors.check("light setup")
+
+        if self.textures:
+            self.textures.set_samplers(self.shader)
+
+
+    def draw_objects(self, delta_time, scene_time=None):
+        # Advance every object's transform and rebuild all model/normal matrices in one batched pass;
+        # with an absolute scene_time the state is evaluated directly instead of accumulated
+        with self.profiler.phase("animate"):
+            if scene_time is None:
+                self.transforms.update(delta_time)
+            else:
+                self.transforms.seek(scene_time)
+
+            if self.lod and self.camera and self.objects:
+                self.lod.select(self.objects, self.camera.position, self.camera.field_of_view, self.height)
+            objects = self.visible_objects()
+        # Totalling the triangles walks every visible object, so it only happens when something reads the total
+        debug = log.isEnabledFor(logging.DEBUG)
+        if self.count_triangles or debug:
+            self.stats["triangles"] = sum(obj.mesh.index_count for obj in objects) // 3
+        if debug:
+            log.debug("Drawing %d of %d objects (%d triangles)", len(objects), len(self.objects),
+                      self.stats["triangles"])
+        if frame_sampler.active:
+            self.log_state(objects)
+
+        if self.textures:
+            # Finished decodes go up within the frame's upload budget; maps still loading draw as placeholders
+            with self.profiler.phase("textures"):
+                self.textures.update()
+            gl_errors.check("texture upload")
+
+        with self.profiler.phase("draw", gpu=True):
+            self.submit(objects)
+
+
+    def submit(self, objects):
+        """Issue the draw calls for `objects`, whose transforms are already up to date."""
+        if self.instancer:
+            self.instancer.draw(objects, self.textures)
+            gl_errors.check("instanced draw")
+            return
+
+        for obj in objects:
+            if self.textures:
+                self.textures.bind(obj.textures)
+            self.shader.set_uniform("model", obj.model_matrix)
+            self.shader.set_uniform("normalMatrix", obj.normal_matrix)
 
             # Set material properties uniforms
-            print(f"Object {i} properties: Albedo = {obj.properties.albedo}, Metallic = {obj.properties.metallic}, Roughness = {obj.properties.roughness}, AO = {obj.properties.ao}")  # Log object properties
-
-            glUniform3fv(glGetUniformLocation(self.shader, "albedo"), 1, obj.properties.albedo)
-            check_gl_errors()
-            glUniform1f(glGetUniformLocation(self.shader, "metallic"), obj.properties.metallic)
-            check_gl_errors()
-            glUniform1f(glGetUniformLocation(self.shader, "roughness"), obj.properties.roughness)
-            check_gl_errors()
-            glUniform1f(glGetUniformLocation(self.shader, "ao"), obj.properties.ao)
-            check_gl_errors()
-
-            # Draw the object
-            print(f"Rendering object {i}...")  # Log rendering step
-            obj.draw(self.shader)
-            check_gl_errors()  # Check for any OpenGL errors during drawing
+            self.shader.set_uniform("albedo", obj.properties.albedo)
+            self.shader.set_uniform("metallic", obj.properties.metallic)
+            self.shader.set_uniform("roughness", obj.properties.roughness)
+            self.shader.set_uniform("ao", obj.properties.ao)
+            gl_errors.check("uniforms of %s", obj.name)
 
-        print("Finished drawing objects.")
+            obj.draw(self.shader)
+            gl_errors.check("draw of %s", obj.name)
 
 
-def check_gl_errors():
-    err = glGetError()
-    if err != GL_NO_ERROR:
-        print(f"OpenGL error: {err}")
+    def log_state(self, objects):
+        """Dump the camera, the lights and every drawn object's matrices and material to the state logger."""
+        if self.camera:
+            state_log.debug("Camera position = %s, look_at = %s, up_vector = %s", self.camera.position,
+                            self.camera.look_at, self.camera.up_vector)
+        for i, light in enumerate(self.lights):
+            if light.type == 'point':
+                state_log.debug("Point light %d: position = %s, color = %s, intensity = %s", i, light.position,
+                                light.color, light.intensity)
+            elif light.type == 'directional':
+                state_log.debug("Directional light %d: direction = %s, color = %s, intensity = %s", i,
+                                light.direction, light.color, light.intensity)
+        for i, obj in enumerate(objects):
+            state_log.debug("Object %d %s: lod %d\nmodel matrix:\n%s\nnormal matrix:\n%s\n"
+                            "albedo = %s, metallic = %s, roughness = %s, ao = %s", i, obj.name, obj.lod,
+                            obj.model_matrix, obj.normal_matrix, obj.properties.albedo, obj.properties.metallic,
+                            obj.properties.roughness, obj.properties.ao)
+
+
+    def visible_objects(self):
+        """Objects inside the view frustum after this frame's transform update; records the counts in `stats`."""
+        objects = self.objects
+        if self.culler and self.view is not None and objects:
+            objects = self.culler.cull(objects, self.view, self.projection)
+        self.stats["objects"] = len(self.objects)
+        self.stats["visible"] = len(objects)
+        self.stats["culled"] = len(self.objects) - len(objects)
+        return objects
+
+
+    def cleanup(self):
+        if self.instancer:
+            self.instancer.cleanup()
+        self.camera_block.delete()
+        self.light_block.delete()
+        if self.clusters:
+            self.clusters.cleanup()
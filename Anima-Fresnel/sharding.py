@@ -0,0 +1,109 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def parse_shard(spec):
+    """Parse an 'I/N' shard spec into (index, count)."""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like I/N, got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in [0, {count}), got {index}")
+    return index, count
+
+
+def frame_range(total_frames, index, count):
+    """[start, end) frames of shard `index` when `total_frames` are split into `count` near-equal ranges."""
+    return total_frames * index // count, total_frames * (index + 1) // count
+
+
+def segment_path(directory, index):
+    return os.path.join(directory, f"segment_{index:04d}.mkv")
+
+
+def merge_segments(segments, output_filename):
+    """Join lossless segments into one video with ffmpeg's concat demuxer, copying the streams as they are."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+        for segment in segments:
+            listing.write(f"file '{os.path.abspath(segment)}'\n")
+    ffmpeg_command = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', listing.name, '-c', 'copy', output_filename]
+    print(f"Running ffmpeg command: {' '.join(ffmpeg_command)}")
+    try:
+        subprocess.run(ffmpeg_command, check=True)
+        print(f"Video saved as {output_filename}")
+    finally:
+        os.remove(listing.name)
+
+
+def launch(shards, total_frames, output_filename, main_args=(), keep_segments=False):
+    """
+    Render a `total_frames` long recording as `shards` main.py processes, then merge their segments.
+
+    :param main_args: Extra arguments for every main.py process (backend, config, ...).
+    :param keep_segments: Leave the per-shard segment files next to the output instead of deleting them.
+    """
+    segment_dir = os.path.splitext(output_filename)[0] + "_segments"
+    os.makedirs(segment_dir, exist_ok=True)
+
+    env = dict(os.environ)
+    # llvmpipe spreads every context over all cores by default; split them between the shards instead
+    env.setdefault("LP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // shards)))
+
+    processes = []
+    for index in range(shards):
+        start, end = frame_range(total_frames, index, shards)
+        if start == end:
+            continue
+        command = [sys.executable, MAIN_SCRIPT, '--record', '--lossless', '--frames', str(total_frames),
+                   '--shard', f"{index}/{shards}", '--output', segment_path(segment_dir, index), *main_args]
+        print(f"Shard {index}: frames {start}-{end - 1}")
+        log = open(os.path.join(segment_dir, f"shard_{index:04d}.log"), 'w')
+        processes.append((index, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env), log))
+
+    failed = []
+    for index, process, log in processes:
+        if process.wait() != 0:
+            failed.append(index)
+        log.close()
+    if failed:
+        raise RuntimeError(f"Shards {failed} failed; see the logs in {segment_dir}")
+
+    segments = [segment_path(segment_dir, index) for index, _, _ in processes]
+    merge_segments(segments, output_filename)
+
+    if not keep_segments:
+        for file in os.listdir(segment_dir):
+            os.remove(os.path.join(segment_dir, file))
+        os.rmdir(segment_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render one recording across several processes")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    launch_parser = subparsers.add_parser('launch', help="render all shards locally and merge them")
+    launch_parser.add_argument('--shards', type=int, default=os.cpu_count() or 1)
+    launch_parser.add_argument('--frames', type=int, default=300, help="length of the whole clip")
+    launch_parser.add_argument('--output', default="output.mkv")
+    launch_parser.add_argument('--keep-segments', action='store_true')
+
+    merge_parser = subparsers.add_parser('merge', help="join segments rendered elsewhere, in the order given")
+    merge_parser.add_argument('output')
+    merge_parser.add_argument('segments', nargs='+')
+
+    # Anything not recognised here (--backend, --config, ...) is passed through to main.py
+    args, main_args = parser.parse_known_args()
+    if args.command == 'launch':
+        launch(args.shards, args.frames, args.output, main_args, args.keep_segments)
+    else:
+        merge_segments(args.segments, args.output)
+
+
+if __name__ == "__main__":
+    main()
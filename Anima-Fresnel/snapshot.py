@@ -0,0 +1,309 @@
+import contextlib
+import gc
+import json
+import os
+import struct
+
+import numpy as np
+
+from animation import WRAP_MODES, KeyframeAnimator, TrackSet
+from camera import Camera
+from light import Light
+from log import get_logger
+from mesh import mesh_registry
+from objects import LOD_LEVELS, Object3D, ObjectProperties
+from textures import TEXTURE_SLOTS
+from transform import transform_system
+
+log = get_logger("snapshot")
+
+SNAPSHOT_MAGIC = b"AFSCENE\0"
+# Bump whenever the arrays or their meaning change; older files are rejected rather than misread
+SNAPSHOT_VERSION = 2
+# Every array starts on this byte boundary, so mapped views are aligned for any dtype and for SIMD loads
+SNAPSHOT_ALIGNMENT = 64
+
+# magic | version | array count | metadata offset | metadata size
+HEADER = struct.Struct("<8sIIQQ")
+# name | dtype | ndim | shape (up to 4 dims) | offset
+TOC_ENTRY = struct.Struct("<32s8sI4xQQQQQ")
+
+LIGHT_TYPES = ('point', 'directional')
+
+
+def align(offset):
+    return -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Suspend the cyclic garbage collector, which otherwise rescans the heap while many objects are created."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def write_snapshot(path, arrays, meta):
+    """
+    Write `arrays` (name -> ndarray) and the JSON-serializable `meta` into one snapshot file.
+
+    Layout: header, table of contents, then every array's raw little-endian bytes at an aligned offset, then
+    the metadata as JSON. The file is written next to `path` and renamed over it, so readers never see a
+    partial snapshot.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    offset = align(HEADER.size + TOC_ENTRY.size * len(arrays))
+    entries = []
+    for name, array in arrays.items():
+        if array.ndim > 4:
+            raise ValueError(f"Snapshot array {name} has {array.ndim} dimensions; at most 4 are supported")
+        entries.append((name, array.astype(array.dtype.newbyteorder('<'), copy=False), offset))
+        offset = align(offset + array.nbytes)
+    metadata = json.dumps(meta).encode()
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(entries), offset, len(metadata)))
+        for name, array, array_offset in entries:
+            shape = array.shape + (0,) * (4 - array.ndim)
+            f.write(TOC_ENTRY.pack(name.encode(), array.dtype.str.encode(), array.ndim, *shape, array_offset))
+        for name, array, array_offset in entries:
+            f.seek(array_offset)
+            f.write(array.data)
+        f.seek(offset)
+        f.write(metadata)
+    os.replace(temporary, path)
+
+
+class SnapshotFile:
+    def __init__(self, path):
+        """
+        A snapshot mapped into memory. `arrays` holds read-only views straight into the mapped pages, so
+        opening costs one mmap and reading the table of contents; pages load when an array is first touched.
+
+        :raises ValueError: The file is not a snapshot or was written by a different format version.
+        """
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self.data) < HEADER.size:
+            raise ValueError(f"{path} is not a scene snapshot")
+        magic, version, count, meta_offset, meta_size = HEADER.unpack_from(self.data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a scene snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is snapshot version {version}; this build reads version {SNAPSHOT_VERSION}, "
+                             f"export the scene again")
+
+        self.arrays = {}
+        for i in range(count):
+            name, dtype, ndim, *shape, offset = TOC_ENTRY.unpack_from(self.data, HEADER.size + i * TOC_ENTRY.size)
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+            shape = tuple(shape[:ndim])
+            nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            self.arrays[name.rstrip(b"\0").decode()] = self.data[offset:offset + nbytes].view(dtype).reshape(shape)
+        self.meta = json.loads(bytes(self.data[meta_offset:meta_offset + meta_size]))
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+def save_scene(path, elements, source=None):
+    """
+    Export fully built scene elements: every distinct mesh once, then per-object LOD chains, materials, texture
+    maps and transform rows, keyframe tracks, lights and camera.
+
+    :param source: Config file the scene was built from, recorded for staleness checks.
+    """
+    objects = elements["objects"]
+    count = len(objects)
+    transforms = objects[0].transforms if objects else transform_system
+
+    # Every distinct mesh once, in order of first use
+    meshes = {}
+    for obj in objects:
+        for mesh in obj.lods:
+            meshes.setdefault(mesh.key, mesh)
+    mesh_list = list(meshes.values())
+    mesh_index = {key: i for i, key in enumerate(meshes)}
+    vertex_counts = np.array([len(mesh.vertices) for mesh in mesh_list], dtype=np.int64)
+    index_counts = np.array([len(mesh.indices) for mesh in mesh_list], dtype=np.int64)
+
+    lods = np.full((count, LOD_LEVELS), -1, dtype=np.int32)
+    for i, obj in enumerate(objects):
+        lods[i, :len(obj.lods)] = [mesh_index[mesh.key] for mesh in obj.lods]
+    rows = np.fromiter((obj.row for obj in objects), dtype=np.intp, count=count)
+    names = [(obj.name or "").encode() for obj in objects]
+    name_offsets = np.concatenate([[0], np.cumsum([len(name) for name in names], dtype=np.int64)])
+    # Texture maps as indices into the list of distinct paths in the metadata, -1 for none
+    texture_index = {None: -1}
+    textures = np.array([[texture_index.setdefault(path, len(texture_index) - 1) for path in obj.textures]
+                         for obj in objects], dtype=np.int32).reshape(count, len(TEXTURE_SLOTS))
+
+    arrays = {
+        "mesh_vertex_counts": vertex_counts,
+        "mesh_index_counts": index_counts,
+        "mesh_vertices": np.concatenate([mesh.vertices for mesh in mesh_list]) if mesh_list
+        else np.empty((0, 6), np.float32),
+        "mesh_indices": np.concatenate([mesh.indices for mesh in mesh_list]) if mesh_list
+        else np.empty(0, np.uint32),
+        "object_lods": lods,
+        "object_lod": np.fromiter((obj.lod for obj in objects), dtype=np.int8, count=count),
+        "object_names": np.frombuffer(b"".join(names), dtype=np.uint8),
+        "object_name_offsets": name_offsets,
+        # Materials stay float64 so restored objects match JSON-built ones exactly
+        "object_albedo": np.array([obj.properties.albedo for obj in objects], dtype=np.float64).reshape(count, 3),
+        "object_material": np.array([(obj.properties.metallic, obj.properties.roughness, obj.properties.ao)
+                                     for obj in objects], dtype=np.float64).reshape(count, 3),
+        "object_speeds": np.array([(obj.properties.rotation_speed, obj.properties.movement_speed,
+                                    obj.properties.scale_speed) for obj in objects],
+                                  dtype=np.float64).reshape(count, 3, 3),
+        "object_textures": textures,
+        "object_bounds": np.array([obj.properties.bounds if obj.properties.bounds is not None else (np.nan,) * 3
+                                   for obj in objects], dtype=np.float64).reshape(count, 3),
+    }
+    for field in transforms.FIELDS:
+        arrays[f"transform_{field}"] = getattr(transforms, field)[rows]
+
+    lights = elements["lights"]
+    arrays["light_types"] = np.array([LIGHT_TYPES.index(light.type) for light in lights], dtype=np.uint8)
+    for field in ("position", "direction", "color"):
+        arrays[f"light_{field}s"] = np.array([getattr(light, field) if getattr(light, field) is not None
+                                              else (np.nan,) * 3 for light in lights],
+                                             dtype=np.float32).reshape(len(lights), 3)
+    arrays["light_intensities"] = np.array([light.intensity for light in lights], dtype=np.float64)
+    arrays["light_radii"] = np.array([np.nan if light.radius is None else light.radius for light in lights],
+                                     dtype=np.float64)
+
+    # Keyframe tracks of the exported objects, one group of arrays per (channel, interpolation) track set
+    track_sets = []
+    if transforms.animator is not None:
+        object_of_row = np.full(transforms.count, -1, dtype=np.int64)
+        object_of_row[rows] = np.arange(count)
+        for (channel, interpolation), track_set in transforms.animator.sets.items():
+            tracks = [(object_of_row[row], track) for row, track in track_set.tracks.items()
+                      if object_of_row[row] >= 0]
+            if not tracks:
+                continue
+            prefix = f"track{len(track_sets)}"
+            arrays[f"{prefix}_objects"] = np.array([i for i, _ in tracks], dtype=np.int64)
+            arrays[f"{prefix}_lengths"] = np.array([len(times) for _, (times, _, _) in tracks], dtype=np.int64)
+            arrays[f"{prefix}_times"] = np.concatenate([times for _, (times, _, _) in tracks])
+            arrays[f"{prefix}_values"] = np.concatenate([values for _, (_, values, _) in tracks])
+            arrays[f"{prefix}_modes"] = np.array([WRAP_MODES.index(mode) for _, (_, _, mode) in tracks],
+                                                 dtype=np.uint8)
+            track_sets.append({"channel": channel, "interpolation": interpolation, "prefix": prefix})
+
+    camera = elements["camera"]
+    meta = {
+        "source": source,
+        "mesh_keys": [list(key) for key in meshes],
+        "texture_paths": [path for path in texture_index if path is not None],
+        "track_sets": track_sets,
+        "camera": None if camera is None else {
+            "position": list(camera.position), "look_at": list(camera.look_at),
+            "up_vector": list(camera.up_vector), "field_of_view": camera.field_of_view,
+            "near_clip": camera.near_clip, "far_clip": camera.far_clip,
+        },
+    }
+    write_snapshot(path, arrays, meta)
+
+
+def load_scene(path, transforms=transform_system):
+    """
+    Restore the elements saved by save_scene into `transforms` and the shared mesh registry.
+
+    Meshes are uploaded straight from the mapped file, and transform rows are filled with one slice
+    assignment per field; the only per-object Python work is creating the Object3D and its properties.
+
+    :return: (elements dict as built by Genesis.load, the snapshot's metadata).
+    """
+    snapshot = SnapshotFile(path)
+    source = snapshot.meta.get("source")
+    if source and os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path):
+        log.warning("%s was saved before %s last changed; the snapshot may be stale", path, source)
+
+    vertex_ends = np.cumsum(snapshot["mesh_vertex_counts"])
+    index_ends = np.cumsum(snapshot["mesh_index_counts"])
+    lods = snapshot["object_lods"]
+    count = len(lods)
+    users = np.bincount(lods[lods >= 0], minlength=len(vertex_ends))
+    vertices, indices = snapshot["mesh_vertices"], snapshot["mesh_indices"]
+    meshes = [mesh_registry.adopt(tuple(key), vertices[end - n:end], indices[index_end - m:index_end], int(uses))
+              for key, end, n, index_end, m, uses in zip(snapshot.meta["mesh_keys"], vertex_ends,
+                                                          snapshot["mesh_vertex_counts"], index_ends,
+                                                          snapshot["mesh_index_counts"], users)]
+
+    first = transforms.add_rows(count)
+    rows = slice(first, first + count)
+    for field in transforms.FIELDS:
+        getattr(transforms, field)[rows] = snapshot[f"transform_{field}"]
+
+    # Building the per-object lists and objects allocates millions of acyclic objects; collecting while they are
+    # created only costs time
+    with gc_paused():
+        blob = bytes(snapshot["object_names"])
+        name_offsets = snapshot["object_name_offsets"].tolist()
+        albedo = snapshot["object_albedo"].tolist()
+        material = snapshot["object_material"].tolist()
+        speeds = snapshot["object_speeds"].tolist()
+        bounds = snapshot["object_bounds"]
+        has_bounds = ~np.isnan(bounds).any(axis=1)
+        bounds = bounds.tolist()
+        chains = lods.tolist()
+        levels = snapshot["object_lod"].tolist()
+        # One tuple per distinct combination of maps, shared by its objects; index -1 reads the trailing None
+        texture_paths = snapshot.meta["texture_paths"] + [None]
+        texture_sets, texture_set = np.unique(snapshot["object_textures"], axis=0, return_inverse=True)
+        texture_sets = [tuple(texture_paths[i] for i in row) for row in texture_sets.tolist()]
+        texture_set = texture_set.reshape(-1).tolist()
+        objects = []
+        for i in range(count):
+            metallic, roughness, ao = material[i]
+            rotation_speed, movement_speed, scale_speed = speeds[i]
+            properties = ObjectProperties(albedo=tuple(albedo[i]), metallic=metallic, roughness=roughness, ao=ao,
+                                          rotation_speed=tuple(rotation_speed), movement_speed=tuple(movement_speed),
+                                          scale_speed=tuple(scale_speed), bounds=bounds[i] if has_bounds[i] else None)
+            chain = [meshes[m] for m in chains[i] if m >= 0]
+            obj = Object3D(chain[0], properties, blob[name_offsets[i]:name_offsets[i + 1]].decode() or None,
+                           row=first + i)
+            obj.lods = chain
+            obj.set_lod(levels[i])
+            obj.textures = texture_sets[texture_set[i]]
+            objects.append(obj)
+
+    for track_set_meta in snapshot.meta["track_sets"]:
+        if transforms.animator is None:
+            transforms.animator = KeyframeAnimator()
+        channel, interpolation, prefix = (track_set_meta[k] for k in ("channel", "interpolation", "prefix"))
+        track_set = transforms.animator.sets.setdefault((channel, interpolation), TrackSet(channel, interpolation))
+        times, values = snapshot[f"{prefix}_times"], snapshot[f"{prefix}_values"]
+        ends = np.cumsum(snapshot[f"{prefix}_lengths"]).tolist()
+        starts = [0] + ends[:-1]
+        for i, start, end, mode in zip(snapshot[f"{prefix}_objects"].tolist(), starts, ends,
+                                       snapshot[f"{prefix}_modes"].tolist()):
+            track_set.tracks[first + i] = (times[start:end], values[start:end], WRAP_MODES[mode])
+        track_set.dirty = True
+    if transforms.animator is not None:
+        transforms.animator.count = sum(len(track_set.tracks) for track_set in transforms.animator.sets.values())
+
+    lights = []
+    for light_type, position, direction, color, intensity, radius in zip(
+            snapshot["light_types"], snapshot["light_positions"], snapshot["light_directions"],
+            snapshot["light_colors"], snapshot["light_intensities"].tolist(), snapshot["light_radii"].tolist()):
+        light_type = LIGHT_TYPES[light_type]
+        lights.append(Light(position=np.array(position) if light_type == 'point' else None,
+                            direction=np.array(direction) if light_type == 'directional' else None,
+                            color=color, intensity=intensity, light_type=light_type,
+                            radius=None if np.isnan(radius) else radius))
+
+    camera = snapshot.meta["camera"]
+    elements = {
+        "camera": None if camera is None else Camera(**camera),
+        "lights": lights,
+        "objects": objects,
+    }
+    return elements, snapshot.meta
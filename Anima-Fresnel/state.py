@@ -0,0 +1,39 @@
+from OpenGL.GL import *
+
+
+class GLStateTracker:
+    def __init__(self):
+        """
+        Shadow copy of the few GL bindings the draw loop changes, so a bind that would not change anything is
+        skipped instead of issued. Code that binds these objects behind the tracker's back must call
+        invalidate() before the next tracked bind.
+        """
+        self.vertex_array = None
+        self.program = None
+        self.binds = 0
+        self.elided_binds = 0
+
+    def bind_vertex_array(self, vao):
+        if vao == self.vertex_array:
+            self.elided_binds += 1
+            return
+        glBindVertexArray(vao)
+        self.vertex_array = vao
+        self.binds += 1
+
+    def use_program(self, program):
+        if program == self.program:
+            self.elided_binds += 1
+            return
+        glUseProgram(program)
+        self.program = program
+        self.binds += 1
+
+    def invalidate(self):
+        """Forget the shadowed bindings, e.g. after a context switch or external GL code."""
+        self.vertex_array = None
+        self.program = None
+
+
+# Tracker for the single render context
+gl_state = GLStateTracker()
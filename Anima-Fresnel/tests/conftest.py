@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The engine's modules live flat in Anima-Fresnel/, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import select_platform  # noqa: E402
+
+# Nothing here opens a window; keep PyOpenGL off GLX so the tests import on display-less machines
+select_platform('egl')
@@ -0,0 +1,178 @@
+"""
+Parity of the vectorized GeometryGenerator against the per-vertex loops it replaced.
+
+The reference functions below are the original implementations, kept verbatim apart from the signature so the
+vectorized versions can be checked byte for byte.
+"""
+import numpy as np
+import pytest
+
+from objects import GeometryGenerator
+
+
+def reference_sphere(radius, lat_steps, lon_steps):
+    vertices, normals, indices = [], [], []
+    for i in range(lat_steps + 1):
+        theta = np.pi * i / lat_steps
+        sin_theta = np.sin(theta)
+        cos_theta = np.cos(theta)
+        for j in range(lon_steps + 1):
+            phi = 2 * np.pi * j / lon_steps
+            sin_phi = np.sin(phi)
+            cos_phi = np.cos(phi)
+            x = cos_phi * sin_theta
+            y = cos_theta
+            z = sin_phi * sin_theta
+            vertices.append([radius * x, radius * y, radius * z])
+            normals.append([x, y, z])  # Normals are just the normalized position vectors
+    vertices = np.array(vertices, dtype=np.float32)
+    normals = np.array(normals, dtype=np.float32)
+    for i in range(lat_steps):
+        for j in range(lon_steps):
+            first = i * (lon_steps + 1) + j
+            second = first + lon_steps + 1
+            indices.extend([first, second, first + 1, second, second + 1, first + 1])
+    indices = np.array(indices, dtype=np.uint32)
+    return vertices, normals, indices
+
+
+def reference_ellipsoid(radius_x, radius_y, radius_z, lat_steps, lon_steps):
+    vertices, normals, indices = [], [], []
+    for i in range(lat_steps + 1):
+        theta = np.pi * i / lat_steps
+        sin_theta = np.sin(theta)
+        cos_theta = np.cos(theta)
+        for j in range(lon_steps + 1):
+            phi = 2 * np.pi * j / lon_steps
+            sin_phi = np.sin(phi)
+            cos_phi = np.cos(phi)
+            x = cos_phi * sin_theta * radius_x
+            y = cos_theta * radius_y
+            z = sin_phi * sin_theta * radius_z
+            vertices.append([x, y, z])
+            normals.append([x / radius_x, y / radius_y, z / radius_z])  # Normals are proportional to the ellipsoid
+    vertices = np.array(vertices, dtype=np.float32)
+    normals = np.array(normals, dtype=np.float32)
+    for i in range(lat_steps):
+        for j in range(lon_steps):
+            first = i * (lon_steps + 1) + j
+            second = first + lon_steps + 1
+            indices.extend([first, second, first + 1, second, second + 1, first + 1])
+    indices = np.array(indices, dtype=np.uint32)
+    return vertices, normals, indices
+
+
+def reference_cylinder(radius, height, lat_steps):
+    vertices, normals, indices = [], [], []
+    for i in range(lat_steps + 1):
+        theta = 2 * np.pi * i / lat_steps
+        sin_theta = np.sin(theta)
+        cos_theta = np.cos(theta)
+        for j in [0, 1]:
+            y = (j - 0.5) * height  # Top and bottom
+            vertices.append([radius * cos_theta, y, radius * sin_theta])
+            normals.append([cos_theta, 0, sin_theta])
+    vertices = np.array(vertices, dtype=np.float32)
+    normals = np.array(normals, dtype=np.float32)
+    for i in range(lat_steps):
+        first = 2 * i
+        second = first + 2
+        indices.extend([first, second, first + 1, second, second + 1, first + 1])
+    indices = np.array(indices, dtype=np.uint32)
+    return vertices, normals, indices
+
+
+def reference_torus(outer_radius, inner_radius, radial_steps, tube_steps):
+    vertices, normals, indices = [], [], []
+    for i in range(radial_steps):
+        theta = 2 * np.pi * i / radial_steps
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+        for j in range(tube_steps):
+            phi = 2 * np.pi * j / tube_steps
+            cos_phi = np.cos(phi)
+            sin_phi = np.sin(phi)
+            x = (outer_radius + inner_radius * cos_theta) * cos_phi
+            y = (outer_radius + inner_radius * cos_theta) * sin_phi
+            z = inner_radius * sin_theta
+            vertices.append([x, y, z])
+            normals.append([cos_theta * cos_phi, cos_theta * sin_phi, sin_theta])
+    vertices = np.array(vertices, dtype=np.float32)
+    normals = np.array(normals, dtype=np.float32)
+    for i in range(radial_steps):
+        for j in range(tube_steps):
+            first = i * tube_steps + j
+            second = ((i + 1) % radial_steps) * tube_steps + j
+            indices.extend([first, second, first + 1, second, second + 1, first + 1])
+    indices = np.array(indices, dtype=np.uint32)
+    return vertices, normals, indices
+
+
+def reference_curved_plane(lat_steps, lon_steps, curvature, concave=True):
+    vertices, normals, indices = [], [], []
+    sign = -1 if concave else 1
+    for i in range(lat_steps + 1):
+        theta = np.pi * i / lat_steps
+        for j in range(lon_steps + 1):
+            phi = 2 * np.pi * j / lon_steps
+            x = np.cos(phi) * np.sin(theta)
+            y = np.sin(sign * curvature * theta)
+            z = np.sin(phi) * np.sin(theta)
+            vertices.append([x, y, z])
+            normals.append([x, y, z])  # Normals are proportional to the shape
+    vertices = np.array(vertices, dtype=np.float32)
+    normals = np.array(normals, dtype=np.float32)
+    for i in range(lat_steps):
+        for j in range(lon_steps):
+            first = i * (lon_steps + 1) + j
+            second = first + lon_steps + 1
+            indices.extend([first, second, first + 1, second, second + 1, first + 1])
+    indices = np.array(indices, dtype=np.uint32)
+    return vertices, normals, indices
+
+
+# Small, odd and uneven step counts as well as the tessellations the scenes use
+STEPS = [(1, 1), (1, 3), (2, 2), (3, 5), (7, 4), (16, 16), (33, 17), (50, 50)]
+
+
+def assert_same_mesh(actual, expected):
+    for name, a, b in zip(("vertices", "normals", "indices"), actual, expected):
+        assert a.dtype == b.dtype, name
+        assert a.shape == b.shape, name
+        assert a.tobytes() == b.tobytes(), name
+
+
+@pytest.mark.parametrize("lat_steps, lon_steps", STEPS)
+@pytest.mark.parametrize("radius", [1.0, 0.37])
+def test_sphere(radius, lat_steps, lon_steps):
+    assert_same_mesh(GeometryGenerator.create_sphere(radius, lat_steps, lon_steps),
+                     reference_sphere(radius, lat_steps, lon_steps))
+
+
+@pytest.mark.parametrize("lat_steps, lon_steps", STEPS)
+@pytest.mark.parametrize("radii", [(1.0, 1.0, 1.0), (1.5, 0.5, 2.25)])
+def test_ellipsoid(radii, lat_steps, lon_steps):
+    assert_same_mesh(GeometryGenerator.create_ellipsoid(*radii, lat_steps, lon_steps),
+                     reference_ellipsoid(*radii, lat_steps, lon_steps))
+
+
+@pytest.mark.parametrize("lat_steps", [1, 2, 3, 7, 16, 33, 64])
+@pytest.mark.parametrize("radius, height", [(1.0, 2.0), (0.3, 0.75)])
+def test_cylinder(radius, height, lat_steps):
+    assert_same_mesh(GeometryGenerator.create_cylinder(radius, height, lat_steps),
+                     reference_cylinder(radius, height, lat_steps))
+
+
+@pytest.mark.parametrize("radial_steps, tube_steps", STEPS)
+@pytest.mark.parametrize("outer_radius, inner_radius", [(1.0, 0.3), (2.5, 1.1)])
+def test_torus(outer_radius, inner_radius, radial_steps, tube_steps):
+    assert_same_mesh(GeometryGenerator.create_torus(outer_radius, inner_radius, radial_steps, tube_steps),
+                     reference_torus(outer_radius, inner_radius, radial_steps, tube_steps))
+
+
+@pytest.mark.parametrize("lat_steps, lon_steps", STEPS)
+@pytest.mark.parametrize("curvature", [0.5, 1.0, 2.3])
+@pytest.mark.parametrize("concave", [True, False])
+def test_curved_plane(lat_steps, lon_steps, curvature, concave):
+    assert_same_mesh(GeometryGenerator.create_curved_plane(lat_steps, lon_steps, curvature, concave),
+                     reference_curved_plane(lat_steps, lon_steps, curvature, concave))
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from transform import transform_system
+
+FRAMES = 45
+
+
+def approaching_spheres_config(path):
+    """Spheres flying towards the camera, so their LODs step down through the hysteresis bands."""
+    sphere = {"type": "sphere", "radius": 1.0, "properties": {"albedo": [0.6, 0.6, 0.7], "metallic": 0.4,
+                                                               "roughness": 0.4, "movement_speed": [0.0, -6.0, 0.0]}}
+    config = {"scene": {
+        "seed": 0,
+        "camera": {"position": [0.0, -10.0, 0.0], "look_at": [0.0, 0.0, 0.0], "up_vector": [0.0, 0.0, 1.0],
+                   "field_of_view": 60.0, "near_clip": 0.1, "far_clip": 500.0},
+        "lights": [{"type": "directional", "direction": [-0.3, 0.5, -1.0], "color": [1.0, 1.0, 1.0],
+                    "intensity": 3.0}],
+        "grid_container": {"pattern": "grid", "columns": 8, "rows": 16, "spacing": [3.0, 7.3, 0.0],
+                           "objects": [sphere] * 128},
+    }}
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    return str(path)
+
+
+def render_lods(config_file, start_frame, frames):
+    """LOD of every object in the last of `frames` offline frames rendered from `start_frame` on."""
+    from render import Renderer
+    renderer = Renderer(160, 90, backend='egl', config_file=config_file, offline=True, start_frame=start_frame)
+    try:
+        renderer.initialize()
+    except Exception as e:
+        pytest.skip(f"no EGL context: {e}")
+    if not renderer.initialized:
+        pytest.skip("no EGL context")
+    for _ in range(frames):
+        renderer.render(0.0)
+    lods = [obj.lod for obj in renderer.scene.objects]
+    scene = renderer.scene
+    renderer.cleanup()
+    for obj in reversed(scene.objects):
+        transform_system.remove(obj.row)
+    return lods
+
+
+def test_seeking_picks_the_same_lods_as_a_continuous_render(tmp_path):
+    config_file = approaching_spheres_config(tmp_path / "scene.json")
+    continuous = render_lods(config_file, 0, FRAMES + 1)
+    seeked = render_lods(config_file, FRAMES, 1)
+    assert len(set(continuous)) > 1, "the scene should span several LODs"
+    assert seeked == continuous
@@ -0,0 +1,29 @@
+import pytest
+
+from profiler import Profiler
+
+
+def run_frames(profiler, count):
+    for frame in range(count):
+        profiler.begin_frame(frame)
+        with profiler.phase("animate"):
+            pass
+        with profiler.phase("draw"):
+            pass
+        profiler.end_frame()
+
+
+def test_trace_keeps_only_the_last_frames():
+    profiler = Profiler(window=20, gpu=False, trace_frames=10)
+    run_frames(profiler, 1000)
+    frames = sorted({frame for _, frame, _, _ in profiler.events})
+    assert frames == list(range(990, 1000))
+    assert len(profiler.events) == 10 * 3  # animate, draw and the frame itself
+    assert all(len(samples) == 20 for samples in profiler.cpu_times.values())
+
+
+@pytest.mark.parametrize("trace_frames", [None, 5000])
+def test_trace_keeps_short_runs_whole(trace_frames):
+    profiler = Profiler(gpu=False, trace_frames=trace_frames)
+    run_frames(profiler, 100)
+    assert len(profiler.events) == 100 * 3
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+import threading
+from multiprocessing import shared_memory
+
+import imageio.v2 as imageio
+import numpy as np
+import pytest
+
+import recorder
+from recorder import Recorder, encode_png
+
+
+def test_stream_survives_encoder_exiting_early(monkeypatch, tmp_path):
+    """If ffmpeg quits, capturing more frames than the queue holds and finalizing must not block."""
+    real_popen = subprocess.Popen
+
+    def exiting_encoder(command, **kwargs):
+        # Stands in for an ffmpeg that fails at once: reads nothing and exits with an error
+        return real_popen([sys.executable, "-c", "import sys; sys.exit(1)"], **kwargs)
+
+    monkeypatch.setattr(recorder.subprocess, "Popen", exiting_encoder)
+    stream = Recorder(64, 32, mode='stream', queue_size=2, output_filename=str(tmp_path / "out.mp4"))
+    stream.ffmpeg.wait()
+    frame = np.zeros((32, 64, 3), dtype=np.uint8)
+
+    def record():
+        for _ in range(20):
+            stream.capture_frame(frame)
+        stream.finalize_video()
+
+    worker = threading.Thread(target=record, daemon=True)
+    worker.start()
+    worker.join(timeout=30)
+    assert not worker.is_alive(), "capture_frame or finalize_video blocked after ffmpeg exited"
+    assert stream.stream_failed
+    assert stream.frame_count == 20
+
+
+def mappings_of(segment):
+    with open("/proc/self/maps") as f:
+        return f.read().count(segment.name.lstrip("/"))
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc to list memory mappings")
+def test_encode_png_detaches_shared_memory(tmp_path):
+    """A worker maps the frame slot only while encoding it."""
+    image = np.arange(32 * 64 * 3, dtype=np.uint8).reshape(32, 64, 3)
+    segment = shared_memory.SharedMemory(create=True, size=image.nbytes)
+    try:
+        np.ndarray(image.shape, dtype=np.uint8, buffer=segment.buf)[...] = image
+        before = mappings_of(segment)
+        for index in range(3):
+            encode_png(segment.name, image.shape, str(tmp_path / f"frame_{index}.png"))
+        assert mappings_of(segment) == before
+        np.testing.assert_array_equal(imageio.imread(tmp_path / "frame_2.png"), image)
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def test_encode_pool_writes_every_frame(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    pool = Recorder(64, 32, mode='png', encode_workers=2)
+    frames = [np.full((32, 64, 3), value, dtype=np.uint8) for value in range(0, 250, 25)]
+    for frame in frames:
+        pool.capture_frame(frame)
+    pool.shutdown_encode_pool()
+
+    for index, frame in enumerate(frames):
+        written = imageio.imread(os.path.join("frames", f"frame_{index:06d}.png"))
+        np.testing.assert_array_equal(written, frame)
+
+
+def test_stream_writes_the_frames_it_was_given(monkeypatch, tmp_path):
+    """Flipped views of a reused buffer, as the readback hands them over, arrive in the video unchanged."""
+    imageio_ffmpeg = pytest.importorskip("imageio_ffmpeg")
+    real_popen = subprocess.Popen
+    ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+
+    def bundled_ffmpeg(command, **kwargs):
+        return real_popen([ffmpeg] + command[1:], **kwargs)
+
+    monkeypatch.setattr(recorder.subprocess, "Popen", bundled_ffmpeg)
+    output = str(tmp_path / "out.mkv")
+    stream = Recorder(64, 32, mode='stream', queue_size=2, output_filename=output, lossless=True)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (32, 64, 3), dtype=np.uint8) for _ in range(5)]
+    buffer = np.empty((32, 64, 3), dtype=np.uint8)
+    for frame in frames:
+        buffer[...] = frame[::-1]
+        stream.capture_frame(buffer[::-1])
+    buffer[...] = 0  # The recorder must have taken its own copy
+    stream.finalize_video()
+    monkeypatch.undo()  # The reader starts its own ffmpeg
+
+    with imageio.get_reader(output, 'ffmpeg') as reader:
+        written = [np.asarray(image) for image in reader]
+    assert len(written) == len(frames)
+    for image, frame in zip(written, frames):
+        np.testing.assert_array_equal(image, frame)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from textures import UPLOAD_CHUNK, TextureStreamer
+
+imageio = pytest.importorskip("imageio.v2")
+
+SIZE = 1024  # Level 0 spans several upload chunks, so requests upload it in more than one slice
+
+
+@pytest.fixture(scope="module")
+def gl_context():
+    from context import create_backend
+    backend = create_backend('egl')
+    try:
+        backend.initialize(64, 64, visible=False)
+    except Exception as e:
+        pytest.skip(f"no EGL context: {e}")
+    yield backend
+    backend.cleanup()
+
+
+def write_map(path, seed):
+    rows = np.arange(SIZE, dtype=np.uint8)[:, None]
+    image = np.stack([np.broadcast_to(rows + seed, (SIZE, SIZE))] * 3, axis=-1)
+    imageio.imwrite(path, image)
+    return str(path)
+
+
+def chain_bytes(size):
+    total = 0
+    while size >= 1:
+        total += size * size * 4
+        size //= 2
+    return total
+
+
+def test_synchronous_request_counts_each_level_once(gl_context, tmp_path):
+    """With a budget that holds exactly two textures, loading the second must not evict the first."""
+    assert SIZE * SIZE * 4 > UPLOAD_CHUNK
+    first, second = write_map(tmp_path / "a.png", 0), write_map(tmp_path / "b.png", 64)
+    streamer = TextureStreamer(memory_budget=2 * chain_bytes(SIZE), synchronous=True)
+    try:
+        streamer.update()
+        streamer.bind((None, None, first))
+        # Let the first texture fall out of view, so only an over-count could make it an eviction candidate
+        streamer.update()
+        streamer.update()
+        streamer.bind((None, None, second))
+
+        textures = [streamer.textures[(path, False)] for path in (first, second)]
+        assert [texture.state for texture in textures] == ['resident', 'resident']
+        assert streamer.stats["evicted"] == 0
+        assert streamer.resident_bytes == 2 * chain_bytes(SIZE)
+    finally:
+        streamer.cleanup()
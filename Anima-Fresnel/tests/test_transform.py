@@ -0,0 +1,90 @@
+"""
+Parity of the batched TransformSystem against the per-object pyrr path it replaced: each object built its model
+matrix as rotation @ scaling @ translation from pyrr matrices, and the scene took the inverse-transpose of its
+upper 3x3 as the normal matrix.
+"""
+import numpy as np
+import pyrr
+import pytest
+
+from transform import TransformSystem, eulers_to_matrices
+
+
+def reference_matrices(rotation, position, scale):
+    rotation_matrix = pyrr.matrix44.create_from_eulers(rotation, dtype=np.float32)
+    translation_matrix = pyrr.matrix44.create_from_translation(position, dtype=np.float32)
+    scaling_matrix = pyrr.matrix44.create_from_scale(scale, dtype=np.float32)
+    model_matrix = pyrr.matrix44.multiply(pyrr.matrix44.multiply(rotation_matrix, scaling_matrix),
+                                          translation_matrix)
+    normal_matrix = np.linalg.inv(np.array(model_matrix[:3, :3], dtype=np.float32)).T
+    return model_matrix, normal_matrix
+
+
+def random_system(count, seed=0):
+    """A TransformSystem of `count` rows with random positions and speeds; scales stay well away from zero."""
+    rng = np.random.default_rng(seed)
+    transforms = TransformSystem(8)  # Small on purpose, so adding rows exercises grow()
+    for _ in range(count):
+        transforms.add(None, rng.uniform(-5.0, 5.0, 3), rotation_speed=rng.normal(size=3) * 2.0,
+                       movement_speed=rng.normal(size=3), scale_speed=rng.uniform(-0.3, 0.3, 3))
+    return transforms
+
+
+def assert_matches_reference(transforms):
+    for row in range(transforms.count):
+        model, normal = reference_matrices(transforms.rotation[row], transforms.position[row],
+                                           transforms.scale[row])
+        np.testing.assert_allclose(transforms.model_matrices[row], model, rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(transforms.normal_matrices[row], normal, rtol=1e-4, atol=1e-5)
+
+
+# Both sides of TransformSystem.CHUNK_SIZE, so multi-chunk passes are covered
+@pytest.mark.parametrize("count", [1, 7, 100, TransformSystem.CHUNK_SIZE + 5])
+def test_update_matches_per_object_path(count):
+    transforms = random_system(count)
+    rotation = transforms.rotation[:count].copy()
+    position = transforms.position[:count].copy()
+    scale = transforms.scale[:count].copy()
+    rotation_speed = transforms.rotation_speed[:count]
+    movement_speed = transforms.movement_speed[:count]
+    scale_speed = transforms.scale_speed[:count]
+
+    for delta_time in (1.0 / 30.0, 0.25, 1.0 / 60.0):
+        transforms.update(delta_time)
+        # The per-object animate() step, one object at a time
+        for row in range(count):
+            rotation[row] += delta_time * rotation_speed[row]
+            position[row] += delta_time * movement_speed[row]
+            scale[row] += delta_time * scale_speed[row]
+    np.testing.assert_allclose(transforms.rotation[:count], rotation, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(transforms.position[:count], position, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(transforms.scale[:count], scale, rtol=1e-6, atol=1e-6)
+    assert_matches_reference(transforms)
+
+
+@pytest.mark.parametrize("count", [1, 100, TransformSystem.CHUNK_SIZE + 5])
+@pytest.mark.parametrize("time", [0.0, 0.37, 2.5])
+def test_seek_matches_per_object_path(count, time):
+    transforms = random_system(count, seed=1)
+    transforms.seek(time)
+    for row in range(count):
+        expected = transforms.origin_rotation[row] + time * transforms.rotation_speed[row]
+        np.testing.assert_allclose(transforms.rotation[row], expected, rtol=1e-6, atol=1e-6)
+    assert_matches_reference(transforms)
+
+
+def test_partial_update_only_touches_its_rows():
+    transforms = random_system(50, seed=2)
+    transforms.update(0.0)
+    before = transforms.model_matrices[:50].copy()
+    transforms.update(0.5, rows=slice(10, 20))
+    np.testing.assert_array_equal(transforms.model_matrices[:10], before[:10])
+    np.testing.assert_array_equal(transforms.model_matrices[20:50], before[20:50])
+    assert not np.array_equal(transforms.model_matrices[10:20], before[10:20])
+    assert_matches_reference(transforms)
+
+
+def test_eulers_to_matrices_matches_pyrr():
+    eulers = np.random.default_rng(3).uniform(-np.pi, np.pi, (64, 3)).astype(np.float32)
+    expected = np.array([pyrr.matrix33.create_from_eulers(e, dtype=np.float32) for e in eulers])
+    np.testing.assert_allclose(eulers_to_matrices(eulers), expected, rtol=1e-5, atol=1e-6)
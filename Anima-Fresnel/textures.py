@@ -0,0 +1,385 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from OpenGL.GL import *
+
+from log import get_logger
+
+log = get_logger("textures")
+
+# Material maps an object's "texture_maps" may name, in the order Object3D.textures holds their paths
+TEXTURE_SLOTS = ("diffuse_map", "normal_map", "specular_map")
+DIFFUSE_MAP, NORMAL_MAP, SPECULAR_MAP = range(len(TEXTURE_SLOTS))
+NO_TEXTURES = (None,) * len(TEXTURE_SLOTS)
+
+# Texture unit and shader sampler of each slot; the cluster buffers sit on the high units (light_clusters.py)
+TEXTURE_UNITS = (0, 1, 2)
+TEXTURE_SAMPLERS = ("diffuseMap", "normalMap", "specularMap")
+
+# What each slot reads as while its image is missing or still streaming in. These are neutral: a white albedo
+# factor, an unperturbed normal and full roughness and metallic factors, so the object looks untextured.
+PLACEHOLDER_TEXELS = ((1.0, 1.0, 1.0, 1.0), (0.5, 0.5, 1.0, 1.0), (1.0, 1.0, 1.0, 1.0))
+
+TEXTURE_MEMORY_BUDGET = 256 * 2**20  # Bytes of resident mip levels before unused textures are evicted
+UPLOAD_BUDGET = 0.002  # Seconds per frame spent uploading texels
+UPLOAD_CHUNK = 2**20  # Bytes per glTexSubImage2D, the granularity at which the upload budget is checked
+DECODE_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Scheduling priority of decoder threads, so the render thread wins the CPU when both are runnable
+DECODE_NICENESS = 10
+
+# sRGB transfer function, for filtering diffuse maps in linear space
+SRGB_TO_LINEAR = np.where(np.arange(256) / 255.0 <= 0.04045, np.arange(256) / 255.0 / 12.92,
+                          ((np.arange(256) / 255.0 + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+
+def linear_to_srgb(values):
+    values = np.clip(values, 0.0, 1.0)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1.0 / 2.4) - 0.055)
+
+
+def decode_image(path):
+    """Read an image file into a bottom-row-first (H, W, 4) uint8 RGBA array."""
+    import imageio.v2 as imageio  # Optional, as for recording
+
+    image = np.asarray(imageio.imread(path))
+    if image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    elif image.dtype != np.uint8:
+        raise ValueError(f"unsupported pixel type {image.dtype}")
+    if image.ndim == 2:
+        image = image[:, :, None]
+    channels = image.shape[2]
+    if channels in (1, 2):
+        # Grey, or grey and alpha
+        image = np.concatenate([image[:, :, :1].repeat(3, axis=2), image[:, :, 1:]], axis=2)
+    if image.shape[2] == 3:
+        image = np.concatenate([image, np.full(image.shape[:2] + (1,), 255, dtype=np.uint8)], axis=2)
+    # Image files store the top row first, GL the bottom row
+    return np.ascontiguousarray(image[::-1])
+
+
+def build_mipmaps(image, srgb=False):
+    """
+    Full mip chain of an (H, W, 4) uint8 image, finest first, by averaging 2x2 blocks.
+
+    Each level is max(1, floor(size / 2)) of the previous one, as GL expects; an odd last row or column is
+    dropped. sRGB color channels are averaged in linear space so dark and bright texels blend correctly.
+    """
+    level = image.astype(np.float32)
+    if srgb:
+        level[:, :, :3] = SRGB_TO_LINEAR[image[:, :, :3]]
+    else:
+        level /= 255.0
+
+    levels = [image]
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        height, width = level.shape[:2]
+        if height > 1:
+            level = 0.5 * (level[0:height - 1:2] + level[1:height:2])
+        if width > 1:
+            level = 0.5 * (level[:, 0:width - 1:2] + level[:, 1:width:2])
+        texels = level.copy()
+        if srgb:
+            texels[:, :, :3] = linear_to_srgb(texels[:, :, :3])
+        levels.append(np.ascontiguousarray(np.rint(texels * 255.0), dtype=np.uint8))
+    return levels
+
+
+def lower_priority():
+    """Thread pool initializer: renice the calling decoder thread (Linux schedules threads individually)."""
+    if hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), DECODE_NICENESS)
+        except OSError:
+            pass
+
+
+def decode_texture(path, srgb):
+    """Thread pool task: the decoded mip chain of the image at `path`."""
+    return build_mipmaps(decode_image(path), srgb)
+
+
+class Texture:
+    def __init__(self, path, srgb):
+        """
+        One image streamed into a GL texture, coarsest mip level first.
+
+        While levels are missing, GL_TEXTURE_BASE_LEVEL points at the finest complete one, so the texture is
+        usable (just blurry) from its first uploaded level on.
+        """
+        self.path = path
+        self.srgb = srgb
+        self.state = 'idle'  # 'idle' (not loaded or evicted), 'decoding', 'uploading', 'resident' or 'failed'
+        self.name = None     # GL texture, from the first uploaded level until eviction
+        self.levels = None   # Decoded mip chain, finest first, kept until every level is uploaded
+        self.uploaded = 0    # Complete levels on the GPU, counted from the coarsest
+        self.row = 0         # Rows of the level being uploaded that are already on the GPU
+        self.nbytes = 0      # GPU memory allocated for the levels so far
+        self.last_used = -1  # Frame the texture was last bound in
+
+    def next_level(self):
+        """Index of the level to upload next."""
+        return len(self.levels) - 1 - self.uploaded
+
+    def upload(self, max_bytes):
+        """
+        Upload up to `max_bytes` (at least one row) of the next level; the texture must be bound on the
+        active unit. Allocating a level is left to the caller's memory check, through `allocate`.
+
+        :return: Bytes uploaded.
+        """
+        level = self.next_level()
+        data = self.levels[level]
+        height, width = data.shape[:2]
+        end = min(height, self.row + max(1, max_bytes // (4 * width)))
+        glTexSubImage2D(GL_TEXTURE_2D, level, 0, self.row, width, end - self.row, GL_RGBA, GL_UNSIGNED_BYTE,
+                        data[self.row:end])
+        uploaded = (end - self.row) * 4 * width
+        self.row = end
+        if end == height:
+            self.row = 0
+            self.uploaded += 1
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, level)
+            if level == 0:
+                self.state = 'resident'
+                self.levels = None
+        return uploaded
+
+    def allocate(self):
+        """Create the GL texture on first use and reserve storage for the next level; return its size in bytes."""
+        level = self.next_level()
+        data = self.levels[level]
+        if self.name is None:
+            self.name = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, self.name)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(self.levels) - 1)
+        else:
+            glBindTexture(GL_TEXTURE_2D, self.name)
+        internal_format = GL_SRGB8_ALPHA8 if self.srgb else GL_RGBA8
+        glTexImage2D(GL_TEXTURE_2D, level, internal_format, data.shape[1], data.shape[0], 0, GL_RGBA,
+                     GL_UNSIGNED_BYTE, None)
+        self.nbytes += data.nbytes
+        return data.nbytes
+
+    def release(self):
+        """Free the GPU texture and any decoded levels; the next request decodes the file again."""
+        if self.name is not None:
+            glDeleteTextures(1, [self.name])
+        self.name = None
+        self.levels = None
+        self.uploaded = 0
+        self.row = 0
+        self.nbytes = 0
+        if self.state != 'failed':
+            self.state = 'idle'
+
+
+class TextureStreamer:
+    def __init__(self, memory_budget=TEXTURE_MEMORY_BUDGET, upload_budget=UPLOAD_BUDGET, workers=DECODE_WORKERS,
+                 synchronous=False):
+        """
+        Loads the material maps of the objects being drawn without stalling the render thread.
+
+        A texture is requested the first time an object using it is bound. Its file is decoded and mipmapped
+        on a thread pool, and its levels are uploaded a slice at a time within `upload_budget` per frame; until
+        then the slot's neutral placeholder is bound. Objects naming the same file share one texture. When the
+        resident levels would exceed `memory_budget`, the least recently bound textures not used in the last
+        frame are evicted and decoded again if they come back into view.
+
+        :param memory_budget: Bytes of GPU texture memory to stay under (placeholders not counted).
+        :param upload_budget: Seconds per frame spent on uploads; at least one slice is uploaded per frame.
+        :param workers: Decoder threads.
+        :param synchronous: Decode and upload every texture an object needs when it is first bound, so each
+                            frame shows the textures fully loaded; offline renders use this to stay deterministic.
+        """
+        self.memory_budget = memory_budget
+        self.upload_budget = upload_budget
+        self.workers = workers
+        self.synchronous = synchronous
+        self.executor = None  # Started on the first request
+        self.textures = {}  # (path, srgb) -> Texture
+        self.finished = queue.SimpleQueue()  # (Texture, Future) of completed decodes, filled by worker threads
+        self.uploads = deque()  # Textures with levels left to upload, in the order their decode finished
+        self.resident = OrderedDict()  # Textures holding GPU memory, least recently bound first
+        self.resident_bytes = 0
+        self.frame = 0
+        self.bound = [None] * len(TEXTURE_SLOTS)  # Texture name bound on each slot's unit
+        self.placeholders = []
+        self.over_budget = False
+        self.stats = {"textures": 0, "resident": 0, "resident_mb": 0.0, "pending": 0, "uploaded_mb": 0.0,
+                      "decoded": 0, "evicted": 0, "failed": 0}
+
+    def create_placeholders(self):
+        for texel in PLACEHOLDER_TEXELS:
+            name = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, name)
+            # Float texels, so the flat normal decodes to exactly (0, 0, 1)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F, 1, 1, 0, GL_RGBA, GL_FLOAT, np.array(texel, dtype=np.float32))
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            self.placeholders.append(name)
+
+    def set_samplers(self, shader):
+        """Point the TEXTURED program's samplers at the slot units; must be called with the program current."""
+        for sampler, unit in zip(TEXTURE_SAMPLERS, TEXTURE_UNITS):
+            shader.set_uniform(sampler, unit)
+
+    def request(self, path, srgb):
+        """The Texture for `path`, starting its decode if it is not loaded."""
+        texture = self.textures.get((path, srgb))
+        if texture is None:
+            texture = self.textures[(path, srgb)] = Texture(path, srgb)
+        if texture.state == 'idle':
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="texture-decode",
+                                                   initializer=lower_priority)
+            texture.state = 'decoding'
+            future = self.executor.submit(decode_texture, path, srgb)
+            future.add_done_callback(lambda future, texture=texture: self.finished.put((texture, future)))
+            if self.synchronous:
+                wait([future])  # Failures are reported when the result is collected
+                self.collect()
+                # A level's room is counted once, when it is allocated, as in update()
+                while texture.state == 'uploading' and (texture.row or self.has_room(texture)):
+                    self.upload(texture, UPLOAD_CHUNK)
+        return texture
+
+    def bind(self, textures):
+        """
+        Bind the textures of one object (paths per TEXTURE_SLOTS, None for none) or their placeholders.
+
+        Rebinding what a unit already holds is skipped, so consecutive objects sharing maps cost nothing.
+        """
+        for slot, path in enumerate(textures):
+            name = self.placeholders[slot]
+            if path is not None:
+                texture = self.request(path, srgb=slot == DIFFUSE_MAP)
+                if texture.last_used != self.frame:
+                    texture.last_used = self.frame
+                    if texture in self.resident:
+                        self.resident.move_to_end(texture)
+                if texture.name is not None:
+                    name = texture.name
+            if self.bound[slot] != name:
+                glActiveTexture(GL_TEXTURE0 + TEXTURE_UNITS[slot])
+                glBindTexture(GL_TEXTURE_2D, name)
+                self.bound[slot] = name
+        glActiveTexture(GL_TEXTURE0)
+
+    def update(self):
+        """
+        Start a frame: take the finished decodes and upload texels until the frame's budget is spent.
+        Must run before the frame's binds, with the context current.
+        """
+        self.frame += 1
+        if not self.placeholders:
+            self.create_placeholders()
+        self.collect()
+        deadline = time.perf_counter() + self.upload_budget
+        uploaded = 0
+        while self.uploads:
+            texture = self.uploads[0]
+            if texture.row == 0 and not self.has_room(texture):
+                break
+            uploaded += self.upload(texture, UPLOAD_CHUNK)
+            if time.perf_counter() >= deadline:
+                break
+
+        self.stats["textures"] = len(self.textures)
+        self.stats["resident"] = len(self.resident)
+        self.stats["resident_mb"] = self.resident_bytes / 2**20
+        self.stats["pending"] = sum(texture.state in ('decoding', 'uploading') for texture in self.textures.values())
+        self.stats["uploaded_mb"] = uploaded / 2**20
+
+    def collect(self):
+        """Queue the textures whose decode finished for upload."""
+        while True:
+            try:
+                texture, future = self.finished.get_nowait()
+            except queue.Empty:
+                return
+            if texture.state != 'decoding':
+                continue  # Released while decoding
+            try:
+                texture.levels = future.result()
+            except Exception as e:
+                texture.state = 'failed'
+                self.stats["failed"] += 1
+                log.warning("Could not load texture %s: %s", texture.path, e)
+                continue
+            texture.state = 'uploading'
+            self.uploads.append(texture)
+            self.stats["decoded"] += 1
+
+    def has_room(self, texture):
+        """Whether the next level of `texture` fits the memory budget, after evicting what is not in view."""
+        needed = texture.levels[texture.next_level()].nbytes
+        for victim in list(self.resident):
+            if self.resident_bytes + needed <= self.memory_budget:
+                break
+            # Textures bound in this or the last frame are in view; evicting them would only thrash
+            if victim is texture or victim.last_used >= self.frame - 1:
+                continue
+            self.evict(victim)
+        if self.resident_bytes + needed <= self.memory_budget:
+            return True
+        if not self.over_budget:
+            self.over_budget = True
+            log.warning("Textures in view need more than the %.0f MB texture budget; some stay at low detail",
+                        self.memory_budget / 2**20)
+        return False
+
+    def upload(self, texture, max_bytes):
+        """
+        Upload the next slice of `texture`, allocating its next level first when starting one (after has_room).
+
+        :return: Bytes uploaded.
+        """
+        # Uploads go through unit 0, behind the bind cache's back
+        glActiveTexture(GL_TEXTURE0)
+        self.bound[0] = None
+        if texture.row == 0:
+            self.resident_bytes += texture.allocate()
+            if texture not in self.resident:
+                self.resident[texture] = None
+        else:
+            glBindTexture(GL_TEXTURE_2D, texture.name)
+        uploaded = texture.upload(max_bytes)
+        if texture.state == 'resident':
+            self.uploads.remove(texture)
+        return uploaded
+
+    def evict(self, texture):
+        log.debug("Evicting texture %s (%.1f MB)", texture.path, texture.nbytes / 2**20)
+        self.resident_bytes -= texture.nbytes
+        del self.resident[texture]
+        if texture in self.uploads:
+            self.uploads.remove(texture)
+        if texture.name in self.bound:
+            self.bound = [None] * len(TEXTURE_SLOTS)
+        texture.release()
+        self.stats["evicted"] += 1
+
+    def cleanup(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        for texture in self.textures.values():
+            texture.release()
+        self.textures.clear()
+        self.resident.clear()
+        self.uploads.clear()
+        self.resident_bytes = 0
+        if self.placeholders:
+            glDeleteTextures(len(self.placeholders), self.placeholders)
+            self.placeholders = []
+        self.bound = [None] * len(TEXTURE_SLOTS)
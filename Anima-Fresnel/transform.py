@@ -0,0 +1,232 @@
+import numpy as np
+
+
+def euler_components(eulers, out=None):
+    """
+    Batched pyrr.matrix33.create_from_eulers in component-major layout.
+
+    :param eulers: (N, 3) array of (roll, pitch, yaw) angles in radians.
+    :param out: Optional (3, 3, N) array to write into.
+    :return: (3, 3, N) array where [i, j] holds element (i, j) of every rotation matrix.
+    """
+    angles = np.ascontiguousarray(eulers.T)
+    sR, sP, sY = np.sin(angles)
+    cR, cP, cY = np.cos(angles)
+    sPcR = sP * cR
+    sPsR = sP * sR
+
+    if out is None:
+        out = np.empty((3, 3, len(eulers)), dtype=eulers.dtype)
+    np.multiply(cY, cP, out=out[0, 0])
+    out[0, 1] = sY * sR - cY * sPcR
+    out[0, 2] = cY * sPsR + sY * cR
+    out[1, 0] = sP
+    np.multiply(cP, cR, out=out[1, 1])
+    out[1, 2] = -cP * sR
+    out[2, 0] = -sY * cP
+    out[2, 1] = sY * sPcR + cY * sR
+    out[2, 2] = cY * cR - sY * sPsR
+    return out
+
+
+def eulers_to_matrices(eulers):
+    """
+    Batched pyrr.matrix33.create_from_eulers.
+
+    :param eulers: (N, 3) array of (roll, pitch, yaw) angles in radians.
+    :return: (N, 3, 3) rotation matrices in pyrr's row-vector convention.
+    """
+    return euler_components(eulers).transpose(2, 0, 1).copy()
+
+
+class TransformSystem:
+    FIELDS = ('position', 'rotation', 'scale', 'rotation_speed', 'movement_speed', 'scale_speed',
+              'origin_position', 'origin_rotation', 'origin_scale')
+    CHUNK_SIZE = 4096
+
+    def __init__(self, capacity=64):
+        """
+        Structure-of-arrays store for every object's transform and animation speeds.
+
+        Each field is a contiguous (capacity, 3) float32 array of which the first `count` rows are live.
+        Model and normal matrices for all rows are computed together in one batched pass.
+        The origin_* fields hold the state at scene time zero, from which `seek` evaluates any time directly.
+        An optional KeyframeAnimator (`animator`) overrides keyframed channels before the matrices are built.
+        """
+        self.count = 0
+        self.time = 0.0  # Scene time of the last full update or seek
+        self.animator = None
+        self.owners = []
+        self.position = np.zeros((capacity, 3), dtype=np.float32)
+        self.rotation = np.zeros((capacity, 3), dtype=np.float32)
+        self.scale = np.ones((capacity, 3), dtype=np.float32)
+        self.rotation_speed = np.zeros((capacity, 3), dtype=np.float32)
+        self.movement_speed = np.zeros((capacity, 3), dtype=np.float32)
+        self.scale_speed = np.zeros((capacity, 3), dtype=np.float32)
+        self.origin_position = np.zeros((capacity, 3), dtype=np.float32)
+        self.origin_rotation = np.zeros((capacity, 3), dtype=np.float32)
+        self.origin_scale = np.ones((capacity, 3), dtype=np.float32)
+        self.model_matrices = np.tile(np.identity(4, dtype=np.float32), (capacity, 1, 1))
+        self.normal_matrices = np.tile(np.identity(3, dtype=np.float32), (capacity, 1, 1))
+        self.allocate_scratch(capacity)
+
+    def allocate_scratch(self, capacity):
+        """Component-major work buffers so the per-frame pass runs over contiguous rows without allocating."""
+        capacity = min(capacity, self.CHUNK_SIZE)
+        self._rotation_components = np.empty((3, 3, capacity), dtype=np.float32)
+        self._model_components = np.zeros((4, 4, capacity), dtype=np.float32)
+        self._model_components[3, 3] = 1.0
+        self._normal_components = np.empty((3, 3, capacity), dtype=np.float32)
+        self._scale_components = np.empty((3, capacity), dtype=np.float32)
+
+    def grow(self, capacity):
+        """Reallocate every array to hold `capacity` rows, keeping the live ones."""
+        for field in self.FIELDS + ('model_matrices', 'normal_matrices'):
+            old = getattr(self, field)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, field, new)
+        self.allocate_scratch(capacity)
+
+    def add(self, owner, position, rotation_speed=(0.0, 0.0, 0.0), movement_speed=(0.0, 0.0, 0.0),
+            scale_speed=(0.0, 0.0, 0.0)):
+        """Append a row for `owner` and return its index; `owner.row` is kept up to date on removals."""
+        if self.count == len(self.position):
+            self.grow(2 * len(self.position))
+        row = self.count
+        self.count += 1
+        self.owners.append(owner)
+
+        self.position[row] = position
+        self.rotation[row] = 0.0
+        self.scale[row] = 1.0
+        self.rotation_speed[row] = rotation_speed
+        self.movement_speed[row] = movement_speed
+        self.scale_speed[row] = scale_speed
+        self.origin_position[row] = position
+        self.origin_rotation[row] = 0.0
+        self.origin_scale[row] = 1.0
+        return row
+
+    def add_rows(self, count):
+        """
+        Append `count` rows in their initial state at once and return the first; each row's owner claims it
+        afterwards by setting owners[row] (Object3D(row=...)).
+        """
+        if self.count + count > len(self.position):
+            self.grow(max(2 * len(self.position), self.count + count))
+        first = self.count
+        self.count += count
+        self.owners.extend([None] * count)
+
+        rows = slice(first, self.count)
+        for field in ('position', 'rotation', 'rotation_speed', 'movement_speed', 'scale_speed',
+                      'origin_position', 'origin_rotation'):
+            getattr(self, field)[rows] = 0.0
+        self.scale[rows] = 1.0
+        self.origin_scale[rows] = 1.0
+        return first
+
+    def remove(self, row):
+        """Free `row` by moving the last live row into it so storage stays dense."""
+        last = self.count - 1
+        if row != last:
+            for field in self.FIELDS + ('model_matrices', 'normal_matrices'):
+                array = getattr(self, field)
+                array[row] = array[last]
+            moved = self.owners[last]
+            self.owners[row] = moved
+            moved.row = row
+            if self.animator is not None:
+                self.animator.move(last, row)
+        elif self.animator is not None:
+            self.animator.detach(row)
+        self.owners.pop()
+        self.count -= 1
+
+    def update(self, delta_time, rows=None):
+        """
+        Advance rotation, position and scale by `delta_time` and recompute the model and normal matrices.
+
+        :param rows: Optional slice restricting the update to a contiguous range of rows (default: all live rows).
+                     Partial updates neither advance the scene time nor evaluate keyframes.
+        """
+        full = rows is None
+        if full:
+            rows = slice(0, self.count)
+            self.time += delta_time
+        self.rotation[rows] += delta_time * self.rotation_speed[rows]
+        self.position[rows] += delta_time * self.movement_speed[rows]
+        self.scale[rows] += delta_time * self.scale_speed[rows]
+        if full and self.animator is not None:
+            self.animator.apply(self.time, self)
+        self.compute_matrices(rows)
+
+    def mark_origin(self, rows=None):
+        """Take the current position, rotation and scale as the state at scene time zero."""
+        if rows is None:
+            rows = slice(0, self.count)
+            self.time = 0.0
+        self.origin_position[rows] = self.position[rows]
+        self.origin_rotation[rows] = self.rotation[rows]
+        self.origin_scale[rows] = self.scale[rows]
+
+    def anchor(self, rows):
+        """
+        Take the current state of `rows` as their state at the current scene time, back-dating the origin by
+        their speeds, so later updates and seeks continue from it. Used for rows created or changed mid-scene.
+
+        :param rows: Index array or slice of live rows.
+        """
+        self.origin_position[rows] = self.position[rows] - self.time * self.movement_speed[rows]
+        self.origin_rotation[rows] = self.rotation[rows] - self.time * self.rotation_speed[rows]
+        self.origin_scale[rows] = self.scale[rows] - self.time * self.scale_speed[rows]
+
+    def seek(self, time, rows=None):
+        """
+        Jump straight to scene time `time` (seconds since the origin) and recompute the matrices.
+
+        Every field moves at a constant speed, so the state is origin + time * speed. The result depends
+        only on `time`, which lets separate processes render disjoint frame ranges of the same animation.
+        Keyframes are evaluated at `time` too, on full seeks.
+        """
+        full = rows is None
+        if full:
+            rows = slice(0, self.count)
+            self.time = time
+        np.add(self.origin_rotation[rows], time * self.rotation_speed[rows], out=self.rotation[rows])
+        np.add(self.origin_position[rows], time * self.movement_speed[rows], out=self.position[rows])
+        np.add(self.origin_scale[rows], time * self.scale_speed[rows], out=self.scale[rows])
+        if full and self.animator is not None:
+            self.animator.apply(time, self)
+        self.compute_matrices(rows)
+
+    def compute_matrices(self, rows=None):
+        """Batched equivalent of rotation @ scaling @ translation with pyrr matrices, plus inverse-transpose."""
+        if rows is None:
+            rows = slice(0, self.count)
+        start, stop, _ = rows.indices(self.count)
+        # Cache-sized chunks keep every temporary small enough to be recycled instead of freshly mapped
+        for chunk_start in range(start, stop, self.CHUNK_SIZE):
+            self.compute_chunk(slice(chunk_start, min(chunk_start + self.CHUNK_SIZE, stop)))
+
+    def compute_chunk(self, rows):
+        count = rows.stop - rows.start
+        rotation = euler_components(self.rotation[rows], out=self._rotation_components[:, :, :count])
+        scale = self._scale_components[:, :count]
+        scale[:] = self.scale[rows].T
+
+        # Scale -> Rotate -> Translate in pyrr's row-vector convention
+        model = self._model_components[:, :, :count]
+        np.multiply(rotation, scale, out=model[:3, :3])
+        model[3, :3] = self.position[rows].T
+        self.model_matrices[rows] = model.transpose(2, 0, 1)
+
+        # inverse(R @ diag(s)).T == R @ diag(1 / s) because R is orthonormal
+        normal = self._normal_components[:, :, :count]
+        np.divide(rotation, scale, out=normal)
+        self.normal_matrices[rows] = normal.transpose(2, 0, 1)
+
+
+# Shared transform store used by all Object3D instances
+transform_system = TransformSystem()
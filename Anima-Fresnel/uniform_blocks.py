@@ -0,0 +1,96 @@
+import numpy as np
+from OpenGL.GL import *
+
+from log import get_logger
+from pbr_shaders import MAX_LIGHTS, UNIFORM_BLOCK_BINDINGS
+
+log = get_logger("uniform_blocks")
+
+
+class UniformBlock:
+    def __init__(self, name, size):
+        """
+        One std140 uniform buffer bound to the binding point every program uses for block `name`.
+
+        :param size: Buffer size in bytes.
+        """
+        self.name = name
+        self.binding = UNIFORM_BLOCK_BINDINGS[name]
+        self.data = np.zeros(size // 4, dtype=np.float32)
+        self.uploads = 0
+        self.skipped_uploads = 0
+        self.uploaded = False
+
+        self.ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.binding, self.ubo)
+
+    def update(self, data):
+        """Upload `data` (the packed block contents) with one glBufferSubData, unless the buffer already holds it."""
+        # Compare bit patterns: the blocks mix float and int members
+        if self.uploaded and np.array_equal(self.data.view(np.int32), data.view(np.int32)):
+            self.skipped_uploads += 1
+            return False
+        self.data[:] = data
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.data.nbytes, self.data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.uploaded = True
+        self.uploads += 1
+        return True
+
+    def delete(self):
+        if self.ubo is not None:
+            glDeleteBuffers(1, [self.ubo])
+            self.ubo = None
+
+
+class CameraBlock(UniformBlock):
+    # mat4 view | mat4 projection | vec4 viewPos
+    FLOATS = 16 + 16 + 4
+
+    def __init__(self):
+        super().__init__("Camera", self.FLOATS * 4)
+        self.staging = np.zeros(self.FLOATS, dtype=np.float32)
+
+    def set(self, view, projection, position):
+        staging = self.staging
+        staging[0:16] = np.ravel(view)
+        staging[16:32] = np.ravel(projection)
+        staging[32:35] = position
+        return self.update(staging)
+
+
+class LightBlock(UniformBlock):
+    def __init__(self, max_lights=MAX_LIGHTS):
+        """
+        Packed light array: int numLights padded to 16 bytes, then vec4 lightPos, lightDir and lightColor
+        arrays of `max_lights` entries each (std140 gives every array element a 16-byte stride).
+        """
+        self.max_lights = max_lights
+        self.warned = False
+        super().__init__("Lights", (4 + 3 * 4 * max_lights) * 4)
+        self.staging = np.zeros(len(self.data), dtype=np.float32)
+        arrays = self.staging[4:].reshape(3, max_lights, 4)
+        self.positions, self.directions, self.colors = arrays
+
+    def set(self, lights):
+        if len(lights) > self.max_lights:
+            if not self.warned:
+                self.warned = True
+                log.warning("%d lights exceed the shader's capacity of %d; extra lights are ignored",
+                            len(lights), self.max_lights)
+            lights = lights[:self.max_lights]
+
+        self.staging[:] = 0.0
+        self.staging[:1].view(np.int32)[0] = len(lights)
+        for i, light in enumerate(lights):
+            if light.type == 'point':
+                self.positions[i, :3] = light.position
+                self.positions[i, 3] = light.influence_radius
+            elif light.type == 'directional':
+                self.directions[i, :3] = light.direction
+            self.colors[i, :3] = light.color * light.intensity
+        return self.update(self.staging)
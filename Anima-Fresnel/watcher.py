@@ -0,0 +1,46 @@
+import os
+import time
+
+from log import get_logger
+
+log = get_logger("watcher")
+
+# Seconds between checks of the watched file
+WATCH_INTERVAL = 0.25
+
+
+class ConfigWatcher:
+    def __init__(self, path, interval=WATCH_INTERVAL):
+        """
+        Polls a file's modification time and size, for reloading it when an editor saves it.
+
+        Polling one stat per interval costs nothing next to a frame and needs no platform-specific
+        notification API.
+
+        :param path: File to watch.
+        :param interval: Seconds between checks; calls to `changed` in between return False without a stat.
+        """
+        self.path = path
+        self.interval = interval
+        self.signature = self.stat()
+        self.next_check = time.monotonic() + interval
+
+    def stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None  # Editors that save by rename briefly leave no file; the next check sees the new one
+        return st.st_mtime_ns, st.st_size
+
+    def changed(self):
+        """Whether the file changed since the last call that returned True (or since construction)."""
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.interval
+        signature = self.stat()
+        if signature is None or signature == self.signature:
+            return False
+        self.signature = signature
+        log.debug("%s changed", self.path)
+        return True